@@ -1,5 +1,6 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import MongoClient
+from app.utils.metrics import mongo_listener
 import os
 from dotenv import load_dotenv
 
@@ -12,7 +13,7 @@ class Database:
         self.db = None
     
     async def connect(self):
-        self.client = AsyncIOMotorClient(self.MONGO_URI)
+        self.client = AsyncIOMotorClient(self.MONGO_URI, event_listeners=[mongo_listener])
         self.db = self.client.shakti_db
         print("Connected to MongoDB")
     
@@ -22,7 +23,7 @@ class Database:
 
 # Sync database for some operations
 def get_sync_db():
-    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"), event_listeners=[mongo_listener])
     return client.shakti_db
 
 db = Database()
\ No newline at end of file
@@ -1,8 +1,23 @@
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.security import OAuth2PasswordBearer
 from app.database import db
-from app.routes import auth, routes, sos, crime_data
+from app.routes import auth, routes, sos, crime_data, tracking
+from app.utils.crime_sync import crime_sync
+from app.utils.safety_scoring import scorer
+from app.utils.map_utils import osrm_client
+from app.utils.route_cache import route_cache
+from app.utils.heat_tiles import heat_tiles
+from app.utils.graph_router import graph_router
+from app.utils.executors import hashing_executor, scoring_executor
+from app.utils.sos_dispatch import sos_dispatcher
+from app.utils.smtp_pool import smtp_pool
+from app.utils.location_hub import location_hub
+from app.utils.db_indexes import assert_query_plans, ensure_indexes
+from app.utils.instrumentation import InstrumentationMiddleware
+from app.utils.metrics import registry
 import os
 from dotenv import load_dotenv
 
@@ -23,15 +38,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress responses for clients sending Accept-Encoding: gzip (route geometries shrink ~3x)
+app.add_middleware(GZipMiddleware, minimum_size=int(os.getenv("GZIP_MIN_SIZE", "1000")))
+
+# Request latency histograms, Server-Timing and opt-in profiling (outermost, so it times everything)
+app.add_middleware(InstrumentationMiddleware)
+
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 @app.on_event("startup")
 async def startup_db_client():
     await db.connect()
+    await ensure_indexes(db.db)
+    if os.getenv("MONGO_ASSERT_INDEXES", "false").lower() == "true":
+        await assert_query_plans(db.db)
+    await osrm_client.start()
+    await sos_dispatcher.start(db.db)
+    await location_hub.start(db.db.location_points)
+    await route_cache.start(db.db.route_cache)
+    crime_sync.listeners.append(route_cache.invalidate_point)
+    crime_sync.listeners.append(heat_tiles.invalidate_point)
+    await crime_sync.start(db.db.crime_data)
+    await heat_tiles.start()
+    
+    risk_raster_path = os.getenv("RISK_RASTER_PATH")
+    if risk_raster_path and os.path.exists(risk_raster_path):
+        scorer.load_risk_raster(risk_raster_path)
+    
+    segment_table_path = os.getenv("SEGMENT_TABLE_PATH")
+    if segment_table_path and os.path.exists(segment_table_path):
+        scorer.load_segment_table(segment_table_path)
+    
+    routing_graph_path = os.getenv("ROUTING_GRAPH_PATH")
+    if routing_graph_path and os.path.exists(routing_graph_path):
+        graph_router.load(routing_graph_path, scorer.road_safety, scorer.time_risk)
+    
+    scoring_executor.start()
+    hashing_executor.start()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await crime_sync.stop()
+    await route_cache.stop()
+    await heat_tiles.stop()
+    await sos_dispatcher.stop()
+    await location_hub.stop()
+    await smtp_pool.close()
+    await osrm_client.close()
+    scoring_executor.shutdown()
+    hashing_executor.shutdown()
     await db.disconnect()
 
 # Include routers
@@ -39,6 +95,7 @@ app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(routes.router, prefix="/routes", tags=["Routes"])
 app.include_router(sos.router, prefix="/sos", tags=["SOS"])
 app.include_router(crime_data.router, prefix="/crime", tags=["Crime Data"])
+app.include_router(tracking.router, prefix="/tracking", tags=["Tracking"])
 
 @app.get("/")
 async def root():
@@ -50,4 +107,8 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "shakti-backend"}
\ No newline at end of file
+    return {"status": "healthy", "service": "shakti-backend"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
\ No newline at end of file
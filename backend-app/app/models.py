@@ -1,22 +1,27 @@
 from datetime import datetime
 from typing import List, Optional
 from pydantic import BaseModel, Field
+from pydantic_core import core_schema
 from bson import ObjectId
 
 class PyObjectId(ObjectId):
     @classmethod
-    def __get_validators__(cls):
-        yield cls.validate
+    def __get_pydantic_core_schema__(cls, source_type, handler):
+        # Kept as ObjectId for Mongo, rendered as a string in JSON
+        return core_schema.no_info_plain_validator_function(
+            cls.validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(str, when_used="json")
+        )
+    
+    @classmethod
+    def __get_pydantic_json_schema__(cls, schema, handler):
+        return {"type": "string"}
     
     @classmethod
     def validate(cls, v):
         if not ObjectId.is_valid(v):
             raise ValueError("Invalid objectid")
         return ObjectId(v)
-    
-    @classmethod
-    def __modify_schema__(cls, field_schema):
-        field_schema.update(type="string")
 
 class User(BaseModel):
     id: Optional[PyObjectId] = Field(default_factory=PyObjectId, alias="_id")
@@ -24,6 +29,7 @@ class User(BaseModel):
     phone: Optional[str] = None
     name: Optional[str] = None
     emergency_contacts: List[dict] = []
+    role: str = "user"  # user, admin (set directly in the database, never at signup)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
     class Config:
@@ -37,24 +43,33 @@ class RouteRequest(BaseModel):
     dest_lng: float
     mode: str = "walk"  # walk, bike, car
     time_of_day: Optional[str] = None
+    departure_time: Optional[datetime] = None  # defaults to now; naive values are taken as UTC
+    geometry: str = Field(default="coordinates", pattern="^(coordinates|polyline)$")  # coordinates, polyline
+    simplify_m: Optional[float] = Field(default=None, ge=0, le=100)  # Douglas-Peucker tolerance in metres
+
+class BatchRouteRequest(BaseModel):
+    routes: List[RouteRequest]
+    concurrency: int = Field(default=8, ge=1, le=32)  # parallel route fetches
 
 class RouteResponse(BaseModel):
     route_id: str
     safety_score: int
     distance: float
     duration: float
-    coordinates: List[List[float]]
+    coordinates: Optional[List[List[float]]] = None  # [lat, lng] pairs, unless a polyline was requested
+    polyline: Optional[str] = None  # Google encoded polyline, precision 5
     warnings: List[str]
     alternatives: List[dict]
 
 class CrimeData(BaseModel):
     id: Optional[PyObjectId] = Field(default_factory=PyObjectId, alias="_id")
-    lat: float
-    lng: float
+    lat: float = Field(ge=-90, le=90)
+    lng: float = Field(ge=-180, le=180)
     crime_type: str
-    severity: int  # 1-5
+    severity: int = Field(ge=1, le=5)
     reported_at: datetime
-    location_type: Optional[str]  # street, park, etc.
+    location_type: Optional[str] = None  # street, park, etc.
+    source_id: Optional[str] = None  # incident id in the source dataset
     
     class Config:
         arbitrary_types_allowed = True
@@ -69,4 +84,17 @@ class SOSAlert(BaseModel):
     contacted_authorities: bool = False
     
     class Config:
-        arbitrary_types_allowed = True
\ No newline at end of file
+        arbitrary_types_allowed = True
+
+class Journey(BaseModel):
+    id: Optional[PyObjectId] = Field(default_factory=PyObjectId, alias="_id")
+    user_id: str
+    user_email: str
+    share_token: str  # lets emergency contacts watch without an account
+    route: Optional[List[List[float]]] = None
+    started_at: datetime = Field(default_factory=datetime.utcnow)
+    ended_at: Optional[datetime] = None
+    status: str = "active"  # active, ended
+    
+    class Config:
+        arbitrary_types_allowed = True
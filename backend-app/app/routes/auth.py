@@ -1,20 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from app.database import db
 from app.schemas import UserCreate, UserLogin, Token, ContactCreate
 from app.models import User
+from app.utils.ttl_cache import TTLCache
+from app.utils.executors import ExecutorSaturated, hashing_executor
+from app.utils.json_response import FastJSONResponse
 from datetime import datetime, timedelta
+from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing; hashes made with other rounds are rehashed on the next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 # JWT settings
@@ -22,11 +34,28 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# Per-worker caches; short TTLs bound staleness after updates made on other workers
+token_cache = TTLCache(maxsize=4096, ttl=300)  # token -> email
+user_cache = TTLCache(maxsize=4096, ttl=30)  # email -> user document
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+# bcrypt takes ~100-300 ms per call, so it always runs on the hashing executor;
+# callers wait this long for a free slot before being told to retry
+HASH_WAIT_SECONDS = float(os.getenv("HASH_WAIT_SECONDS", "10"))
+
+async def verify_password(plain_password, hashed_password):
+    """Return (valid, new_hash); new_hash is set when the stored hash should be upgraded"""
+    return await hashing_executor.run(
+        pwd_context.verify_and_update, plain_password, hashed_password, wait=True, timeout=HASH_WAIT_SECONDS
+    )
+
+async def get_password_hash(password):
+    return await hashing_executor.run(pwd_context.hash, password, wait=True, timeout=HASH_WAIT_SECONDS)
+
+hashing_busy = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Sign-in is busy, please retry shortly",
+    headers={"Retry-After": "5"}
+)
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -38,24 +67,70 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+def invalidate_user(email: str):
+    """Drop a user from this worker's cache after their profile changes"""
+    user_cache.pop(email)
+
+def email_from_token(token: str) -> Optional[str]:
+    """Verify a JWT and return its subject email, or None when invalid"""
+    email = token_cache.get(token)
+    if email is not None:
+        return email
+    
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    email = payload.get("sub")
+    if email is None:
+        return None
+    
+    # Never cache a token past its own expiry
+    expires_in = payload.get("exp", 0) - time.time()
+    token_cache.set(token, email, ttl=min(token_cache.ttl, max(expires_in, 0)))
+    return email
+
+async def _resolve_user(request: Request, token: str, fresh: bool) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
+    
+    # A request never loads its user twice
+    current_user = getattr(request.state, "current_user", None)
+    if current_user is not None and (not fresh or request.state.current_user_fresh):
+        return current_user
+    
+    email = email_from_token(token)
+    if email is None:
         raise credentials_exception
     
-    user = await db.db.users.find_one({"email": email})
+    user = None if fresh else user_cache.get(email)
     if user is None:
-        raise credentials_exception
-    return User(**user)
+        user = await db.db.users.find_one({"email": email})
+        if user is None:
+            raise credentials_exception
+        user_cache.set(email, user)
+    
+    current_user = User(**user)
+    request.state.current_user = current_user
+    request.state.current_user_fresh = fresh or getattr(request.state, "current_user_fresh", False)
+    return current_user
+
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)):
+    return await _resolve_user(request, token, fresh=False)
+
+async def get_current_user_fresh(request: Request, token: str = Depends(oauth2_scheme)):
+    """Like get_current_user, but always reads the user document from the database"""
+    return await _resolve_user(request, token, fresh=True)
+
+async def get_current_admin(request: Request, token: str = Depends(oauth2_scheme)):
+    """Current user, who must have the admin role (read fresh, so a revoked role applies at once)"""
+    current_user = await _resolve_user(request, token, fresh=True)
+    if current_user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin role required")
+    return current_user
 
 @router.post("/signup", response_model=dict)
 async def signup(user_data: UserCreate):
@@ -68,7 +143,10 @@ async def signup(user_data: UserCreate):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    try:
+        hashed_password = await get_password_hash(user_data.password)
+    except ExecutorSaturated:
+        raise hashing_busy
     user = User(
         email=user_data.email,
         name=user_data.name,
@@ -89,23 +167,43 @@ async def signup(user_data: UserCreate):
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     user = await db.db.users.find_one({"email": form_data.username})
     
-    if not user or not verify_password(form_data.password, user.get("hashed_password", "")):
+    valid, new_hash = False, None
+    if user and user.get("hashed_password"):
+        try:
+            valid, new_hash = await verify_password(form_data.password, user["hashed_password"])
+        except ExecutorSaturated:
+            raise hashing_busy
+    
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Transparently upgrade hashes made with an older cost setting
+    if new_hash:
+        await db.db.users.update_one({"_id": user["_id"]}, {"$set": {"hashed_password": new_hash}})
+        invalidate_user(user["email"])
+    
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user["email"]}, expires_delta=access_token_expires
     )
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    return FastJSONResponse({"access_token": access_token, "token_type": "bearer"})
+
+@router.get("/hashing-stats")
+async def get_hashing_stats():
+    """
+    Get queue depth and throughput of the password hashing executor
+    """
+    return hashing_executor.metrics()
 
 @router.get("/me", response_model=User)
 async def get_current_user_info(current_user: User = Depends(get_current_user)):
-    return current_user
+    # Already validated when the user was resolved
+    return FastJSONResponse(current_user.model_dump(by_alias=True))
 
 @router.post("/contacts")
 async def add_emergency_contact(
@@ -116,4 +214,5 @@ async def add_emergency_contact(
         {"_id": current_user.id},
         {"$push": {"emergency_contacts": contact.dict()}}
     )
+    invalidate_user(current_user.email)
     return {"message": "Contact added successfully"}
\ No newline at end of file
@@ -0,0 +1,81 @@
+from fastapi import APIRouter, Depends, File, HTTPException, Request, Response, UploadFile
+from typing import Optional
+from app.database import db
+from app.models import User
+from app.routes.auth import get_current_admin
+from app.utils.crime_sync import crime_sync
+from app.utils.crime_ingest import PARSERS, detect_format, ingest
+from app.utils.heat_tiles import MAX_ZOOM, heat_tiles
+from app.utils.local_time import local_timezone
+from zoneinfo import ZoneInfoNotFoundError
+import io
+import os
+
+router = APIRouter()
+
+# Tiles are revalidated by ETag after this; invalidation happens server-side
+TILE_MAX_AGE = int(os.getenv("TILE_MAX_AGE", "60"))
+
+@router.get("/sync-status")
+async def get_sync_status():
+    """
+    Get freshness metrics for the in-memory crime index
+    """
+    return crime_sync.metrics()
+
+
+@router.get("/tiles/{z}/{x}/{y}.png")
+async def get_heat_tile(z: int, x: int, y: int, request: Request):
+    """
+    Get a crime density heat tile for map overlays
+    """
+    if not 0 <= z <= MAX_ZOOM or not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+        raise HTTPException(status_code=404, detail="Tile not found")
+    
+    tile = await heat_tiles.get(z, x, y)
+    etag = heat_tiles.etag(tile)
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={TILE_MAX_AGE}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=tile, media_type="image/png", headers=headers)
+
+@router.get("/tile-stats")
+async def get_tile_stats():
+    """
+    Get heat tile cache hits, renders and invalidations
+    """
+    return heat_tiles.metrics()
+
+@router.post("/ingest")
+async def ingest_crime_data(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    source: Optional[str] = None,
+    tz: Optional[str] = None,
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Bulk load a CSV, NDJSON or GeoJSON incident dataset (admins only: it changes every user's route scores).
+    Timestamps without an offset are local times in tz (an IANA name, default the deployment's timezone).
+    """
+    file_format = format or detect_format(file.filename or "")
+    if file_format not in PARSERS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format, expected one of: {', '.join(sorted(PARSERS))}")
+    try:
+        local_tz = local_timezone(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Unknown timezone: {tz}")
+    
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        return await ingest(
+            db.db.crime_data,
+            stream,
+            file_format,
+            source=source or file.filename or "upload",
+            local_tz=local_tz
+        )
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        stream.detach()
@@ -1,16 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Dict, List, Optional
 import requests
-from app.models import RouteRequest, RouteResponse
+from app.models import BatchRouteRequest, RouteRequest, RouteResponse
 from app.database import db
-from app.utils.safety_scoring import scorer
+from app.utils.safety_scoring import scorer, score_route, score_routes
 from app.utils.map_utils import get_route_from_osrm
-from datetime import datetime
+from app.utils.crime_index import crime_index
+from app.utils.hotspots import query_hotspots
+from app.utils.crime_proximity import CrimeArrays
+from app.utils.route_cache import route_cache
+from app.utils.graph_router import graph_router, route_paths
+from app.utils.executors import ExecutorSaturated, scoring_executor
+from app.utils.metrics import stage
+from app.utils.geometry import shape_geometry
+from app.utils.json_response import FastJSONResponse, dumps
+from app.utils.local_time import now_local, to_local
+from app.utils.risk_raster import bucket_time, hour_bucket
+from datetime import datetime, timezone
+import os
 import random
+import asyncio
+import time
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
 
-# Mock crime data (replace with real database queries)
+# Batch items queue this long for a scoring executor slot instead of failing when it is full
+BATCH_WAIT_SECONDS = float(os.getenv("BATCH_WAIT_SECONDS", "30"))
+
+# Mock crime data, used only while the crime_data collection is empty
 MOCK_CRIME_DATA = [
     {"lat": 28.6139, "lng": 77.2090, "crime_type": "theft", "severity": 2},
     {"lat": 28.6145, "lng": 77.2100, "crime_type": "harassment", "severity": 3},
@@ -23,89 +41,323 @@ async def calculate_safe_route(route_request: RouteRequest):
     """
     Calculate safe route between source and destination
     """
+    started = time.perf_counter()
+    time_of_day, when = _trip_time(route_request)
+    
+    # Repeated trips are served from the route cache
+    cache_key = route_cache.make_key(
+        route_request.source_lat,
+        route_request.source_lng,
+        route_request.dest_lat,
+        route_request.dest_lng,
+        route_request.mode,
+        scorer.time_key(time_of_day, when)
+    )
+    with stage("route_cache"):
+        cached = await route_cache.get(cache_key)
+    if cached is not None:
+        route_cache.record(True, time.perf_counter() - started)
+        return FastJSONResponse(_route_response(route_request, cached))
     
-    # Get route from OSRM (Open Source Routing Machine)
     try:
-        route_result = await get_route_from_osrm(
-            route_request.source_lat,
-            route_request.source_lng,
-            route_request.dest_lat,
-            route_request.dest_lng,
-            route_request.mode
-        )
+        with stage("route_fetch"):
+            route_result, graph_paths = await _fetch_route(route_request, time_of_day)
         
         if not route_result:
             raise HTTPException(status_code=400, detail="Could not find route")
         
-        # Calculate safety score
-        safety_score, warnings = scorer.calculate_safety_score(
-            route_coords=route_result["coordinates"],
-            crime_data=MOCK_CRIME_DATA,  # Replace with actual crime data query
-            time_of_day=route_request.time_of_day or self._get_time_of_day(),
-            route_type=route_request.mode
-        )
+        with stage("crime_fetch"):
+            crime_data = _crime_data_for(route_result["coordinates"])
         
-        # Generate alternative routes (simplified)
-        alternatives = self._generate_alternatives(
-            route_request.source_lat,
-            route_request.source_lng,
-            route_request.dest_lat,
-            route_request.dest_lng,
-            route_request.mode
-        )
+        # Calculate safety score (off the event loop)
+        with stage("scoring"):
+            safety_score, warnings = await scoring_executor.run(
+                score_route,
+                route_result["coordinates"],
+                crime_data,
+                time_of_day,
+                route_request.mode,
+                when
+            )
         
-        return RouteResponse(
-            route_id=f"route_{datetime.now().timestamp()}",
-            safety_score=safety_score,
-            distance=route_result["distance"],
-            duration=route_result["duration"],
-            coordinates=route_result["coordinates"],
-            warnings=warnings,
-            alternatives=alternatives[:2]  # Return top 2 alternatives
-        )
+        # Alternatives: balanced and safest graph paths, or the simplified mock
+        with stage("alternatives"):
+            if graph_paths:
+                alternatives = await _score_alternatives(graph_paths[1:], time_of_day, route_request.mode, when)
+            else:
+                alternatives = _generate_alternatives(
+                    route_request.source_lat,
+                    route_request.source_lng,
+                    route_request.dest_lat,
+                    route_request.dest_lng,
+                    route_request.mode
+                )
+        
+        # Cached at full resolution; the requested geometry format is applied per response
+        result = {
+            "safety_score": safety_score,
+            "distance": route_result["distance"],
+            "duration": route_result["duration"],
+            "coordinates": route_result["coordinates"],
+            "warnings": warnings,
+            "alternatives": alternatives[:2]  # Return top 2 alternatives
+        }
+        
+        # Invalidation area covers the alternatives as well as the main route
+        with stage("route_cache"):
+            await route_cache.set(
+                cache_key,
+                result,
+                result["coordinates"] + [coord for alt in result["alternatives"] for coord in alt["coordinates"]],
+                scorer.crime_radius_m
+            )
+        
+        with stage("serialization"):
+            response = FastJSONResponse(_route_response(route_request, result))
+        route_cache.record(False, time.perf_counter() - started)
+        return response
         
+    except HTTPException:
+        raise
+    except ExecutorSaturated:
+        raise HTTPException(status_code=429, detail="Route scoring is busy, please retry shortly")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/calculate/batch")
+async def calculate_safe_routes_batch(batch_request: BatchRouteRequest):
+    """
+    Score many routes, streaming one NDJSON line per route as it completes
+    """
+    async def ndjson_lines():
+        async for result in score_routes_batch(batch_request.routes, batch_request.concurrency):
+            yield dumps(result, newline=True)
+    
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+async def score_routes_batch(
+    route_requests: List[RouteRequest],
+    concurrency: int = 8
+) -> AsyncIterator[Dict]:
+    """
+    Fetch routes with bounded parallelism and yield scored results as they finish.
+    
+    Every wave of fetches that completes together is scored in one
+    vectorized pass over the crime data.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def fetch(index, route_request):
+        time_of_day, when = _trip_time(route_request)
+        async with semaphore:
+            try:
+                route_result, _ = await _fetch_route(route_request, time_of_day, wait=True)
+                return index, route_request, (time_of_day, when), route_result, None
+            except Exception as e:
+                return index, route_request, (time_of_day, when), None, str(e)
+    
+    pending = {
+        asyncio.create_task(fetch(index, route_request))
+        for index, route_request in enumerate(route_requests)
+    }
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            wave = [task.result() for task in done]
+            
+            for index, _, _, route_result, error in wave:
+                if not route_result:
+                    yield {"index": index, "error": error or "Could not find route"}
+            
+            found = [item for item in wave if item[3]]
+            if not found:
+                continue
+            
+            # One scoring pass per departure time in the wave (usually just one)
+            by_time = {}
+            for item in found:
+                by_time.setdefault(item[2], []).append(item)
+            
+            scored = []
+            for (time_of_day, when), items in by_time.items():
+                routes = [route_result["coordinates"] for _, _, _, route_result, _ in items]
+                try:
+                    scores = await scoring_executor.run(
+                        score_routes,
+                        routes,
+                        _crime_data_for_routes(routes),
+                        [time_of_day] * len(items),
+                        [route_request.mode for _, route_request, _, _, _ in items],
+                        when,
+                        wait=True,
+                        timeout=BATCH_WAIT_SECONDS
+                    )
+                except ExecutorSaturated:
+                    for index, *_ in items:
+                        yield {"index": index, "error": "Route scoring is busy, please retry shortly"}
+                    continue
+                scored.extend(zip(items, scores))
+            
+            for (index, route_request, _, route_result, _), (safety_score, warnings) in scored:
+                yield {
+                    "index": index,
+                    "safety_score": safety_score,
+                    "distance": route_result["distance"],
+                    "duration": route_result["duration"],
+                    **shape_geometry(route_result["coordinates"], route_request.geometry, route_request.simplify_m),
+                    "warnings": warnings
+                }
+    finally:
+        for task in pending:
+            task.cancel()
+
+@router.get("/scoring-stats")
+async def get_scoring_stats():
+    """
+    Get queue depth and throughput of the scoring executor
+    """
+    return scoring_executor.metrics()
+
+@router.get("/cache-stats")
+async def get_route_cache_stats():
+    """
+    Get route cache hit ratio and latency savings
+    """
+    return route_cache.metrics()
+
 @router.get("/crime-hotspots")
 async def get_crime_hotspots(
     ne_lat: float, ne_lng: float,
-    sw_lat: float, sw_lng: float
+    sw_lat: float, sw_lng: float,
+    zoom: int = Query(default=12, ge=0, le=22),
+    cursor: Optional[str] = None,
+    limit: int = Query(default=500, ge=1, le=2000)
 ):
     """
-    Get crime hotspots in a bounding box
+    Get crime hotspots in a bounding box, clustered into a zoom-aware grid.
+
+    Each hotspot is a grid cell (centroid, incident count, severity sum and
+    max), not a single incident, so the per-incident "type" field of earlier
+    responses is gone: a cell mixes crime types.
+    """
+    if sw_lat > ne_lat or sw_lng > ne_lng:
+        raise HTTPException(status_code=400, detail="Bounding box corners are inverted")
+    
+    try:
+        return FastJSONResponse(await query_hotspots(
+            db.db.crime_data, sw_lat, sw_lng, ne_lat, ne_lng, zoom, cursor, limit
+        ))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def _fetch_route(route_request: RouteRequest, time_of_day: str, wait: bool = False):
+    """
+    Main route plus any graph paths, from the offline road graph when loaded,
+    otherwise OSRM. With wait=True (batch items) graph routing queues for a
+    scoring slot for up to BATCH_WAIT_SECONDS instead of raising ExecutorSaturated.
     """
-    # Query crime data in the bounding box
-    crimes = await db.db.crime_data.find({
-        "lat": {"$gte": sw_lat, "$lte": ne_lat},
-        "lng": {"$gte": sw_lng, "$lte": ne_lng}
-    }).to_list(100)
+    graph_paths = []
+    if graph_router.loaded:
+        with stage("graph_route"):
+            graph_paths = await scoring_executor.run(
+                route_paths,
+                route_request.source_lat,
+                route_request.source_lng,
+                route_request.dest_lat,
+                route_request.dest_lng,
+                time_of_day,
+                route_request.mode,
+                wait=wait,
+                timeout=BATCH_WAIT_SECONDS if wait else None
+            )
+    
+    if graph_paths:
+        return graph_paths[0], graph_paths
+    
+    # OSRM (Open Source Routing Machine)
+    with stage("osrm_fetch"):
+        route_result = await get_route_from_osrm(
+            route_request.source_lat,
+            route_request.source_lng,
+            route_request.dest_lat,
+            route_request.dest_lng,
+            route_request.mode
+        )
+    return route_result, graph_paths
+
+def _route_response(route_request: RouteRequest, result: Dict) -> Dict:
+    """
+    RouteResponse body for a scored route in the request's geometry format,
+    leaving the cached result untouched. Built as a plain dict: the scored
+    result is trusted, so it skips model construction and re-validation.
+    """
+    def shape(coords):
+        return shape_geometry(coords, route_request.geometry, route_request.simplify_m)
     
     return {
-        "count": len(crimes),
-        "hotspots": [
-            {
-                "lat": crime["lat"],
-                "lng": crime["lng"],
-                "severity": crime.get("severity", 1),
-                "type": crime.get("crime_type", "unknown")
-            }
-            for crime in crimes
+        "route_id": f"route_{datetime.now().timestamp()}",
+        "safety_score": result["safety_score"],
+        "distance": result["distance"],
+        "duration": result["duration"],
+        **shape(result["coordinates"]),
+        "warnings": result["warnings"],
+        "alternatives": [
+            {**{key: value for key, value in alt.items() if key != "coordinates"}, **shape(alt["coordinates"])}
+            for alt in result["alternatives"]
         ]
     }
 
-def _get_time_of_day(self):
-    hour = datetime.now().hour
-    if 6 <= hour < 12:
-        return "day"
-    elif 12 <= hour < 18:
-        return "afternoon"
-    elif 18 <= hour < 22:
-        return "evening"
-    else:
-        return "night"
-
-def _generate_alternatives(self, src_lat, src_lng, dest_lat, dest_lng, mode):
+def _crime_data_for(route_coords):
+    """Crimes near the route's bounding box (mock data while the collection is empty)"""
+    if len(crime_index):
+        return crime_index.query_route(route_coords, scorer.crime_radius_m)
+    return CrimeArrays.from_records(MOCK_CRIME_DATA)
+
+def _crime_data_for_routes(routes):
+    """Crimes near any of the routes, queried per route rather than over their combined bounding box"""
+    if len(crime_index):
+        return crime_index.query_routes(routes, scorer.crime_radius_m)
+    return CrimeArrays.from_records(MOCK_CRIME_DATA)
+
+async def _score_alternatives(paths, time_of_day, mode, when=None):
+    routes = [path["coordinates"] for path in paths]
+    scores = await scoring_executor.run(
+        score_routes,
+        routes,
+        _crime_data_for_routes(routes),
+        [time_of_day] * len(routes),
+        [mode] * len(routes),
+        when
+    )
+    return [
+        {
+            "safety_score": safety_score,
+            "distance": path["distance"],
+            "duration": path["duration"],
+            "coordinates": path["coordinates"],
+            "description": path["description"]
+        }
+        for path, (safety_score, _) in zip(paths, scores)
+    ]
+
+def _trip_time(route_request: RouteRequest):
+    """
+    Time-of-day bucket and departure time of a request, defaulting to now.
+    The bucket follows the departure's own wall clock, or the deployment's
+    local one for naive (UTC) departures and for now. The time is kept
+    timezone-aware so week_slot finds the raster's UTC slot.
+    """
+    if route_request.departure_time is not None:
+        when = route_request.departure_time
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+            return route_request.time_of_day or hour_bucket(to_local(when).hour), when
+        return route_request.time_of_day or hour_bucket(when.hour), when
+    now = now_local()
+    time_of_day = route_request.time_of_day or hour_bucket(now.hour)
+    return time_of_day, bucket_time(time_of_day, now)
+
+def _generate_alternatives(src_lat, src_lng, dest_lat, dest_lng, mode):
     """Generate alternative routes (simplified mock)"""
     alternatives = []
     
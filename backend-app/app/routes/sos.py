@@ -2,15 +2,19 @@ from fastapi import APIRouter, Depends, HTTPException
 from app.models import SOSAlert, User
 from app.schemas import SOSCreate
 from app.database import db
+from app.routes.auth import get_current_user, get_current_user_fresh
+from app.utils.sos_dispatch import sos_dispatcher
+from app.utils.smtp_pool import smtp_pool
+from app.utils.json_response import FastJSONResponse
+from bson import ObjectId
 from datetime import datetime
-import smtplib
 from email.mime.text import MIMEText
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
 
 async def send_sms_alert(phone: str, message: str):
     """Send SMS alert (mock implementation)"""
@@ -24,7 +28,7 @@ async def send_email_alert(email: str, subject: str, message: str):
         sender_email = os.getenv("SMTP_EMAIL")
         sender_password = os.getenv("SMTP_PASSWORD")
         
-        if not sender_email or not sender_password:
+        if not sender_email or not (sender_password or os.getenv("SMTP_HOST")):
             print(f"[EMAIL ALERT to {email}]: {subject} - {message}")
             return True
         
@@ -33,9 +37,8 @@ async def send_email_alert(email: str, subject: str, message: str):
         msg['From'] = sender_email
         msg['To'] = email
         
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
+        # Pooled, kept-alive connection; batches with other queued alert emails
+        await smtp_pool.send(msg)
         
         return True
     except Exception as e:
@@ -45,7 +48,7 @@ async def send_email_alert(email: str, subject: str, message: str):
 @router.post("/trigger")
 async def trigger_sos(
     sos_data: SOSCreate,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user_fresh)
 ):
     """
     Trigger SOS alert and notify emergency contacts
@@ -62,9 +65,8 @@ async def trigger_sos(
     result = await db.db.sos_alerts.insert_one(sos_alert.dict(by_alias=True))
     sos_id = str(result.inserted_id)
     
-    # Get user's emergency contacts
-    user = await db.db.users.find_one({"_id": current_user.id})
-    contacts = user.get("emergency_contacts", [])
+    # Emergency contacts come from the user document loaded for this request
+    contacts = current_user.emergency_contacts
     
     # Create alert message
     map_link = f"https://maps.google.com/?q={sos_data.lat},{sos_data.lng}"
@@ -82,33 +84,71 @@ Message: {sos_data.message or 'No additional message provided'}
 Please check on them immediately and contact local authorities if needed.
 """
     
-    # Notify emergency contacts
+    # Queue notifications; the dispatcher fans them out in the background
+    jobs = []
     notified_contacts = []
     for contact in contacts:
-        # Send SMS
         if contact.get("phone"):
-            await send_sms_alert(contact["phone"], alert_message)
+            jobs.append({
+                "channel": "sms",
+                "recipient": contact["phone"],
+                "contact_name": contact.get("name"),
+                "message": alert_message
+            })
         
-        # Send email (if available)
         if contact.get("email"):
-            await send_email_alert(
-                contact["email"],
-                "🚨 EMERGENCY: SOS Alert from SHAKTI App",
-                alert_message
-            )
+            jobs.append({
+                "channel": "email",
+                "recipient": contact["email"],
+                "contact_name": contact.get("name"),
+                "subject": "🚨 EMERGENCY: SOS Alert from SHAKTI App",
+                "message": alert_message
+            })
         
         notified_contacts.append(contact.get("name", "Unknown"))
     
     # Notify authorities (mock - integrate with real API)
-    await notify_authorities(sos_data.lat, sos_data.lng, current_user)
+    jobs.append({
+        "channel": "authority",
+        "recipient": "authorities",
+        "lat": sos_data.lat,
+        "lng": sos_data.lng,
+        "user_email": current_user.email
+    })
+    
+    await sos_dispatcher.enqueue(result.inserted_id, jobs)
     
-    return {
+    return FastJSONResponse({
         "success": True,
         "sos_id": sos_id,
         "message": "SOS alert triggered successfully",
         "notified_contacts": notified_contacts,
+        "dispatch_status": "queued",
         "map_link": map_link
-    }
+    })
+
+@router.get("/{sos_id}/status")
+async def get_sos_status(
+    sos_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get delivery status of every notification for an SOS alert
+    """
+    if not ObjectId.is_valid(sos_id):
+        raise HTTPException(status_code=404, detail="SOS alert not found")
+    
+    alert = await db.db.sos_alerts.find_one(
+        {"_id": ObjectId(sos_id), "user_id": str(current_user.id)}
+    )
+    if not alert:
+        raise HTTPException(status_code=404, detail="SOS alert not found")
+    
+    return FastJSONResponse({
+        "sos_id": sos_id,
+        "status": alert.get("status", "active"),
+        "deliveries": list(alert.get("deliveries", {}).values())
+    })
 
 @router.get("/history")
 async def get_sos_history(
@@ -122,10 +162,11 @@ async def get_sos_history(
         {"user_id": str(current_user.id)}
     ).sort("timestamp", -1).limit(limit).to_list(limit)
     
-    return {
+    # ObjectId and datetime values are encoded by FastJSONResponse directly
+    return FastJSONResponse({
         "alerts": [
             {
-                "id": str(alert["_id"]),
+                "id": alert["_id"],
                 "lat": alert["lat"],
                 "lng": alert["lng"],
                 "timestamp": alert["timestamp"],
@@ -133,13 +174,27 @@ async def get_sos_history(
             }
             for alert in alerts
         ]
-    }
+    })
 
-async def notify_authorities(lat: float, lng: float, user: User):
+async def notify_authorities(lat: float, lng: float, user_email: str):
     """Notify local authorities (mock implementation)"""
     # In production, integrate with local police/emergency APIs
-    print(f"[AUTHORITY ALERT]: SOS at {lat}, {lng} for user {user.email}")
+    print(f"[AUTHORITY ALERT]: SOS at {lat}, {lng} for user {user_email}")
     
     # This would call actual emergency services API
     # Example: India emergency number 112 API
     return True
+
+# Outbox senders, one per notification channel
+async def _deliver_sms(job):
+    return await send_sms_alert(job["recipient"], job["message"])
+
+async def _deliver_email(job):
+    return await send_email_alert(job["recipient"], job["subject"], job["message"])
+
+async def _deliver_authority(job):
+    return await notify_authorities(job["lat"], job["lng"], job["user_email"])
+
+sos_dispatcher.register("sms", _deliver_sms)
+sos_dispatcher.register("email", _deliver_email)
+sos_dispatcher.register("authority", _deliver_authority)
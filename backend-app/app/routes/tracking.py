@@ -0,0 +1,253 @@
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from app.models import Journey, User
+from app.schemas import JourneyCreate
+from app.database import db
+from app.routes.auth import email_from_token, get_current_user
+from app.utils.location_hub import location_hub
+from app.utils.journey_monitor import JourneyMonitor
+from bson import ObjectId
+from datetime import datetime
+from typing import Dict, List, Optional
+import asyncio
+import json
+import os
+import secrets
+import time
+
+router = APIRouter()
+
+# Close codes sent before accepting an unauthorized socket
+WS_UNAUTHORIZED = 4401
+WS_FORBIDDEN = 4403
+
+# Positions accepted per tracker message; a longer offline backlog keeps its newest points
+MAX_POINTS_PER_MESSAGE = int(os.getenv("TRACKING_MAX_POINTS_PER_MESSAGE", "100"))
+
+# How often a tracker re-reads its journey's status, for journeys ended through another worker
+STATUS_CHECK_SECONDS = float(os.getenv("TRACKING_STATUS_CHECK_SECONDS", "10"))
+
+async def _find_journey(journey_id: str) -> Optional[Dict]:
+    if not ObjectId.is_valid(journey_id):
+        return None
+    return await db.db.journeys.find_one({"_id": ObjectId(journey_id)})
+
+def _client_time(ts) -> datetime:
+    """A client timestamp (epoch ms), or now when it is missing or out of range"""
+    if isinstance(ts, (int, float)) and not isinstance(ts, bool):
+        try:
+            return datetime.utcfromtimestamp(ts / 1000)
+        except (OverflowError, OSError, ValueError):
+            pass
+    return datetime.utcnow()
+
+def _parse_points(message: str, limit: int = MAX_POINTS_PER_MESSAGE) -> List[Dict]:
+    """Positions from a tracker message: one {"lat", "lng", ...} object or a list of at most limit of them"""
+    try:
+        data = json.loads(message)
+    except json.JSONDecodeError:
+        return []
+
+    points = []
+    for item in data[-limit:] if isinstance(data, list) else [data]:
+        if not isinstance(item, dict):
+            continue
+        lat, lng = item.get("lat"), item.get("lng")
+        if not isinstance(lat, (int, float)) or not isinstance(lng, (int, float)):
+            continue
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            continue
+
+        # Client timestamps (epoch ms) keep order for points queued while offline
+        points.append({
+            "lat": float(lat),
+            "lng": float(lng),
+            "accuracy": item.get("accuracy") if isinstance(item.get("accuracy"), (int, float)) else None,
+            "ts": _client_time(item.get("ts"))
+        })
+    return points
+
+def _watcher_message(point: Dict) -> str:
+    if "alert" in point:
+        return json.dumps({"type": "alert", **point, "ts": point["ts"].isoformat()})
+    return json.dumps({
+        "type": "position",
+        "lat": point["lat"],
+        "lng": point["lng"],
+        "accuracy": point["accuracy"],
+        "ts": point["ts"].isoformat()
+    })
+
+@router.post("/journeys")
+async def start_journey(
+    journey_data: Optional[JourneyCreate] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Start a journey and get the share token for emergency contacts
+    """
+    journey = Journey(
+        user_id=str(current_user.id),
+        user_email=current_user.email,
+        share_token=secrets.token_urlsafe(24),
+        route=journey_data.route_coordinates if journey_data else None
+    )
+    result = await db.db.journeys.insert_one(journey.dict(by_alias=True))
+    journey_id = str(result.inserted_id)
+
+    return {
+        "journey_id": journey_id,
+        "share_token": journey.share_token,
+        "track_url": f"/tracking/ws/{journey_id}",
+        "watch_url": f"/tracking/ws/{journey_id}/watch?share_token={journey.share_token}"
+    }
+
+@router.post("/journeys/{journey_id}/end")
+async def end_journey(journey_id: str, current_user: User = Depends(get_current_user)):
+    """
+    End a journey and disconnect its watchers
+    """
+    journey = await _find_journey(journey_id)
+    if not journey or journey["user_id"] != str(current_user.id):
+        raise HTTPException(status_code=404, detail="Journey not found")
+
+    await db.db.journeys.update_one(
+        {"_id": journey["_id"]},
+        {"$set": {"status": "ended", "ended_at": datetime.utcnow()}}
+    )
+    location_hub.end(journey_id)
+    return {"message": "Journey ended"}
+
+@router.get("/journeys/{journey_id}/points")
+async def get_journey_points(journey_id: str, share_token: str, limit: int = 500):
+    """
+    Get the most recent positions of a journey
+    """
+    journey = await _find_journey(journey_id)
+    if not journey or not secrets.compare_digest(journey["share_token"], share_token):
+        raise HTTPException(status_code=404, detail="Journey not found")
+
+    points = await db.db.location_points.find(
+        {"journey.journey_id": journey_id}
+    ).sort("ts", -1).limit(limit).to_list(limit)
+
+    # A retried flush can store a point twice (time-series collections allow duplicate _ids)
+    unique = {}
+    for point in points:
+        unique.setdefault(point["_id"], point)
+    points = list(unique.values())
+
+    return {
+        "journey_id": journey_id,
+        "status": journey["status"],
+        "points": [
+            {"lat": point["lat"], "lng": point["lng"], "accuracy": point.get("accuracy"), "ts": point["ts"]}
+            for point in reversed(points)
+        ]
+    }
+
+@router.get("/stats")
+async def get_tracking_stats():
+    """
+    Get live tracking fan-out and persistence metrics for this worker
+    """
+    return location_hub.metrics()
+
+@router.websocket("/ws/{journey_id}")
+async def track_journey(websocket: WebSocket, journey_id: str, token: str):
+    """
+    Stream positions of an active journey (JWT passed as ?token=, as browsers cannot set headers)
+    """
+    email = email_from_token(token)
+    if email is None:
+        await websocket.close(code=WS_UNAUTHORIZED)
+        return
+
+    journey = await _find_journey(journey_id)
+    if not journey or journey["user_email"] != email or journey["status"] != "active":
+        await websocket.close(code=WS_FORBIDDEN)
+        return
+
+    await websocket.accept()
+    meta = {"journey_id": journey_id, "user_id": journey["user_id"]}
+    monitor = None
+    ended = location_hub.track(journey_id)
+
+    async def close_when_ended():
+        await ended.wait()
+        await websocket.close()
+
+    closer = asyncio.create_task(close_when_ended())
+    checked_at = time.monotonic()
+    try:
+        while True:
+            message = await websocket.receive_text()
+            if ended.is_set():
+                break
+            if time.monotonic() - checked_at >= STATUS_CHECK_SECONDS:
+                checked_at = time.monotonic()
+                current = await db.db.journeys.find_one({"_id": journey["_id"]}, {"status": 1})
+                if not current or current["status"] != "active":
+                    ended.set()
+                    break
+
+            for point in _parse_points(message):
+                point["journey"] = meta
+                location_hub.publish(journey_id, point)
+
+                # Route deviation and risk-zone checks, alerting the user and their watchers
+                if monitor is None:
+                    monitor = JourneyMonitor(journey.get("route"), (point["lat"], point["lng"]))
+                for event in monitor.update(point["lat"], point["lng"]):
+                    event["ts"] = point["ts"]
+                    location_hub.notify(journey_id, event)
+                    await websocket.send_text(_watcher_message(event))
+                    await db.db.journeys.update_one({"_id": journey["_id"]}, {"$push": {"alerts": event}})
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError is raised once the journey ended and the socket was closed
+        pass
+    finally:
+        location_hub.untrack(journey_id, ended)
+        if ended.is_set():
+            # Let the closer finish closing the socket of an ended journey
+            await asyncio.gather(closer, return_exceptions=True)
+        else:
+            closer.cancel()
+
+@router.websocket("/ws/{journey_id}/watch")
+async def watch_journey(websocket: WebSocket, journey_id: str, share_token: str):
+    """
+    Receive live positions of a journey shared with an emergency contact
+    """
+    journey = await _find_journey(journey_id)
+    if not journey or not secrets.compare_digest(journey["share_token"], share_token):
+        await websocket.close(code=WS_FORBIDDEN)
+        return
+
+    await websocket.accept()
+    if journey["status"] != "active":
+        await websocket.send_text(json.dumps({"type": "ended"}))
+        await websocket.close()
+        return
+
+    queue = location_hub.subscribe(journey_id)
+
+    async def forward():
+        while True:
+            point = await queue.get()
+            if point is None:
+                await websocket.send_text(json.dumps({"type": "ended"}))
+                await websocket.close()
+                return
+            await websocket.send_text(_watcher_message(point))
+
+    sender = asyncio.create_task(forward())
+    try:
+        # Watchers send nothing; this only waits for the disconnect
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    except RuntimeError:
+        # Raised when the sender already closed the socket
+        pass
+    finally:
+        sender.cancel()
+        location_hub.unsubscribe(journey_id, queue)
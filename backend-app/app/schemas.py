@@ -1,5 +1,8 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field
+from typing import Annotated, Optional, List, Tuple
+
+# A [lat, lng] pair
+LatLng = Tuple[Annotated[float, Field(ge=-90, le=90)], Annotated[float, Field(ge=-180, le=180)]]
 
 class UserCreate(BaseModel):
     email: EmailStr
@@ -26,4 +29,7 @@ class ContactCreate(BaseModel):
 class SOSCreate(BaseModel):
     lat: float
     lng: float
-    message: Optional[str] = ""
\ No newline at end of file
+    message: Optional[str] = ""
+
+class JourneyCreate(BaseModel):
+    route_coordinates: Optional[List[LatLng]] = None  # planned route, e.g. from /routes/calculate
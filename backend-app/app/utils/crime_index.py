@@ -0,0 +1,155 @@
+from typing import Dict, List, Optional, Tuple
+import math
+import zlib
+from app.utils.crime_proximity import CrimeArrays, METERS_PER_DEGREE
+
+# Fields kept in memory for every incident
+CRIME_PROJECTION = {
+    "lat": 1,
+    "lng": 1,
+    "crime_type": 1,
+    "severity": 1,
+    "reported_at": 1
+}
+
+
+class CrimeIndex:
+    """
+    Process-local grid index over the crime_data collection.
+
+    Incidents are bucketed into fixed-size lat/lng cells so a query only
+    touches the cells overlapping its bounding box, independent of the
+    total number of incidents loaded.
+    """
+
+    def __init__(self, cell_size_deg: float = 0.01):
+        self.cell_size = cell_size_deg  # ~1.1 km of latitude
+        self.cells: Dict[Tuple[int, int], Dict[str, Dict]] = {}
+        self.crime_cells: Dict[str, Tuple[int, int]] = {}
+        # Bumped on every change, so callers caching query results know to refresh
+        self.generation = 0
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_size), math.floor(lng / self.cell_size))
+
+    def upsert(self, crime: Dict):
+        """Insert or replace a single incident"""
+        crime_id = str(crime["_id"])
+        self.remove(crime_id)
+        if crime.get("lat") is None or crime.get("lng") is None:
+            return
+        self.generation += 1
+
+        record = {
+            "_id": crime_id,
+            "lat": float(crime["lat"]),
+            "lng": float(crime["lng"]),
+            "crime_type": crime.get("crime_type", "other"),
+            "severity": crime.get("severity", 1),
+            "reported_at": crime.get("reported_at")
+        }
+        cell = self._cell(record["lat"], record["lng"])
+        self.cells.setdefault(cell, {})[crime_id] = record
+        self.crime_cells[crime_id] = cell
+
+    def remove(self, crime_id) -> Optional[Dict]:
+        """Remove an incident by id, returning the stored record if present"""
+        crime_id = str(crime_id)
+        cell = self.crime_cells.pop(crime_id, None)
+        if cell is None:
+            return None
+
+        self.generation += 1
+        bucket = self.cells[cell]
+        record = bucket.pop(crime_id, None)
+        if not bucket:
+            del self.cells[cell]
+        return record
+
+    def clear(self):
+        self.cells = {}
+        self.crime_cells = {}
+        self.generation += 1
+
+    async def load(self, collection):
+        """Load every incident from a Motor collection, replacing current contents"""
+        self.clear()
+        async for crime in collection.find({}, CRIME_PROJECTION, batch_size=10000):
+            self.upsert(crime)
+        print(f"Loaded {len(self)} crime incidents into spatial index")
+
+    def query_bbox(
+        self,
+        sw_lat: float,
+        sw_lng: float,
+        ne_lat: float,
+        ne_lng: float,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """Return incidents inside a bounding box"""
+        min_row, min_col = self._cell(sw_lat, sw_lng)
+        max_row, max_col = self._cell(ne_lat, ne_lng)
+
+        # Large boxes (low-zoom map tiles) walk the occupied cells instead of the whole range
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self.cells):
+            cells = [
+                cell for cell in self.cells
+                if min_row <= cell[0] <= max_row and min_col <= cell[1] <= max_col
+            ]
+        else:
+            cells = [
+                (row, col)
+                for row in range(min_row, max_row + 1)
+                for col in range(min_col, max_col + 1)
+            ]
+
+        results = []
+        for cell in cells:
+            for record in self.cells.get(cell, {}).values():
+                if sw_lat <= record["lat"] <= ne_lat and sw_lng <= record["lng"] <= ne_lng:
+                    results.append(record)
+                    if limit is not None and len(results) >= limit:
+                        return results
+        return results
+
+    def query_route(self, route_coords: List[List[float]], buffer_m: float) -> CrimeArrays:
+        """Return incidents inside the route's bounding box grown by buffer_m"""
+        if not route_coords:
+            return CrimeArrays.from_records([])
+        return CrimeArrays.from_records(self.query_bbox(*self._route_bbox(route_coords, buffer_m)))
+
+    def query_routes(self, routes: List[List[List[float]]], buffer_m: float) -> CrimeArrays:
+        """
+        Return incidents near any of several routes: the union of each route's
+        own box, not one box around them all, which for routes far apart would
+        pull in everything between them
+        """
+        records = {}
+        for route_coords in routes:
+            if route_coords:
+                for record in self.query_bbox(*self._route_bbox(route_coords, buffer_m)):
+                    records[record["_id"]] = record
+        return CrimeArrays.from_records(list(records.values()))
+
+    def _route_bbox(self, route_coords: List[List[float]], buffer_m: float) -> Tuple[float, float, float, float]:
+        lats = [coord[0] for coord in route_coords]
+        lngs = [coord[1] for coord in route_coords]
+        lat_pad = buffer_m / METERS_PER_DEGREE
+        max_abs_lat = min(max(abs(lat) for lat in lats) + 1.0, 89.0)
+        lng_pad = lat_pad / math.cos(math.radians(max_abs_lat))
+
+        return min(lats) - lat_pad, min(lngs) - lng_pad, max(lats) + lat_pad, max(lngs) + lng_pad
+
+    def fingerprint(self) -> str:
+        """Order-independent digest of every incident's id, position and severity"""
+        total = 0
+        for bucket in self.cells.values():
+            for crime_id, record in bucket.items():
+                total += zlib.crc32(f"{crime_id}:{record['lat']}:{record['lng']}:{record['severity']}".encode())
+        return f"{len(self)}-{total:x}"
+
+    def __len__(self) -> int:
+        return len(self.crime_cells)
+
+
+crime_index = CrimeIndex()
@@ -0,0 +1,290 @@
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, tzinfo
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, TextIO
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from app.models import CrimeData
+from app.utils.db_indexes import crime_location
+from app.utils.local_time import from_local, local_timezone
+from app.utils.safety_scoring import scorer
+
+# Source column names accepted for each CrimeData field (compared lower-cased)
+FIELD_ALIASES = {
+    "lat": ["lat", "latitude", "y"],
+    "lng": ["lng", "lon", "long", "longitude", "x"],
+    "crime_type": ["crime_type", "type", "category", "primary type", "offense", "offence"],
+    "severity": ["severity"],
+    "reported_at": ["reported_at", "date", "datetime", "occurred_at", "timestamp"],
+    "location_type": ["location_type", "location description", "premise"],
+    "source_id": ["source_id", "id", "incident_id", "case number", "case_number"]
+}
+
+DATE_FORMATS = ["%m/%d/%Y %I:%M:%S %p", "%d/%m/%Y %H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d"]
+
+# Invalid rows reported back in full; the rest are only counted
+MAX_REPORTED_ERRORS = 20
+
+
+def iter_csv(stream: TextIO) -> Iterator[Dict]:
+    yield from csv.DictReader(stream)
+
+
+def _feature_row(feature: Dict) -> Dict:
+    """Flatten a GeoJSON point feature into a row of properties plus lat/lng"""
+    row = dict(feature.get("properties") or {})
+    geometry = feature.get("geometry") or {}
+    if geometry.get("type") == "Point":
+        row["lng"], row["lat"] = geometry["coordinates"][:2]
+    return row
+
+
+def iter_ndjson(stream: TextIO) -> Iterator[Dict]:
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            # An empty row fails validation and is counted as invalid
+            row = {}
+        yield _feature_row(row) if row.get("type") == "Feature" else row
+
+
+def iter_geojson(stream: TextIO, chunk_size: int = 1 << 16) -> Iterator[Dict]:
+    """
+    Stream features out of a GeoJSON FeatureCollection without loading the
+    whole document, decoding one feature object at a time.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos = "", 0
+
+    def fill() -> bool:
+        nonlocal buffer, pos
+        data = stream.read(chunk_size)
+        buffer, pos = buffer[pos:] + data, 0
+        return bool(data)
+
+    # Skip to the opening bracket of the "features" array
+    while True:
+        key = buffer.find('"features"')
+        bracket = buffer.find("[", key) if key >= 0 else -1
+        if bracket >= 0:
+            pos = bracket + 1
+            break
+        if not fill():
+            return
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+        if pos == len(buffer):
+            if not fill():
+                return
+            continue
+        if buffer[pos] == "]":
+            return
+        try:
+            feature, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if not fill():
+                raise ValueError("Truncated GeoJSON feature collection")
+            continue
+        yield _feature_row(feature)
+
+
+PARSERS = {"csv": iter_csv, "ndjson": iter_ndjson, "geojson": iter_geojson}
+
+
+def detect_format(filename: str) -> str:
+    extension = os.path.splitext(filename)[1].lower().lstrip(".")
+    return {"jsonl": "ndjson", "json": "geojson"}.get(extension, extension)
+
+
+def _parse_date(value, local_tz: Optional[tzinfo] = None) -> Optional[datetime]:
+    """
+    Naive UTC, as Mongo returns datetimes. Offset-aware values are converted;
+    naive ones are local times on local_tz (None: the server's timezone).
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return from_local(value, local_tz)
+    return _parse_date_string(str(value).strip(), local_tz)
+
+
+# Police datasets repeat timestamps heavily, and strptime dominates parsing time
+@lru_cache(maxsize=65536)
+def _parse_date_string(value: str, local_tz: Optional[tzinfo] = None) -> Optional[datetime]:
+    try:
+        return from_local(datetime.fromisoformat(value.replace("Z", "+00:00")), local_tz)
+    except ValueError:
+        pass
+    for date_format in DATE_FORMATS:
+        try:
+            return from_local(datetime.strptime(value, date_format), local_tz)
+        except ValueError:
+            continue
+    return None
+
+
+def _severity(crime_type: str) -> int:
+    """Default 1-5 severity from the scorer's crime weights"""
+    weight = scorer.crime_weights.get(crime_type, scorer.crime_weights["other"])
+    return max(1, min(5, round(weight * 5)))
+
+
+def normalize_row(row: Dict, local_tz: Optional[tzinfo] = None) -> Dict:
+    """Map a source row onto CrimeData fields"""
+    lowered = {str(key).strip().lower(): value for key, value in row.items()}
+    normalized = {}
+    for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            value = lowered.get(alias)
+            if value not in (None, ""):
+                normalized[field] = value
+                break
+
+    crime_type = str(normalized.get("crime_type", "other")).strip().lower() or "other"
+    normalized["crime_type"] = crime_type
+    normalized.setdefault("severity", _severity(crime_type))
+    normalized["reported_at"] = _parse_date(normalized.get("reported_at"), local_tz)
+    if "source_id" in normalized:
+        normalized["source_id"] = str(normalized["source_id"])
+    return normalized
+
+
+def dedupe_key(crime: CrimeData, source: str) -> str:
+    """Stable identity of an incident, so re-ingesting a dataset inserts nothing new"""
+    if crime.source_id:
+        identity = f"{source}|{crime.source_id}"
+    else:
+        identity = f"{crime.lat:.5f}|{crime.lng:.5f}|{crime.crime_type}|{crime.reported_at.isoformat()}"
+    return hashlib.sha1(identity.encode()).hexdigest()
+
+
+def prepare_batch(
+    rows: Iterator[Dict],
+    batch_size: int,
+    source: str,
+    report: Dict,
+    local_tz: Optional[tzinfo] = None
+) -> List[Dict]:
+    """Read, validate and convert up to batch_size rows into crime documents"""
+    docs = []
+    for row in rows:
+        report["rows"] += 1
+        try:
+            crime = CrimeData(**normalize_row(row, local_tz))
+        except ValidationError as e:
+            report["invalid"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append({"row": report["rows"], "error": e.errors()[0]["msg"]})
+            continue
+
+        doc = crime.model_dump(by_alias=True)
+        doc["location"] = crime_location(crime.lat, crime.lng)
+        doc["dedupe_key"] = dedupe_key(crime, source)
+        docs.append(doc)
+        if len(docs) >= batch_size:
+            break
+    return docs
+
+
+async def _write(collection, docs: List[Dict], report: Dict):
+    try:
+        result = await collection.insert_many(docs, ordered=False)
+        report["inserted"] += len(result.inserted_ids)
+    except BulkWriteError as e:
+        report["inserted"] += e.details["nInserted"]
+        for error in e.details["writeErrors"]:
+            if error["code"] == 11000:
+                report["duplicates"] += 1
+            else:
+                report["failed"] += 1
+
+
+async def ingest(
+    collection,
+    stream: TextIO,
+    file_format: str,
+    source: str = "upload",
+    batch_size: int = 5000,
+    local_tz: Optional[tzinfo] = None
+) -> Dict:
+    """
+    Stream incidents from a CSV, NDJSON or GeoJSON text stream into crime_data.
+
+    Parsing and validation run in a worker thread one batch ahead of the
+    unordered insert_many of the previous batch, so memory stays at two
+    batches however large the file. Duplicates (by source id, or by
+    position, type and time) are rejected by the unique dedupe_key index.
+    Timestamps without an offset are read as local times on local_tz
+    (default LOCAL_TIMEZONE, else the server's) and stored in UTC.
+    """
+    if file_format not in PARSERS:
+        raise ValueError(f"Unsupported format: {file_format}")
+
+    rows = PARSERS[file_format](stream)
+    local_tz = local_tz or local_timezone()
+    report = {"rows": 0, "inserted": 0, "duplicates": 0, "invalid": 0, "failed": 0, "errors": []}
+    started = time.perf_counter()
+
+    pending = None
+    try:
+        while True:
+            docs = await asyncio.to_thread(prepare_batch, rows, batch_size, source, report, local_tz)
+            if pending is not None:
+                await pending
+                pending = None
+            if not docs:
+                break
+            pending = asyncio.create_task(_write(collection, docs, report))
+    finally:
+        if pending is not None:
+            await pending
+
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    report["rows_per_second"] = round(report["rows"] / report["seconds"]) if report["seconds"] else None
+    return report
+
+
+async def _main(path: str, file_format: Optional[str], source: Optional[str], batch_size: int, tz: Optional[str]):
+    from app.database import db
+    from app.utils.db_indexes import ensure_indexes
+    await db.connect()
+    try:
+        await ensure_indexes(db.db)
+        with open(path, newline="", encoding="utf-8-sig") as stream:
+            report = await ingest(
+                db.db.crime_data,
+                stream,
+                file_format or detect_format(path),
+                source=source or os.path.basename(path),
+                batch_size=batch_size,
+                local_tz=local_timezone(tz)
+            )
+        print(json.dumps(report, indent=2))
+    finally:
+        await db.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load a crime incident dataset into crime_data")
+    parser.add_argument("path", help="CSV, NDJSON or GeoJSON file")
+    parser.add_argument("--format", choices=sorted(PARSERS), help="defaults to the file extension")
+    parser.add_argument("--source", help="dataset name used to dedupe by source id (defaults to the file name)")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--tz", help="IANA timezone of timestamps without an offset (default: LOCAL_TIMEZONE or the server's)")
+    args = parser.parse_args()
+    asyncio.run(_main(args.path, args.format, args.source, args.batch_size, args.tz))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import asyncio
+import time
+from collections import deque
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+from pymongo.errors import OperationFailure, PyMongoError
+from app.utils.crime_index import CrimeIndex, CRIME_PROJECTION, crime_index
+from app.utils.db_indexes import backfill_crime_location
+
+# Error code returned by a standalone mongod when $changeStream is requested
+CHANGE_STREAM_UNSUPPORTED = 40573
+
+
+class CrimeIndexSync:
+    """
+    Keeps a CrimeIndex in step with the crime_data collection.
+
+    Uses a change stream when the server supports it (replica set / Atlas)
+    and falls back to polling for new reported_at values on a standalone
+    mongod. Polling only sees new incidents; updates and deletes require a
+    change stream. Listeners are awaited with the (lat, lng) of every
+    incident location added or removed, so caches can evict affected areas.
+    Incidents written without a GeoJSON location (by anything but ingest)
+    get one here, so the 2dsphere hotspot queries see them.
+    """
+
+    def __init__(self, index: CrimeIndex, poll_interval: float = 5.0, rate_window: float = 60.0):
+        self.index = index
+        self.poll_interval = poll_interval
+        self.rate_window = rate_window
+        self.mode = None
+        self.collection = None
+        self.task: Optional[asyncio.Task] = None
+        self.resume_token = None
+        self.applied = {"insert": 0, "update": 0, "delete": 0}
+        self.last_lag_seconds: Optional[float] = None
+        self.last_applied_at: Optional[float] = None
+        self._recent = deque()
+        self.listeners: List[Callable[[float, float], Awaitable]] = []
+
+    async def start(self, collection):
+        """Load the index and begin tailing the collection"""
+        # Capture the cluster time before loading so no change falls in the gap
+        reply = await collection.database.command("ping")
+        start_time = reply.get("operationTime")
+
+        self.collection = collection
+        await self.index.load(collection)
+        self.task = asyncio.create_task(self._run(collection, start_time))
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _run(self, collection, start_time):
+        while True:
+            try:
+                await self._watch(collection, start_time)
+            except OperationFailure as e:
+                if e.code != CHANGE_STREAM_UNSUPPORTED:
+                    print(f"Crime change stream error: {e}")
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                print("Change streams unavailable, polling crime_data instead")
+                await self._poll(collection)
+                return
+            except PyMongoError as e:
+                print(f"Crime change stream error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _watch(self, collection, start_time):
+        self.mode = "change_stream"
+        options = {"full_document": "updateLookup"}
+        if self.resume_token is not None:
+            options["resume_after"] = self.resume_token
+        elif start_time is not None:
+            options["start_at_operation_time"] = start_time
+
+        async with collection.watch(**options) as stream:
+            async for change in stream:
+                await self.apply_change(change)
+                self.resume_token = stream.resume_token
+
+    async def _poll(self, collection):
+        self.mode = "polling"
+        last_seen = max(
+            (record["reported_at"] for bucket in self.index.cells.values()
+             for record in bucket.values() if record.get("reported_at")),
+            default=None
+        )
+        seen_at_last = set()
+
+        while True:
+            query = {"reported_at": {"$gte": last_seen}} if last_seen else {}
+            try:
+                cursor = collection.find(query, {**CRIME_PROJECTION, "location": 1}).sort("reported_at", 1)
+                async for crime in cursor:
+                    crime_id = str(crime["_id"])
+                    if crime["reported_at"] == last_seen and crime_id in seen_at_last:
+                        continue
+                    if crime["reported_at"] != last_seen:
+                        last_seen = crime["reported_at"]
+                        seen_at_last = set()
+                    seen_at_last.add(crime_id)
+
+                    previous = self.index.remove(crime_id)
+                    self.index.upsert(crime)
+                    self._record("insert", (datetime.utcnow() - last_seen).total_seconds())
+                    await self._backfill_location(crime)
+                    await self._notify(previous, crime)
+            except PyMongoError as e:
+                print(f"Crime polling error: {e}")
+
+            await asyncio.sleep(self.poll_interval)
+
+    async def apply_change(self, change: Dict):
+        """Apply one change stream event to the index"""
+        operation = change["operationType"]
+        crime = None
+        if operation in ("insert", "update", "replace"):
+            crime = change.get("fullDocument")
+            # A missing fullDocument means it was deleted before the lookup
+            previous = self.index.remove(change["documentKey"]["_id"])
+            if crime is not None:
+                self.index.upsert(crime)
+            kind = "insert" if operation == "insert" else "update"
+        elif operation == "delete":
+            previous = self.index.remove(change["documentKey"]["_id"])
+            kind = "delete"
+        else:
+            return
+
+        lag = None
+        if change.get("clusterTime") is not None:
+            lag = time.time() - change["clusterTime"].time
+        self._record(kind, lag)
+        await self._backfill_location(crime)
+        await self._notify(previous, crime)
+
+    async def _backfill_location(self, crime: Optional[Dict]):
+        if crime is None or self.collection is None:
+            return
+        try:
+            await backfill_crime_location(self.collection, crime)
+        except PyMongoError as e:
+            print(f"Could not set location on crime {crime['_id']}: {e}")
+
+    async def _notify(self, previous: Optional[Dict], current: Optional[Dict]):
+        for crime in (previous, current):
+            if not crime or crime.get("lat") is None or crime.get("lng") is None:
+                continue
+            for listener in self.listeners:
+                try:
+                    await listener(crime["lat"], crime["lng"])
+                except Exception as e:
+                    print(f"Crime change listener failed: {e}")
+
+    def _record(self, kind: str, lag: Optional[float]):
+        now = time.time()
+        self.applied[kind] += 1
+        self.last_applied_at = now
+        if lag is not None:
+            self.last_lag_seconds = max(0.0, lag)
+
+        self._recent.append(now)
+        while self._recent and self._recent[0] < now - self.rate_window:
+            self._recent.popleft()
+
+    def metrics(self) -> Dict:
+        now = time.time()
+        while self._recent and self._recent[0] < now - self.rate_window:
+            self._recent.popleft()
+
+        return {
+            "mode": self.mode,
+            "indexed_crimes": len(self.index),
+            "applied": dict(self.applied),
+            "apply_rate_per_sec": len(self._recent) / self.rate_window,
+            "last_lag_seconds": self.last_lag_seconds,
+            "seconds_since_last_apply": (
+                now - self.last_applied_at if self.last_applied_at else None
+            )
+        }
+
+
+crime_sync = CrimeIndexSync(crime_index)
@@ -0,0 +1,224 @@
+import argparse
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, IndexModel
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Collections that need creation options, created before any index or write touches them
+TIMESERIES_COLLECTIONS = {
+    "location_points": {
+        "timeseries": {"timeField": "ts", "metaField": "journey", "granularity": "seconds"},
+        "expireAfterSeconds": int(os.getenv("LOCATION_RETENTION_SECONDS", str(7 * 24 * 3600)))
+    }
+}
+
+# Every index the API relies on, by collection. Applied idempotently at startup.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True)
+    ],
+    "sos_alerts": [
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING)], name="user_timestamp")
+    ],
+    "sos_outbox": [
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt")
+    ],
+    "crime_data": [
+        IndexModel([("location", GEOSPHERE)], name="location_2dsphere"),
+        IndexModel([("reported_at", ASCENDING)], name="reported_at"),
+        IndexModel(
+            [("dedupe_key", ASCENDING)],
+            name="dedupe_key_unique",
+            unique=True,
+            partialFilterExpression={"dedupe_key": {"$exists": True}}
+        )
+    ],
+    "journeys": [
+        IndexModel([("user_id", ASCENDING), ("started_at", DESCENDING)], name="user_started")
+    ],
+    "location_points": [
+        IndexModel([("journey.journey_id", ASCENDING), ("ts", ASCENDING)], name="journey_ts")
+    ],
+    "route_cache": [
+        IndexModel(
+            [("created_at", ASCENDING)],
+            name="created_at_ttl",
+            expireAfterSeconds=int(float(os.getenv("ROUTE_CACHE_TTL", "600")))
+        )
+    ]
+}
+
+
+def crime_location(lat: float, lng: float) -> Dict:
+    """GeoJSON point stored on crime documents for the 2dsphere index"""
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+
+async def migrate_crime_locations(database) -> int:
+    """Backfill the GeoJSON location field on crime documents that only have lat/lng"""
+    result = await database.crime_data.update_many(
+        {
+            "location": {"$exists": False},
+            "lat": {"$gte": -90, "$lte": 90},
+            "lng": {"$gte": -180, "$lte": 180}
+        },
+        [{"$set": {"location": {"type": "Point", "coordinates": ["$lng", "$lat"]}}}]
+    )
+    return result.modified_count
+
+
+async def backfill_crime_location(collection, crime: Dict) -> bool:
+    """Set location on one crime document written without it, or moved since, by a writer other than ingest"""
+    lat, lng = crime.get("lat"), crime.get("lng")
+    if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return False
+    location = crime_location(lat, lng)
+    if crime.get("location") == location:
+        return False
+    # Matching on lat/lng leaves a document that moved again meanwhile to its own change event
+    result = await collection.update_one(
+        {"_id": crime["_id"], "lat": lat, "lng": lng},
+        {"$set": {"location": location}}
+    )
+    return bool(result.modified_count)
+
+
+# Data migrations, applied once per database and recorded in the migrations collection.
+# Give a changed migration a new name rather than editing an applied one.
+MIGRATIONS = {
+    "crime_location_v1": migrate_crime_locations
+}
+
+# How long a claimed migration may run before another start may take it over
+MIGRATION_LEASE_SECONDS = int(os.getenv("MIGRATION_LEASE_SECONDS", "3600"))
+
+
+async def apply_migration(database, name: str, lease_seconds: int = MIGRATION_LEASE_SECONDS) -> Optional[int]:
+    """
+    Run a registered migration unless it has been applied or another worker
+    holds a live claim on it. A claim older than lease_seconds belongs to a
+    worker that died mid-run and is taken over.
+    """
+    now = datetime.utcnow()
+    owner = ObjectId()
+    try:
+        # Inserts the claim, or takes over an expired one; a live or applied record is a duplicate key
+        await database.migrations.update_one(
+            {"_id": name, "applied_at": {"$exists": False}, "started_at": {"$lte": now - timedelta(seconds=lease_seconds)}},
+            {"$set": {"owner": owner, "started_at": now}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return None
+
+    try:
+        modified = await MIGRATIONS[name](database)
+    except Exception:
+        # Release the claim so the next start retries
+        await database.migrations.delete_one({"_id": name, "owner": owner})
+        raise
+    await database.migrations.update_one(
+        {"_id": name, "owner": owner},
+        {"$set": {"applied_at": datetime.utcnow(), "modified": modified}}
+    )
+    return modified
+
+
+async def ensure_collections(database):
+    """Create time-series collections, falling back to regular ones on servers before 5.0"""
+    existing = set(await database.list_collection_names())
+    for name, options in TIMESERIES_COLLECTIONS.items():
+        if name in existing:
+            continue
+        try:
+            await database.create_collection(name, **options)
+        except OperationFailure as e:
+            print(f"Could not create time-series collection {name}, using a regular collection: {e}")
+
+
+async def ensure_indexes(database):
+    """Create every registered index, reporting rather than failing on conflicts"""
+    await ensure_collections(database)
+    for name in MIGRATIONS:
+        modified = await apply_migration(database, name)
+        if modified is not None:
+            print(f"Applied migration {name} ({modified} documents)")
+
+    for collection, indexes in INDEXES.items():
+        for index in indexes:
+            try:
+                await database[collection].create_indexes([index])
+            except OperationFailure as e:
+                # e.g. an existing index with different options, or duplicate emails
+                print(f"Could not create index {collection}.{index.document['name']}: {e}")
+
+
+def hot_queries(database) -> Dict[str, object]:
+    """Cursors for the queries served on hot paths, for explain()"""
+    now = datetime.utcnow()
+    return {
+        "users by email": database.users.find({"email": "probe@example.com"}).limit(1),
+        "sos history": database.sos_alerts.find({"user_id": str(ObjectId())}).sort("timestamp", -1).limit(10),
+        "sos outbox claim": database.sos_outbox.find({"$or": [
+            {"status": "pending", "next_attempt_at": {"$lte": now}},
+            {"status": "sending", "locked_at": {"$lte": now - timedelta(seconds=60)}}
+        ]}).sort("next_attempt_at", 1).limit(1),
+        "journey points": database.location_points.find({"journey.journey_id": str(ObjectId())}).sort("ts", 1),
+        "crime polling": database.crime_data.find({"reported_at": {"$gte": now}}).sort("reported_at", 1),
+        "crime bbox": database.crime_data.find({"location": {"$geoWithin": {"$geometry": {
+            "type": "Polygon",
+            "coordinates": [[[77.0, 28.0], [77.5, 28.0], [77.5, 28.5], [77.0, 28.5], [77.0, 28.0]]]
+        }}}})
+    }
+
+
+def _stages(plan) -> List[str]:
+    if isinstance(plan, dict):
+        stages = [plan["stage"]] if "stage" in plan else []
+        for value in plan.values():
+            stages.extend(_stages(value))
+        return stages
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in _stages(item)]
+    return []
+
+
+async def assert_query_plans(database):
+    """Explain every hot query and raise if any of them scans a whole collection"""
+    scans = []
+    for name, cursor in hot_queries(database).items():
+        plan = await cursor.explain()
+        if "COLLSCAN" in _stages(plan["queryPlanner"]["winningPlan"]):
+            scans.append(name)
+
+    if scans:
+        raise RuntimeError(f"Queries without index support: {', '.join(scans)}")
+    print("All hot queries are index-backed")
+
+
+async def _main(check: bool):
+    from app.database import db
+    await db.connect()
+    try:
+        await ensure_indexes(db.db)
+        if check:
+            await assert_query_plans(db.db)
+    finally:
+        await db.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create MongoDB indexes and check query plans")
+    parser.add_argument("--check", action="store_true", help="fail if any hot query uses COLLSCAN")
+    args = parser.parse_args()
+    asyncio.run(_main(args.check))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import asyncio
+import contextvars
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class ExecutorSaturated(Exception):
+    """Raised when a BoundedExecutor has no free slot and the caller cannot (or can no longer) wait"""
+
+
+class BoundedExecutor:
+    """
+    Runs blocking or CPU-bound callables off the event loop.
+
+    Backed by a thread pool (for work that releases the GIL, e.g. NumPy) or
+    a process pool, with a cap on queued + running jobs so callers can shed
+    load instead of building an unbounded backlog. Callers that wait for a
+    slot queue first-come first-served, up to max_waiters of them, and are
+    woken only when a slot is handed to them.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        kind: str = "thread",
+        max_workers: Optional[int] = None,
+        max_pending: int = 64,
+        max_waiters: int = 256,
+        initializer: Optional[Callable] = None,
+        initargs: tuple = ()
+    ):
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_pending = max_pending
+        self.max_waiters = max_waiters
+        self.initializer = initializer
+        self.initargs = initargs
+        self.pool: Optional[Executor] = None
+        self.pending = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.stats = {"completed": 0, "rejected": 0, "failed": 0, "run_seconds": 0.0}
+
+    def start(self):
+        if self.pool is not None:
+            return
+        if self.kind == "process":
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=self.initializer,
+                initargs=self.initargs
+            )
+        else:
+            self.pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix=self.name,
+                initializer=self.initializer,
+                initargs=self.initargs
+            )
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    async def _acquire(self, wait: bool, timeout: Optional[float]):
+        if self.pending < self.max_pending and not self.waiters:
+            self.pending += 1
+            return
+        if not wait or len(self.waiters) >= self.max_waiters:
+            self.stats["rejected"] += 1
+            raise ExecutorSaturated(f"{self.name} executor is saturated")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            # _release takes the slot on our behalf before resolving the waiter
+            await asyncio.wait_for(waiter, timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # Granted as we gave up: pass the slot on
+                self._release()
+            elif waiter in self.waiters:
+                self.waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.stats["rejected"] += 1
+                raise ExecutorSaturated(f"{self.name} executor is saturated") from None
+            raise
+
+    def _release(self):
+        self.pending -= 1
+        while self.waiters and self.pending < self.max_pending:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                self.pending += 1
+                waiter.set_result(None)
+
+    def _finished(self, future: Future, started: float):
+        # The slot is held until the pool job itself ends, even if its caller was cancelled
+        if not future.cancelled():
+            if future.exception() is not None:
+                self.stats["failed"] += 1
+            else:
+                self.stats["completed"] += 1
+                self.stats["run_seconds"] += time.perf_counter() - started
+        self._release()
+
+    async def run(self, fn: Callable, *args, wait: bool = False, timeout: Optional[float] = None) -> Any:
+        """
+        Run fn(*args) on the pool. When full, raise ExecutorSaturated, or with
+        wait=True queue for a free slot instead, for at most timeout seconds
+        if one is given (bulk callers pass none).
+        """
+        await self._acquire(wait, timeout)
+        try:
+            self.start()
+            if self.kind != "process":
+                # Carry context variables (e.g. the request's stage timings) into the thread
+                future = self.pool.submit(contextvars.copy_context().run, fn, *args)
+            else:
+                future = self.pool.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+
+        def done(future):
+            try:
+                loop.call_soon_threadsafe(self._finished, future, started)
+            except RuntimeError:
+                pass  # loop already closed at shutdown
+
+        future.add_done_callback(done)
+        return await asyncio.wrap_future(future)
+
+    def metrics(self) -> Dict:
+        completed = self.stats["completed"]
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "max_waiters": self.max_waiters,
+            "pending": self.pending,
+            "waiting": len(self.waiters),
+            "completed": completed,
+            "rejected": self.stats["rejected"],
+            "failed": self.stats["failed"],
+            "avg_ms": self.stats["run_seconds"] / completed * 1000 if completed else None
+        }
+
+
+def _init_scoring_worker(
+    risk_raster_path: Optional[str],
+    routing_graph_path: Optional[str],
+    segment_table_path: Optional[str]
+):
+    # Each scoring process maps the same read-only raster, graph and segment files
+    from app.utils.safety_scoring import scorer
+    from app.utils.graph_router import graph_router
+    if risk_raster_path and os.path.exists(risk_raster_path):
+        scorer.load_risk_raster(risk_raster_path)
+    if routing_graph_path and os.path.exists(routing_graph_path):
+        graph_router.load(routing_graph_path, scorer.road_safety, scorer.time_risk)
+    if segment_table_path and os.path.exists(segment_table_path):
+        scorer.load_segment_table(segment_table_path)
+
+
+# Scoring is NumPy-bound, so threads are the default; SCORING_EXECUTOR=process isolates it fully
+scoring_executor = BoundedExecutor(
+    "scoring",
+    kind=os.getenv("SCORING_EXECUTOR", "thread"),
+    max_workers=int(os.getenv("SCORING_WORKERS", "0")) or None,
+    max_pending=int(os.getenv("SCORING_MAX_PENDING", "64")),
+    max_waiters=int(os.getenv("SCORING_MAX_WAITERS", "256")),
+    initializer=_init_scoring_worker if os.getenv("SCORING_EXECUTOR") == "process" else None,
+    initargs=(os.getenv("RISK_RASTER_PATH"), os.getenv("ROUTING_GRAPH_PATH"), os.getenv("SEGMENT_TABLE_PATH"))
+)
+
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+# without letting a login burst occupy every core. Logins queue for a slot for up
+# to HASH_WAIT_SECONDS rather than being turned away at the first burst.
+hashing_executor = BoundedExecutor(
+    "hashing",
+    max_workers=int(os.getenv("HASH_WORKERS", "2")),
+    max_pending=int(os.getenv("HASH_MAX_PENDING", "32")),
+    max_waiters=int(os.getenv("HASH_MAX_WAITERS", "2048"))
+)
@@ -0,0 +1,108 @@
+"""
+Route geometry compaction for API responses.
+
+- simplify: Douglas-Peucker with a tolerance in metres
+- encode_polyline / decode_polyline: Google encoded polyline format
+  (precision 5 is about 1.1 m, and is what map SDKs decode natively)
+- shape_geometry: applies a request's geometry options to one coordinate list
+
+Coordinates are [lat, lng] pairs throughout, as everywhere else in the API.
+"""
+import math
+from typing import Dict, List, Optional
+import numpy as np
+
+METERS_PER_DEGREE = 111320.0
+
+GEOMETRY_FORMATS = ("coordinates", "polyline")
+
+
+def simplify(coords: List[List[float]], tolerance_m: float) -> List[List[float]]:
+    """Douglas-Peucker simplification keeping every vertex further than tolerance_m from the simplified line"""
+    if tolerance_m <= 0 or len(coords) < 3:
+        return coords
+
+    points = np.asarray(coords, dtype=np.float64)
+    # Local equirectangular projection; plenty accurate at route scale
+    y = points[:, 0] * METERS_PER_DEGREE
+    x = points[:, 1] * METERS_PER_DEGREE * math.cos(math.radians(points[:, 0].mean()))
+
+    # Splits every open range at once per round, so numpy work is per tree level, not per split
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    settled = keep.copy()
+    while True:
+        candidates = np.flatnonzero(~settled)
+        if not len(candidates):
+            break
+        kept = np.flatnonzero(keep)
+        group = np.searchsorted(kept, candidates) - 1
+        first, last = kept[group], kept[group + 1]
+
+        ax, ay = x[first], y[first]
+        dx, dy = x[last] - ax, y[last] - ay
+        px, py = x[candidates] - ax, y[candidates] - ay
+        length_sq = dx * dx + dy * dy
+        # Distance to the segment, not the infinite line, so loops back to the start survive
+        t = np.clip((px * dx + py * dy) / np.where(length_sq > 0, length_sq, 1.0), 0.0, 1.0)
+        distance = np.hypot(px - t * dx, py - t * dy)
+
+        starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+        sizes = np.diff(np.r_[starts, len(candidates)])
+        group_max = np.maximum.reduceat(distance, starts)
+        farthest = np.minimum.reduceat(
+            np.where(distance == np.repeat(group_max, sizes), candidates, len(points)), starts
+        )
+        split = group_max > tolerance_m
+        keep[farthest[split]] = True
+        settled[farthest[split]] = True
+        # Ranges within tolerance are final
+        settled[candidates[~np.repeat(split, sizes)]] = True
+
+    return points[keep].tolist()
+
+
+def encode_polyline(coords: List[List[float]], precision: int = 5) -> str:
+    """Encode [lat, lng] pairs in the Google encoded polyline format"""
+    if not coords:
+        return ""
+    scaled = np.round(np.asarray(coords, dtype=np.float64) * 10 ** precision).astype(np.int64)
+    deltas = np.diff(scaled, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).reshape(-1)
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1).tolist()
+
+    chunks = []
+    for value in values:
+        while value >= 0x20:
+            chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chunks.append(chr(value + 63))
+    return "".join(chunks)
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> List[List[float]]:
+    values = []
+    value = shift = 0
+    for char in encoded:
+        byte = ord(char) - 63
+        value |= (byte & 0x1f) << shift
+        shift += 5
+        if byte < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+
+    factor = 10 ** precision
+    coords = np.cumsum(np.array(values, dtype=np.int64).reshape(-1, 2), axis=0) / factor
+    return coords.tolist()
+
+
+def shape_geometry(
+    coords: List[List[float]],
+    geometry: str = "coordinates",
+    simplify_m: Optional[float] = None
+) -> Dict:
+    """The geometry fields of a route in the requested format (never mutates coords)"""
+    if simplify_m:
+        coords = simplify(coords, simplify_m)
+    if geometry == "polyline":
+        return {"polyline": encode_polyline(coords)}
+    return {"coordinates": coords}
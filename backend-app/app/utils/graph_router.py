@@ -0,0 +1,461 @@
+"""
+Offline safety-aware router over an OSM road graph.
+
+The graph is built once from an OSM XML extract into compact CSR arrays
+and loaded by every worker at startup.
+Edge costs blend length with crime exposure, road class and lighting, and
+bidirectional A* returns distinct fastest / balanced / safest paths.
+Requests in another travel mode than the graph's profile, or with an end
+point too far from the road network, get no paths and fall back to OSRM.
+
+Build with:
+    python -m app.utils.graph_router --osm city.osm --out data/graph.npz
+"""
+import argparse
+import heapq
+import math
+import os
+import time
+import xml.etree.ElementTree as ET
+from array import array
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.utils.risk_raster import TIME_BUCKETS, build_risk_raster, RiskRaster
+
+EARTH_RADIUS_M = 6371008.8
+
+# OSM highway tag -> SafetyScorer.road_safety class
+HIGHWAY_CLASSES = {
+    "trunk": "main_road",
+    "primary": "main_road",
+    "secondary": "main_road",
+    "tertiary": "main_road",
+    "trunk_link": "main_road",
+    "primary_link": "main_road",
+    "secondary_link": "main_road",
+    "tertiary_link": "main_road",
+    "residential": "residential",
+    "living_street": "residential",
+    "unclassified": "residential",
+    "service": "residential",
+    "footway": "residential",
+    "cycleway": "residential",
+    "steps": "residential",
+    "pedestrian": "market",
+    "path": "isolated",
+    "track": "isolated",
+    "bridleway": "isolated"
+}
+
+# Highways each graph profile may not use
+PROFILE_EXCLUDES = {
+    "foot": {"motorway", "motorway_link", "trunk", "trunk_link"},
+    "bike": {"motorway", "motorway_link", "steps"},
+    "car": {"footway", "cycleway", "steps", "pedestrian", "path", "bridleway", "track"}
+}
+
+# Travel mode served by each graph profile
+PROFILE_MODES = {
+    "foot": "walk",
+    "bike": "bike",
+    "car": "car"
+}
+
+# Weight of risk against length for each route preference
+ROUTE_PREFERENCES = [
+    ("fastest", 0.0, "Shortest path on the road network"),
+    ("balanced", 1.5, "Mix of main and residential roads"),
+    ("safest", 5.0, "Prefers well-lit main roads away from reported crime")
+]
+
+# Average speeds (m/s) used for duration estimates
+MODE_SPEEDS = {
+    "walk": 1.4,
+    "bike": 4.2,
+    "car": 8.3
+}
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance; works on floats or NumPy arrays"""
+    lat1, lng1, lat2, lng2 = (np.radians(v) for v in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+class GraphRouter:
+    """Routing engine over a road graph stored as CSR NumPy arrays"""
+
+    def __init__(self, max_snap_m: float = float(os.getenv("ROUTING_MAX_SNAP_M", "250"))):
+        self.loaded = False
+        self.profile = None
+        self.max_snap_m = max_snap_m
+        self.exposure: Dict[str, Tuple[array, float]] = {}
+
+    def load(self, path: str, road_safety: Dict[str, float], time_risk: Dict[str, float]):
+        data = np.load(path, allow_pickle=False)
+        self.node_lat = data["node_lat"]
+        self.node_lng = data["node_lng"]
+        self.indptr = data["indptr"]
+        self.indices = data["indices"]
+        self.length = data["length"].astype(np.float64)
+        self.road_class = data["road_class"]
+        self.lit = data["lit"]
+        self.crime = data["crime"]
+        self.class_names = [str(name) for name in data["class_names"]]
+        # Graphs built before the profile was stored used the default foot profile
+        self.profile = str(data["profile"]) if "profile" in data.files else "foot"
+
+        # Static part of the risk: unsafe road class and missing lighting
+        class_safety = np.array([road_safety.get(name, 0.5) for name in self.class_names])
+        self.road_risk = 1.0 - class_safety[self.road_class]
+        self.dark_risk = np.where(self.lit == 1, 0.0, np.where(self.lit == 0, 1.0, self.road_risk))
+        self.time_risk = time_risk
+
+        # Reverse CSR for the backward search, keeping original edge ids
+        sources = np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+        order = np.argsort(self.indices, kind="stable")
+        self.rev_indptr = np.concatenate([[0], np.cumsum(np.bincount(self.indices, minlength=len(self.node_lat)))])
+        self.rev_sources = sources[order]
+        self.rev_edges = order
+
+        # Plain lists are much faster than NumPy scalars inside the search loop
+        self._lat = self.node_lat.tolist()
+        self._lng = self.node_lng.tolist()
+        self._indptr = self.indptr.tolist()
+        self._indices = self.indices.tolist()
+        self._rev_indptr = self.rev_indptr.tolist()
+        self._rev_sources = self.rev_sources.tolist()
+        self._rev_edges = self.rev_edges.tolist()
+        # float64 arrays index to plain floats at a quarter of a list's memory
+        self._length = array("d", self.length.tobytes())
+        self.exposure = {}
+        self.loaded = True
+        print(f"Loaded {self.profile} routing graph {path} with {len(self.node_lat)} nodes and {len(self.indices)} edges")
+
+    def _exposure(self, bucket: str) -> Tuple[array, float]:
+        """
+        Risk-weighted length of every edge in a time bucket, and the lowest
+        risk per metre. An edge costs length + risk_weight * exposure, so one
+        array per bucket serves every route preference.
+        """
+        if bucket not in self.exposure:
+            crime = self.crime[TIME_BUCKETS.index(bucket)]
+            crime_risk = 1.0 - np.exp(-crime / 2.0)
+            risk = crime_risk + self.road_risk + self.dark_risk * self.time_risk.get(bucket, 0.5)
+            exposure = (self.length * risk).astype(np.float64)
+            self.exposure[bucket] = (array("d", exposure.tobytes()), float(risk.min()))
+        return self.exposure[bucket]
+
+    def nearest_node(self, lat: float, lng: float) -> int:
+        dlat = self.node_lat - lat
+        dlng = (self.node_lng - lng) * math.cos(math.radians(lat))
+        return int(np.argmin(dlat * dlat + dlng * dlng))
+
+    def snap(self, lat: float, lng: float) -> Optional[int]:
+        """Nearest node, or None when it is further than max_snap_m away"""
+        node = self.nearest_node(lat, lng)
+        if haversine_m(lat, lng, self._lat[node], self._lng[node]) > self.max_snap_m:
+            return None
+        return node
+
+    def _heuristic(self, u: int, v: int) -> float:
+        # Slightly under the true great-circle distance so it stays admissible
+        lat1, lng1 = math.radians(self._lat[u]), math.radians(self._lng[u])
+        lat2, lng2 = math.radians(self._lat[v]), math.radians(self._lng[v])
+        a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+        return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a)) * 0.999
+
+    def shortest_path(
+        self,
+        source: int,
+        target: int,
+        exposure: array,
+        risk_weight: float = 0.0,
+        min_cost_per_m: float = 1.0,
+        extra: Optional[Dict[int, float]] = None
+    ) -> Optional[List[int]]:
+        """
+        Bidirectional A* returning the list of edge ids from source to target.
+
+        Edge e costs length[e] + risk_weight * exposure[e] + extra.get(e, 0),
+        where extra holds the few per-request penalties.
+
+        Both searches use the average potential p(v) = (h_t(v) - h_s(v)) / 2,
+        which keeps reduced costs consistent in both directions, so the search
+        can stop as soon as the two queue heads together reach the best
+        meeting cost found.
+        """
+        if source == target:
+            return []
+
+        potential_cache = {}
+
+        def potential(v):
+            p = potential_cache.get(v)
+            if p is None:
+                p = (self._heuristic(v, target) - self._heuristic(v, source)) * min_cost_per_m / 2
+                potential_cache[v] = p
+            return p
+
+        length, extra = self._length, extra or {}
+        indptr, indices = self._indptr, self._indices
+        rev_indptr, rev_sources, rev_edges = self._rev_indptr, self._rev_sources, self._rev_edges
+        dist_f, dist_r = {source: 0.0}, {target: 0.0}
+        parent_f, parent_r = {source: -1}, {target: -1}
+        done_f, done_r = set(), set()
+        # Ties on the key go to the node furthest from its origin
+        heap_f = [(potential(source), 0.0, source)]
+        heap_r = [(-potential(target), 0.0, target)]
+        best, meet = math.inf, None
+
+        while heap_f and heap_r:
+            if heap_f[0][0] + heap_r[0][0] >= best:
+                break
+
+            if len(heap_f) <= len(heap_r):
+                _, _, u = heapq.heappop(heap_f)
+                if u in done_f:
+                    continue
+                done_f.add(u)
+                du = dist_f[u]
+                for e in range(indptr[u], indptr[u + 1]):
+                    v = indices[e]
+                    nd = du + length[e] + risk_weight * exposure[e] + extra.get(e, 0.0)
+                    if nd < dist_f.get(v, math.inf):
+                        dist_f[v] = nd
+                        parent_f[v] = e
+                        heapq.heappush(heap_f, (nd + potential(v), -nd, v))
+                        if v in dist_r and nd + dist_r[v] < best:
+                            best, meet = nd + dist_r[v], v
+            else:
+                _, _, u = heapq.heappop(heap_r)
+                if u in done_r:
+                    continue
+                done_r.add(u)
+                du = dist_r[u]
+                for i in range(rev_indptr[u], rev_indptr[u + 1]):
+                    v, e = rev_sources[i], rev_edges[i]
+                    nd = du + length[e] + risk_weight * exposure[e] + extra.get(e, 0.0)
+                    if nd < dist_r.get(v, math.inf):
+                        dist_r[v] = nd
+                        parent_r[v] = e
+                        heapq.heappush(heap_r, (nd - potential(v), -nd, v))
+                        if v in dist_f and nd + dist_f[v] < best:
+                            best, meet = nd + dist_f[v], v
+
+        if meet is None:
+            return None
+
+        # Walk back to the source, then forward to the target
+        forward = []
+        node = meet
+        while parent_f[node] != -1:
+            e = parent_f[node]
+            forward.append(e)
+            node = self._edge_source(e)
+        forward.reverse()
+
+        node = meet
+        while parent_r[node] != -1:
+            e = parent_r[node]
+            forward.append(e)
+            node = self._indices[e]
+        return forward
+
+    def _edge_source(self, e: int) -> int:
+        return int(np.searchsorted(self.indptr, e, side="right") - 1)
+
+    def route(
+        self,
+        src_lat: float,
+        src_lng: float,
+        dest_lat: float,
+        dest_lng: float,
+        time_of_day: str = "day",
+        mode: str = "walk",
+        penalty: float = 1.4
+    ) -> List[Dict]:
+        """
+        Distinct fastest / balanced / safest paths between two points, or none
+        when the graph was built for another mode or an end point is off it
+        """
+        if PROFILE_MODES.get(self.profile) != mode:
+            return []
+        bucket = time_of_day if time_of_day in TIME_BUCKETS else "day"
+        source = self.snap(src_lat, src_lng)
+        target = self.snap(dest_lat, dest_lng)
+        if source is None or target is None:
+            return []
+        speed = MODE_SPEEDS.get(mode, MODE_SPEEDS["walk"])
+
+        exposure, min_risk = self._exposure(bucket)
+        paths = []
+        used_edges = set()
+        for name, risk_weight, description in ROUTE_PREFERENCES:
+            # Penalise edges of earlier paths so each preference yields a distinct route
+            extra = {
+                e: (penalty - 1.0) * (self._length[e] + risk_weight * exposure[e])
+                for e in used_edges
+            }
+            # Cheapest cost per metre keeps the distance heuristic admissible
+            min_cost_per_m = 1.0 + risk_weight * min_risk
+
+            edges = self.shortest_path(source, target, exposure, risk_weight, min_cost_per_m, extra)
+            if edges is None:
+                continue
+            if any(set(edges) == set(path["edges"]) for path in paths):
+                continue
+            used_edges.update(edges)
+
+            nodes = [source] + [self._indices[e] for e in edges]
+            distance = float(self.length[edges].sum()) if edges else 0.0
+            paths.append({
+                "type": name,
+                "edges": edges,
+                "distance": distance,
+                "duration": distance / speed,
+                "coordinates": [[self._lat[n], self._lng[n]] for n in nodes],
+                "description": description
+            })
+
+        for path in paths:
+            del path["edges"]
+        return paths
+
+
+def parse_osm(path: str, profile: str) -> Tuple[np.ndarray, ...]:
+    """Stream an OSM XML extract into node coordinates and directed edges"""
+    excluded = PROFILE_EXCLUDES.get(profile, set())
+    class_names = sorted(set(HIGHWAY_CLASSES.values()))
+    node_ids, node_lat, node_lng = array("q"), array("d"), array("d")
+    edge_from, edge_to, edge_class, edge_lit = array("q"), array("q"), array("b"), array("b")
+
+    way_refs, way_tags = [], {}
+    root = None
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        if root is None:
+            root = elem
+        if event == "start":
+            continue
+
+        if elem.tag == "node":
+            node_ids.append(int(elem.get("id")))
+            node_lat.append(float(elem.get("lat")))
+            node_lng.append(float(elem.get("lon")))
+            way_tags = {}
+            root.clear()
+        elif elem.tag == "nd":
+            way_refs.append(int(elem.get("ref")))
+        elif elem.tag == "tag":
+            way_tags[elem.get("k")] = elem.get("v")
+        elif elem.tag == "way":
+            highway = way_tags.get("highway")
+            if highway in HIGHWAY_CLASSES and highway not in excluded and len(way_refs) > 1:
+                road_class = class_names.index(HIGHWAY_CLASSES[highway])
+                lit = {"yes": 1, "no": 0}.get(way_tags.get("lit"), -1)
+                oneway = profile == "car" and way_tags.get("oneway") in ("yes", "1", "true")
+                for a, b in zip(way_refs[:-1], way_refs[1:]):
+                    pairs = [(a, b)] if oneway else [(a, b), (b, a)]
+                    for u, v in pairs:
+                        edge_from.append(u)
+                        edge_to.append(v)
+                        edge_class.append(road_class)
+                        edge_lit.append(lit)
+            way_refs, way_tags = [], {}
+            root.clear()
+        elif elem.tag == "relation":
+            way_refs, way_tags = [], {}
+            root.clear()
+
+    return (
+        np.frombuffer(node_ids, dtype=np.int64), np.frombuffer(node_lat), np.frombuffer(node_lng),
+        np.frombuffer(edge_from, dtype=np.int64), np.frombuffer(edge_to, dtype=np.int64),
+        np.frombuffer(edge_class, dtype=np.int8), np.frombuffer(edge_lit, dtype=np.int8),
+        np.array(class_names)
+    )
+
+
+def build_graph(osm_path: str, out_path: str, profile: str, crimes=None, crime_weights=None, time_risk=None):
+    """Compact an OSM extract into CSR arrays with per-bucket crime exposure"""
+    node_ids, node_lat, node_lng, edge_from, edge_to, edge_class, edge_lit, class_names = parse_osm(osm_path, profile)
+
+    # Keep only nodes referenced by routable edges and renumber them densely
+    order = np.argsort(node_ids)
+    node_ids, node_lat, node_lng = node_ids[order], node_lat[order], node_lng[order]
+    used = np.unique(np.concatenate([edge_from, edge_to]))
+    used = used[np.isin(used, node_ids)]
+    keep = np.searchsorted(node_ids, used)
+    node_lat, node_lng = node_lat[keep], node_lng[keep]
+
+    valid = np.isin(edge_from, used) & np.isin(edge_to, used)
+    src = np.searchsorted(used, edge_from[valid])
+    dst = np.searchsorted(used, edge_to[valid])
+    edge_class, edge_lit = edge_class[valid], edge_lit[valid]
+
+    by_source = np.argsort(src, kind="stable")
+    src, dst = src[by_source], dst[by_source]
+    edge_class, edge_lit = edge_class[by_source], edge_lit[by_source]
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(src, minlength=len(node_lat)))])
+    length = haversine_m(node_lat[src], node_lng[src], node_lat[dst], node_lng[dst])
+
+    # Crime exposure at each edge midpoint, sampled from an in-memory risk raster
+    crime = np.zeros((len(TIME_BUCKETS), len(src)), dtype=np.float32)
+    crime_built_at = 0.0  # no crime layers
+    if crimes is not None:
+        crime_built_at = time.time()
+        bounds = (node_lat.min(), node_lng.min(), node_lat.max(), node_lng.max())
+        grid, meta = build_risk_raster(crimes, bounds, crime_weights, time_risk)
+        raster = RiskRaster(grid, meta)
+        mid_lat = (node_lat[src] + node_lat[dst]) / 2
+        mid_lng = (node_lng[src] + node_lng[dst]) / 2
+        for b, bucket in enumerate(TIME_BUCKETS):
+            crime[b] = raster.sample(mid_lat, mid_lng, bucket)
+
+    np.savez(
+        out_path,
+        node_lat=node_lat,
+        node_lng=node_lng,
+        indptr=indptr.astype(np.int64),
+        indices=dst.astype(np.int32),
+        length=length.astype(np.float32),
+        road_class=edge_class,
+        lit=edge_lit,
+        crime=crime,
+        crime_built_at=np.float64(crime_built_at),
+        class_names=class_names,
+        profile=np.array(profile)
+    )
+    return len(node_lat), len(dst)
+
+
+def main(argv: Optional[List[str]] = None):
+    from app.database import get_sync_db
+    from app.utils.safety_scoring import scorer
+
+    parser = argparse.ArgumentParser(description="Build the offline routing graph from an OSM XML extract")
+    parser.add_argument("--osm", required=True)
+    parser.add_argument("--out", default=os.getenv("ROUTING_GRAPH_PATH", "graph.npz"))
+    parser.add_argument("--profile", choices=sorted(PROFILE_EXCLUDES), default="foot")
+    parser.add_argument("--no-crime", action="store_true", help="skip crime exposure (no MongoDB needed)")
+    args = parser.parse_args(argv)
+
+    crimes = None
+    if not args.no_crime:
+        crimes = get_sync_db().crime_data.find({}, {"lat": 1, "lng": 1, "severity": 1, "crime_type": 1, "reported_at": 1})
+
+    started = time.time()
+    nodes, edges = build_graph(args.osm, args.out, args.profile, crimes, scorer.crime_weights, scorer.time_risk)
+    print(f"Wrote graph with {nodes} nodes and {edges} edges to {args.out} in {time.time() - started:.1f}s")
+
+
+graph_router = GraphRouter()
+
+
+def route_paths(*args):
+    """graph_router.route as a picklable function for the scoring executor"""
+    return graph_router.route(*args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+import asyncio
+import hashlib
+import math
+import os
+import shutil
+import struct
+import zlib
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from app.utils.crime_index import CrimeIndex, crime_index
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TILE_SIZE = 256
+MAX_ZOOM = 18
+
+# Heat spread around each incident, in screen pixels at every zoom
+RADIUS_PX = 12
+
+# Severity per kernel area at which the colour ramp saturates
+SATURATION = 20.0
+
+# Colour ramp stops: heat fraction -> RGBA
+RAMP_STOPS = [0.0, 0.15, 0.5, 1.0]
+RAMP_COLORS = np.array([
+    [255, 235, 59, 0],
+    [255, 235, 59, 110],
+    [255, 152, 0, 170],
+    [211, 47, 47, 220]
+], dtype=np.float64)
+
+
+def encode_png(rgba: np.ndarray) -> bytes:
+    """Encode an (H, W, 4) uint8 array as a PNG"""
+    height, width = rgba.shape[:2]
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    # Filter type 0 (None) prefixed to every scanline
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), rgba.reshape(height, width * 4)])
+    return (
+        b"\x89PNG\r\n\x1a\n" +
+        chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)) +
+        chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)) +
+        chunk(b"IEND", b"")
+    )
+
+
+def _world_px(lat, lng, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Web Mercator pixel coordinates at a zoom level"""
+    scale = TILE_SIZE * 2 ** zoom
+    lat = np.clip(np.radians(lat), -1.4844, 1.4844)
+    x = (np.asarray(lng) + 180.0) / 360.0 * scale
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * scale
+    return x, y
+
+
+def _px_lat_lng(x: float, y: float, zoom: int) -> Tuple[float, float]:
+    scale = TILE_SIZE * 2 ** zoom
+    lng = x / scale * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1.0 - 2.0 * y / scale))))
+    return lat, lng
+
+
+def _box_blur(grid: np.ndarray, radius: int, axis: int) -> np.ndarray:
+    padded = np.concatenate([
+        np.zeros_like(grid.take([0], axis=axis)),
+        np.cumsum(grid, axis=axis)
+    ], axis=axis)
+    size = grid.shape[axis]
+    upper = padded.take(np.minimum(np.arange(size) + radius + 1, size), axis=axis)
+    lower = padded.take(np.maximum(np.arange(size) - radius, 0), axis=axis)
+    return (upper - lower) / (2 * radius + 1)
+
+
+def render_tile(zoom: int, x: int, y: int, lats: np.ndarray, lngs: np.ndarray, weights: np.ndarray) -> bytes:
+    """Render a heat tile from incidents near it (three box blurs approximate a gaussian)"""
+    pad = RADIUS_PX * 2
+    size = TILE_SIZE + 2 * pad
+    grid = np.zeros((size, size))
+
+    px, py = _world_px(lats, lngs, zoom)
+    cols = np.floor(px - x * TILE_SIZE + pad).astype(np.int64)
+    rows = np.floor(py - y * TILE_SIZE + pad).astype(np.int64)
+    inside = (cols >= 0) & (cols < size) & (rows >= 0) & (rows < size)
+    np.add.at(grid, (rows[inside], cols[inside]), weights[inside])
+
+    radius = max(1, RADIUS_PX // 3)
+    for _ in range(3):
+        grid = _box_blur(_box_blur(grid, radius, 0), radius, 1)
+    grid = grid[pad:pad + TILE_SIZE, pad:pad + TILE_SIZE] * (2 * radius + 1) ** 2
+
+    heat = np.clip(np.log1p(grid) / math.log1p(SATURATION), 0.0, 1.0)
+    rgba = np.stack([np.interp(heat, RAMP_STOPS, RAMP_COLORS[:, channel]) for channel in range(4)], axis=-1)
+    return encode_png(rgba.round().astype(np.uint8))
+
+
+EMPTY_TILE = encode_png(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
+
+
+class HeatTileCache:
+    """
+    Crime density heat tiles (z/x/y PNG) rendered from the in-memory crime
+    index and cached on disk.
+
+    Tiles are rendered once and then served from TILE_CACHE_DIR, under a
+    directory named after the incidents loaded at startup, so tiles left by
+    a run with other data are never served. When incidents change, only the
+    tiles whose blur radius reaches them are deleted (one or a few per zoom
+    level, per burst of changes, in a thread) and are re-rendered on their
+    next request.
+    """
+
+    def __init__(
+        self,
+        index: CrimeIndex,
+        cache_dir: str = os.getenv("TILE_CACHE_DIR", "tile_cache"),
+        invalidate_delay: float = float(os.getenv("TILE_INVALIDATE_DELAY", "0.5"))
+    ):
+        self.index = index
+        self.cache_dir = cache_dir
+        self.invalidate_delay = invalidate_delay
+        self.version = "v0"
+        self.in_flight: Dict[Tuple[int, int, int], asyncio.Future] = {}
+        self.generation = 0
+        self.pending_points: List[Tuple[float, float]] = []
+        self.invalidate_task: Optional[asyncio.Task] = None
+        self.stats = {"hits": 0, "renders": 0, "invalidated": 0}
+
+    async def start(self):
+        """Version the disk cache by the loaded incidents and drop other versions"""
+        self.version = f"v{self.index.fingerprint()}"
+        await asyncio.to_thread(self._remove_stale_versions)
+
+    def _remove_stale_versions(self):
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name != self.version:
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+
+    async def stop(self):
+        if self.invalidate_task:
+            self.invalidate_task.cancel()
+            await asyncio.gather(self.invalidate_task, return_exceptions=True)
+            self.invalidate_task = None
+        await self.flush_invalidations()
+
+    def _path(self, zoom: int, x: int, y: int) -> str:
+        return os.path.join(self.cache_dir, self.version, str(zoom), str(x), f"{y}.png")
+
+    @staticmethod
+    def etag(tile: bytes) -> str:
+        return f'"{hashlib.md5(tile).hexdigest()}"'
+
+    async def get(self, zoom: int, x: int, y: int) -> bytes:
+        """Return a tile from disk, rendering it (once per concurrent burst) on a miss"""
+        path = self._path(zoom, x, y)
+        try:
+            with open(path, "rb") as f:
+                self.stats["hits"] += 1
+                return f.read()
+        except FileNotFoundError:
+            pass
+
+        key = (zoom, x, y)
+        if key in self.in_flight:
+            return await asyncio.shield(self.in_flight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        try:
+            tile = await self._render(zoom, x, y, path)
+            future.set_result(tile)
+            return tile
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self.in_flight[key]
+
+    async def _render(self, zoom: int, x: int, y: int, path: str) -> bytes:
+        generation = self.generation
+
+        # Incidents within the blur radius of the tile; the index is read on the loop thread
+        margin = RADIUS_PX * 2
+        ne_lat, sw_lng = _px_lat_lng(x * TILE_SIZE - margin, y * TILE_SIZE - margin, zoom)
+        sw_lat, ne_lng = _px_lat_lng((x + 1) * TILE_SIZE + margin, (y + 1) * TILE_SIZE + margin, zoom)
+        crimes = self.index.query_bbox(sw_lat, sw_lng, ne_lat, ne_lng)
+
+        if crimes:
+            tile = await asyncio.to_thread(
+                render_tile, zoom, x, y,
+                np.array([crime["lat"] for crime in crimes]),
+                np.array([crime["lng"] for crime in crimes]),
+                np.array([crime.get("severity", 1) for crime in crimes], dtype=np.float64)
+            )
+        else:
+            tile = EMPTY_TILE
+        self.stats["renders"] += 1
+
+        # Skip the write if incidents changed while rendering, so no stale tile is cached
+        if generation == self.generation:
+            await asyncio.to_thread(self._write, path, tile)
+        return tile
+
+    def _write(self, path: str, tile: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(tile)
+        os.replace(tmp_path, path)
+
+    async def invalidate_point(self, lat: float, lng: float):
+        """Queue deletion of every cached tile an incident at (lat, lng) contributes heat to"""
+        # Renders already running must not write their now stale tile
+        self.generation += 1
+        self.pending_points.append((lat, lng))
+        if self.invalidate_task is None:
+            self.invalidate_task = asyncio.create_task(self._invalidate_later())
+
+    async def _invalidate_later(self):
+        await asyncio.sleep(self.invalidate_delay)
+        self.invalidate_task = None
+        await self.flush_invalidations()
+
+    async def flush_invalidations(self):
+        """Delete the tiles around every queued point, off the event loop"""
+        points, self.pending_points = self.pending_points, []
+        if points:
+            self.stats["invalidated"] += await asyncio.to_thread(self._remove_tiles, points)
+
+    def _remove_tiles(self, points: List[Tuple[float, float]]) -> int:
+        lats = np.array([lat for lat, _ in points])
+        lngs = np.array([lng for _, lng in points])
+        margin = RADIUS_PX * 2
+        removed = 0
+        for zoom in range(MAX_ZOOM + 1):
+            px, py = _world_px(lats, lngs, zoom)
+            last = 2 ** zoom - 1
+            # The margin is under a tile, so each point reaches at most 2 x 2 tiles
+            tiles: Set[Tuple[int, int]] = set()
+            for tx in (np.floor((px - margin) / TILE_SIZE), np.floor((px + margin) / TILE_SIZE)):
+                for ty in (np.floor((py - margin) / TILE_SIZE), np.floor((py + margin) / TILE_SIZE)):
+                    tiles.update(zip(np.clip(tx, 0, last).astype(int).tolist(), np.clip(ty, 0, last).astype(int).tolist()))
+            for tx, ty in tiles:
+                try:
+                    os.remove(self._path(zoom, tx, ty))
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def metrics(self) -> Dict:
+        return dict(self.stats, version=self.version, rendering=len(self.in_flight), pending_invalidations=len(self.pending_points))
+
+
+heat_tiles = HeatTileCache(crime_index)
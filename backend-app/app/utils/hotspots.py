@@ -0,0 +1,146 @@
+import math
+from typing import Dict, List, Optional, Tuple
+
+# Grid cells per 256 px map tile, i.e. one cluster per ~32 px on screen
+CELLS_PER_TILE = 8
+
+# Longest bbox edge (degrees) between polygon vertices; 2dsphere edges are great circles
+EDGE_STEP_DEG = 1.0
+
+
+def cell_size_deg(zoom: int) -> float:
+    """Grid cell size for a web-map zoom level"""
+    return 360.0 / (2 ** zoom * CELLS_PER_TILE)
+
+
+def _ring(sw_lat: float, sw_lng: float, ne_lat: float, ne_lng: float) -> List[List[float]]:
+    steps = max(1, math.ceil((ne_lng - sw_lng) / EDGE_STEP_DEG))
+    lngs = [sw_lng + (ne_lng - sw_lng) * i / steps for i in range(steps + 1)]
+    return (
+        [[lng, sw_lat] for lng in lngs] +
+        [[lng, ne_lat] for lng in reversed(lngs)] +
+        [[sw_lng, sw_lat]]
+    )
+
+
+def bbox_geometry(sw_lat: float, sw_lng: float, ne_lat: float, ne_lng: float) -> Dict:
+    """
+    GeoJSON geometry covering a lat/lng box, for $geoWithin on a 2dsphere index.
+
+    Edges are densified so great-circle arcs stay close to the parallels, the
+    box is padded slightly to keep them outside it, and wide boxes are split
+    into parts under 180 degrees. Callers still apply the exact lat/lng bounds.
+    """
+    pad = 0.01
+    sw_lat, ne_lat = max(sw_lat - pad, -90.0), min(ne_lat + pad, 90.0)
+    sw_lng, ne_lng = max(sw_lng - pad, -180.0), min(ne_lng + pad, 180.0)
+
+    parts = max(1, math.ceil((ne_lng - sw_lng) / 90.0))
+    width = (ne_lng - sw_lng) / parts
+    polygons = [
+        [_ring(sw_lat, sw_lng + width * i, ne_lat, sw_lng + width * (i + 1))]
+        for i in range(parts)
+    ]
+    if len(polygons) == 1:
+        return {"type": "Polygon", "coordinates": polygons[0]}
+    return {"type": "MultiPolygon", "coordinates": polygons}
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Tuple[int, int]]:
+    if not cursor:
+        return None
+    row, col = cursor.split(":")
+    return int(row), int(col)
+
+
+def hotspot_pipeline(
+    sw_lat: float, sw_lng: float, ne_lat: float, ne_lng: float,
+    zoom: int,
+    after: Optional[Tuple[int, int]] = None,
+    limit: int = 500
+) -> List[Dict]:
+    """
+    Aggregation binning every incident in view into a zoom-sized grid.
+
+    Returns one document with a page of cells (ordered by row, col, starting
+    after the cursor cell) and totals over the whole view, so the summary is
+    complete however many incidents match.
+    """
+    size = cell_size_deg(zoom)
+    page = []
+    if after is not None:
+        page.append({"$match": {"$or": [
+            {"_id.row": {"$gt": after[0]}},
+            {"_id.row": after[0], "_id.col": {"$gt": after[1]}}
+        ]}})
+    page.append({"$limit": limit + 1})
+
+    return [
+        {"$match": {
+            "location": {"$geoWithin": {"$geometry": bbox_geometry(sw_lat, sw_lng, ne_lat, ne_lng)}},
+            "lat": {"$gte": sw_lat, "$lte": ne_lat},
+            "lng": {"$gte": sw_lng, "$lte": ne_lng}
+        }},
+        {"$group": {
+            "_id": {
+                "row": {"$floor": {"$divide": ["$lat", size]}},
+                "col": {"$floor": {"$divide": ["$lng", size]}}
+            },
+            "count": {"$sum": 1},
+            "severity": {"$sum": {"$ifNull": ["$severity", 1]}},
+            "max_severity": {"$max": {"$ifNull": ["$severity", 1]}},
+            "lat": {"$avg": "$lat"},
+            "lng": {"$avg": "$lng"}
+        }},
+        {"$sort": {"_id.row": 1, "_id.col": 1}},
+        {"$facet": {
+            "cells": page,
+            "totals": [{"$group": {
+                "_id": None,
+                "cells": {"$sum": 1},
+                "incidents": {"$sum": "$count"},
+                "severity": {"$sum": "$severity"}
+            }}]
+        }}
+    ]
+
+
+async def query_hotspots(
+    collection,
+    sw_lat: float, sw_lng: float, ne_lat: float, ne_lng: float,
+    zoom: int,
+    cursor: Optional[str] = None,
+    limit: int = 500
+) -> Dict:
+    """Grid-clustered crime summary for a map view, paginated by cell"""
+    pipeline = hotspot_pipeline(
+        sw_lat, sw_lng, ne_lat, ne_lng, zoom, parse_cursor(cursor), limit
+    )
+    result = (await collection.aggregate(pipeline, allowDiskUse=True).to_list(1))[0]
+
+    cells = result["cells"][:limit]
+    totals = result["totals"][0] if result["totals"] else {"cells": 0, "incidents": 0, "severity": 0}
+    next_cursor = None
+    if len(result["cells"]) > limit:
+        last = cells[-1]["_id"]
+        next_cursor = f"{int(last['row'])}:{int(last['col'])}"
+
+    return {
+        "zoom": zoom,
+        "cell_size_deg": cell_size_deg(zoom),
+        "total_incidents": totals["incidents"],
+        "total_severity": totals["severity"],
+        "total_cells": totals["cells"],
+        "count": len(cells),
+        "hotspots": [
+            {
+                "lat": cell["lat"],
+                "lng": cell["lng"],
+                "count": cell["count"],
+                "severity": cell["severity"],
+                "max_severity": cell["max_severity"]
+            }
+            for cell in cells
+        ],
+        "next_cursor": next_cursor
+    }
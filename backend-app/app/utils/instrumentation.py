@@ -0,0 +1,121 @@
+"""
+Request instrumentation middleware.
+
+Records every HTTP request into the latency histogram (labelled by route
+template, not raw path), returns the request's stage timings in a
+Server-Timing header, and optionally profiles requests with cProfile:
+
+- PROFILE_SAMPLE_RATE: fraction of requests profiled (default 0, off)
+- PROFILE_TOKEN: when set, a request carrying "X-Profile: <token>" is profiled
+- PROFILE_DIR: where .prof files are written (open with pstats or snakeviz)
+
+With both off, the per-request cost is one histogram observation. cProfile
+sees the whole event loop, so a profile also contains whatever other
+requests ran while it was active; only one request is profiled at a time.
+"""
+import asyncio
+import cProfile
+import os
+import random
+import re
+import secrets
+import time
+from datetime import datetime
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from app.utils.metrics import http_request_seconds, profiles_written, request_stages
+
+load_dotenv()
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+
+class InstrumentationMiddleware:
+    def __init__(
+        self,
+        app,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+        profile_token: Optional[str] = PROFILE_TOKEN,
+        profile_dir: str = PROFILE_DIR
+    ):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.profile_token = profile_token.encode() if profile_token else None
+        self.profile_dir = profile_dir
+        self.profiling = False
+        self.route_paths: Optional[Dict] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        stages = []
+        token = request_stages.set(stages)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if stages:
+                    timing = ", ".join(f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in stages)
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        profiler = self._start_profiler(scope)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - started
+            request_stages.reset(token)
+            route = self._route(scope)
+            http_request_seconds.observe(elapsed, scope["method"], route, str(status))
+            if profiler is not None:
+                profiler.disable()
+                self.profiling = False
+                await self._dump(profiler, scope["method"], route, elapsed)
+
+    def _start_profiler(self, scope) -> Optional[cProfile.Profile]:
+        if self.profiling:
+            return None
+        wanted = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not wanted and self.profile_token is not None:
+            header = dict(scope["headers"]).get(b"x-profile")
+            wanted = header is not None and secrets.compare_digest(header, self.profile_token)
+        if not wanted:
+            return None
+
+        self.profiling = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    async def _dump(self, profiler: cProfile.Profile, method: str, route: str, elapsed: float):
+        name = re.sub(r"[^A-Za-z0-9_-]+", "_", route).strip("_") or "root"
+        path = os.path.join(
+            self.profile_dir,
+            f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{method}-{name}-{elapsed * 1000:.0f}ms.prof"
+        )
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            await asyncio.to_thread(profiler.dump_stats, path)
+            profiles_written.inc()
+        except OSError as e:
+            print(f"Could not write profile {path}: {e}")
+
+    def _route(self, scope) -> str:
+        """Route template of the matched endpoint, keeping label cardinality bounded"""
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self.route_paths is None:
+            self.route_paths = {
+                route.endpoint: route.path
+                for route in scope["app"].routes
+                if hasattr(route, "endpoint")
+            }
+        return self.route_paths.get(endpoint, "unmatched")
@@ -0,0 +1,186 @@
+import math
+from typing import Dict, List, Optional, Set, Tuple
+from app.utils.crime_index import CrimeIndex, crime_index
+from app.utils.crime_proximity import METERS_PER_DEGREE
+from app.utils.safety_scoring import SafetyScorer, scorer
+
+# Consecutive off-route positions before a deviation alert (filters GPS jitter)
+DEVIATION_CONFIRMATIONS = 2
+
+# Alerts clear once the value falls below this fraction of its threshold
+HYSTERESIS = 0.8
+
+# Crimes are pulled from the index in tiles of this size as the journey reaches them
+CRIME_TILE_M = 1000.0
+
+
+class LocalProjection:
+    """Equirectangular projection to metres around a journey's start point"""
+
+    def __init__(self, lat: float, lng: float):
+        self.lat0 = lat
+        self.lng0 = lng
+        self.kx = math.cos(math.radians(lat)) * METERS_PER_DEGREE
+        self.ky = METERS_PER_DEGREE
+
+    def project(self, lat: float, lng: float) -> Tuple[float, float]:
+        return (lng - self.lng0) * self.kx, (lat - self.lat0) * self.ky
+
+    def unproject(self, x: float, y: float) -> Tuple[float, float]:
+        return self.lat0 + y / self.ky, self.lng0 + x / self.kx
+
+
+class RouteSegmentIndex:
+    """
+    Grid hash of a route's segments for nearest-segment distance queries.
+
+    Segments are split to at most cell_m and registered in every cell their
+    bounding box touches, so the 3x3 cells around a position hold every
+    segment within cell_m of it; farther routes report infinity.
+    """
+
+    def __init__(self, projection: LocalProjection, route_coords: List[List[float]], cell_m: float):
+        self.cell_m = cell_m
+        self.segments: List[Tuple[float, float, float, float, float]] = []
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+
+        points = [projection.project(lat, lng) for lat, lng in route_coords]
+        if len(points) == 1:
+            points.append(points[0])
+        for (ax, ay), (bx, by) in zip(points, points[1:]):
+            pieces = max(1, math.ceil(math.hypot(bx - ax, by - ay) / cell_m))
+            for i in range(pieces):
+                x0, y0 = ax + (bx - ax) * i / pieces, ay + (by - ay) * i / pieces
+                x1, y1 = ax + (bx - ax) * (i + 1) / pieces, ay + (by - ay) * (i + 1) / pieces
+                self._add(x0, y0, x1, y1)
+
+    def _add(self, x0: float, y0: float, x1: float, y1: float):
+        segment_id = len(self.segments)
+        dx, dy = x1 - x0, y1 - y0
+        self.segments.append((x0, y0, dx, dy, dx * dx + dy * dy))
+        for i in range(math.floor(min(x0, x1) / self.cell_m), math.floor(max(x0, x1) / self.cell_m) + 1):
+            for j in range(math.floor(min(y0, y1) / self.cell_m), math.floor(max(y0, y1) / self.cell_m) + 1):
+                self.cells.setdefault((i, j), []).append(segment_id)
+
+    def distance(self, x: float, y: float) -> float:
+        """Distance in metres to the nearest segment, or inf beyond cell_m"""
+        ci, cj = math.floor(x / self.cell_m), math.floor(y / self.cell_m)
+        best = math.inf
+        for i in (ci - 1, ci, ci + 1):
+            for j in (cj - 1, cj, cj + 1):
+                for segment_id in self.cells.get((i, j), ()):
+                    x0, y0, dx, dy, length2 = self.segments[segment_id]
+                    t = ((x - x0) * dx + (y - y0) * dy) / length2 if length2 else 0.0
+                    t = 0.0 if t < 0.0 else 1.0 if t > 1.0 else t
+                    ex, ey = x - x0 - t * dx, y - y0 - t * dy
+                    d2 = ex * ex + ey * ey
+                    if d2 < best:
+                        best = d2
+        return math.sqrt(best) if best <= self.cell_m * self.cell_m else math.inf
+
+
+class CrimeGrid:
+    """
+    Projected crime points bucketed by radius_m, filled lazily per tile from
+    the crime index as the journey reaches new areas. Loaded tiles are
+    dropped whenever the index changes, so new incidents count from then on.
+    """
+
+    def __init__(self, projection: LocalProjection, index: CrimeIndex, weights: Dict[str, float], radius_m: float):
+        self.projection = projection
+        self.index = index
+        self.weights = weights
+        self.radius_m = radius_m
+        self.cells: Dict[Tuple[int, int], List[Tuple[float, float, float]]] = {}
+        self.tiles: Set[Tuple[int, int]] = set()
+        self.generation = index.generation
+
+    def _load_tile(self, tile: Tuple[int, int]):
+        self.tiles.add(tile)
+        sw_lat, sw_lng = self.projection.unproject(tile[0] * CRIME_TILE_M, tile[1] * CRIME_TILE_M)
+        ne_lat, ne_lng = self.projection.unproject((tile[0] + 1) * CRIME_TILE_M, (tile[1] + 1) * CRIME_TILE_M)
+        default = self.weights["other"]
+        for crime in self.index.query_bbox(sw_lat, sw_lng, ne_lat, ne_lng):
+            x, y = self.projection.project(crime["lat"], crime["lng"])
+            # A crime on a shared tile edge belongs to one tile only
+            if (math.floor(x / CRIME_TILE_M), math.floor(y / CRIME_TILE_M)) != tile:
+                continue
+            weight = crime.get("severity", 1) * self.weights.get(crime.get("crime_type"), default)
+            cell = (math.floor(x / self.radius_m), math.floor(y / self.radius_m))
+            self.cells.setdefault(cell, []).append((x, y, weight))
+
+    def exposure(self, x: float, y: float) -> float:
+        """Weighted severity of crimes within radius_m of a projected position"""
+        if self.generation != self.index.generation:
+            self.cells, self.tiles = {}, set()
+            self.generation = self.index.generation
+        tx, ty = math.floor(x / CRIME_TILE_M), math.floor(y / CRIME_TILE_M)
+        for tile in ((tx + i, ty + j) for i in (-1, 0, 1) for j in (-1, 0, 1)):
+            if tile not in self.tiles:
+                self._load_tile(tile)
+
+        ci, cj = math.floor(x / self.radius_m), math.floor(y / self.radius_m)
+        radius2 = self.radius_m * self.radius_m
+        total = 0.0
+        for i in (ci - 1, ci, ci + 1):
+            for j in (cj - 1, cj, cj + 1):
+                for cx, cy, weight in self.cells.get((i, j), ()):
+                    if (cx - x) * (cx - x) + (cy - y) * (cy - y) <= radius2:
+                        total += weight
+        return total
+
+
+class JourneyMonitor:
+    """
+    Incremental per-position checks for one live journey.
+
+    Each update projects the position once, looks up the nearest route
+    segment and nearby crimes through grid hashes, and returns alert events
+    when SafetyScorer thresholds are crossed (with hysteresis, so a position
+    hovering at a threshold does not flap).
+    """
+
+    def __init__(
+        self,
+        route_coords: Optional[List[List[float]]],
+        start: Tuple[float, float],
+        safety_scorer: SafetyScorer = scorer,
+        index: CrimeIndex = crime_index
+    ):
+        self.deviation_m = safety_scorer.deviation_threshold_m
+        self.risk_threshold = safety_scorer.risk_zone_threshold
+        origin = route_coords[0] if route_coords else start
+        self.projection = LocalProjection(origin[0], origin[1])
+        self.route = RouteSegmentIndex(self.projection, route_coords, self.deviation_m) if route_coords else None
+        self.crimes = CrimeGrid(self.projection, index, safety_scorer.crime_weights, safety_scorer.crime_radius_m)
+        self.off_route_count = 0
+        self.off_route = False
+        self.in_risk_zone = False
+
+    def update(self, lat: float, lng: float) -> List[Dict]:
+        x, y = self.projection.project(lat, lng)
+        events = []
+
+        if self.route is not None:
+            distance = self.route.distance(x, y)
+            if distance > self.deviation_m:
+                self.off_route_count += 1
+                if not self.off_route and self.off_route_count >= DEVIATION_CONFIRMATIONS:
+                    self.off_route = True
+                    events.append({"alert": "route_deviation", "lat": lat, "lng": lng,
+                                   "distance_m": None if distance == math.inf else round(distance)})
+            else:
+                self.off_route_count = 0
+                if self.off_route and distance < self.deviation_m * HYSTERESIS:
+                    self.off_route = False
+                    events.append({"alert": "back_on_route", "lat": lat, "lng": lng})
+
+        exposure = self.crimes.exposure(x, y)
+        if not self.in_risk_zone and exposure >= self.risk_threshold:
+            self.in_risk_zone = True
+            events.append({"alert": "risk_zone_entered", "lat": lat, "lng": lng, "exposure": round(exposure, 1)})
+        elif self.in_risk_zone and exposure < self.risk_threshold * HYSTERESIS:
+            self.in_risk_zone = False
+            events.append({"alert": "risk_zone_left", "lat": lat, "lng": lng, "exposure": round(exposure, 1)})
+
+        return events
@@ -0,0 +1,33 @@
+"""
+orjson-backed JSON responses for the high-volume endpoints.
+
+FastAPI's default path runs every return value through jsonable_encoder (and
+the response_model validator) before json.dumps. Handlers that build their
+output from trusted data return a FastJSONResponse instead, which skips
+both and serializes in one orjson call: ObjectId via str, datetime as ISO
+8601, numpy arrays and scalars natively.
+"""
+from typing import Any
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj: Any):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(by_alias=True)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any, newline: bool = False) -> bytes:
+    return orjson.dumps(content, default=_default, option=(OPTIONS | orjson.OPT_APPEND_NEWLINE) if newline else OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
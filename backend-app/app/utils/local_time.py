@@ -0,0 +1,42 @@
+"""
+The deployment's local timezone.
+
+Times are stored in UTC (Mongo hands them back naive) and risk raster
+slots are indexed by UTC hour of week, but time-of-day buckets follow the
+local wall clock. LOCAL_TIMEZONE names the zone as an IANA key (e.g.
+Asia/Kolkata); left unset, the server's own timezone is used.
+"""
+import os
+from datetime import datetime, timezone, tzinfo
+from typing import Optional
+from zoneinfo import ZoneInfo
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOCAL_TIMEZONE = os.getenv("LOCAL_TIMEZONE")
+
+
+def local_timezone(name: Optional[str] = None) -> Optional[tzinfo]:
+    """The named zone, else the configured one; None means the server's own"""
+    name = name or LOCAL_TIMEZONE
+    return ZoneInfo(name) if name else None
+
+
+def to_local(when: datetime, tz: Optional[tzinfo] = None) -> datetime:
+    """when on the local wall clock; naive times are taken as UTC"""
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return when.astimezone(tz or local_timezone())
+
+
+def from_local(when: datetime, tz: Optional[tzinfo] = None) -> datetime:
+    """Naive UTC, as stored; naive times are read on the local wall clock"""
+    if when.tzinfo is None:
+        tz = tz or local_timezone()
+        when = when.replace(tzinfo=tz) if tz else when.astimezone()
+    return when.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def now_local(tz: Optional[tzinfo] = None) -> datetime:
+    return to_local(datetime.now(timezone.utc), tz)
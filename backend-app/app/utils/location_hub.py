@@ -0,0 +1,188 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Set
+from pymongo.errors import BulkWriteError, PyMongoError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class LocationHub:
+    """
+    In-process pub/sub and write-behind buffer for live journey positions.
+
+    publish() never waits: points are handed to each watcher's bounded queue
+    (a slow watcher drops its oldest points, not the tracker's) and appended
+    to a buffer that a background task flushes to the location_points
+    time-series collection with one insert_many per batch or interval.
+    Watchers only see journeys tracked by the same worker process.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = int(os.getenv("LOCATION_BATCH_SIZE", "500")),
+        flush_interval: float = float(os.getenv("LOCATION_FLUSH_INTERVAL", "1")),
+        max_buffer: int = int(os.getenv("LOCATION_MAX_BUFFER", "50000")),
+        watcher_queue_size: int = 64
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.watcher_queue_size = watcher_queue_size
+        self.watchers: Dict[str, Set[asyncio.Queue]] = {}
+        self.trackers: Dict[str, Set[asyncio.Event]] = {}
+        self.buffer: Deque[Dict] = deque(maxlen=max_buffer)
+        self.collection = None
+        self.task: Optional[asyncio.Task] = None
+        self.wake = None
+        self.running = False
+        self.stats = {
+            "published": 0,
+            "delivered": 0,
+            "watcher_drops": 0,
+            "buffer_drops": 0,
+            "persisted": 0,
+            "duplicates": 0,
+            "flushes": 0,
+            "flush_seconds": 0.0
+        }
+
+    async def start(self, collection):
+        self.collection = collection
+        self.wake = asyncio.Event()
+        self.running = True
+        self.task = asyncio.create_task(self._flusher())
+
+    async def stop(self):
+        if self.task:
+            # wait_for can swallow a cancel that races with a wake-up (Python 3.11)
+            self.running = False
+            self.wake.set()
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        # Persist whatever is still buffered
+        while self.buffer and self.collection is not None:
+            if not await self._flush():
+                break
+
+    def subscribe(self, journey_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.watcher_queue_size)
+        self.watchers.setdefault(journey_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, journey_id: str, queue: asyncio.Queue):
+        queues = self.watchers.get(journey_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self.watchers[journey_id]
+
+    def track(self, journey_id: str) -> asyncio.Event:
+        """Register a tracker socket; the returned event is set when the journey ends"""
+        ended = asyncio.Event()
+        self.trackers.setdefault(journey_id, set()).add(ended)
+        return ended
+
+    def untrack(self, journey_id: str, ended: asyncio.Event):
+        events = self.trackers.get(journey_id)
+        if events is None:
+            return
+        events.discard(ended)
+        if not events:
+            del self.trackers[journey_id]
+
+    def notify(self, journey_id: str, event: Dict):
+        """Fan an event out to a journey's watchers without persisting it"""
+        for queue in self.watchers.get(journey_id, ()):
+            if queue.full():
+                queue.get_nowait()
+                self.stats["watcher_drops"] += 1
+            queue.put_nowait(event)
+
+    def end(self, journey_id: str):
+        """Tell a journey's trackers and watchers it has ended (None is the watchers' end marker)"""
+        for ended in self.trackers.get(journey_id, ()):
+            ended.set()
+        for queue in self.watchers.get(journey_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+    def publish(self, journey_id: str, point: Dict):
+        """Fan a position out to watchers and queue it for persistence"""
+        self.stats["published"] += 1
+        for queue in self.watchers.get(journey_id, ()):
+            if queue.full():
+                queue.get_nowait()
+                self.stats["watcher_drops"] += 1
+            queue.put_nowait(point)
+            self.stats["delivered"] += 1
+
+        if len(self.buffer) == self.buffer.maxlen:
+            self.stats["buffer_drops"] += 1
+        self.buffer.append(point)
+        if len(self.buffer) >= self.batch_size and self.wake is not None:
+            self.wake.set()
+
+    async def _flusher(self):
+        while self.running:
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+            while self.buffer:
+                if not await self._flush():
+                    break
+                if len(self.buffer) < self.batch_size:
+                    break
+
+    async def _flush(self) -> bool:
+        batch = [self.buffer.popleft() for _ in range(min(self.batch_size, len(self.buffer)))]
+        started = time.perf_counter()
+        try:
+            await self.collection.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # Points carry their _id, so a duplicate was written by an earlier attempt: retry only the other failures.
+            # Time-series collections do not enforce a unique _id, so there a retry can store a point twice;
+            # readers of location_points drop repeated _ids.
+            errors = e.details.get("writeErrors", [])
+            failed = sorted(error["index"] for error in errors if error.get("code") != 11000)
+            self.stats["persisted"] += e.details.get("nInserted", 0)
+            self.stats["duplicates"] += len(errors) - len(failed)
+            if failed:
+                print(f"Location flush failed for {len(failed)} points: {errors[0].get('errmsg')}")
+                self._requeue([batch[i] for i in failed])
+                return False
+            return True
+        except PyMongoError as e:
+            print(f"Location flush failed: {e}")
+            self._requeue(batch)
+            return False
+        self.stats["persisted"] += len(batch)
+        self.stats["flushes"] += 1
+        self.stats["flush_seconds"] += time.perf_counter() - started
+        return True
+
+    def _requeue(self, batch):
+        """Put points back for a later flush, dropping the oldest if the buffer has refilled"""
+        room = self.buffer.maxlen - len(self.buffer)
+        kept = batch[len(batch) - room:] if room > 0 else []
+        self.stats["buffer_drops"] += len(batch) - len(kept)
+        self.buffer.extendleft(reversed(kept))
+
+    def metrics(self) -> Dict:
+        flushes = self.stats["flushes"]
+        return {
+            **{key: value for key, value in self.stats.items() if key != "flush_seconds"},
+            "journeys_watched": len(self.watchers),
+            "watchers": sum(len(queues) for queues in self.watchers.values()),
+            "buffered": len(self.buffer),
+            "avg_flush_ms": self.stats["flush_seconds"] / flushes * 1000 if flushes else None
+        }
+
+
+location_hub = LocationHub()
@@ -1,7 +1,128 @@
 import requests
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 import aiohttp
 import asyncio
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+OSRM_BASE_URL = os.getenv("OSRM_BASE_URL", "http://router.project-osrm.org")
+
+# Map mode to OSRM profile
+PROFILE_MAP = {
+    "walk": "foot",
+    "bike": "bike",
+    "car": "car"
+}
+
+class OSRMClient:
+    """
+    Application-lifetime OSRM client.
+
+    Holds one pooled keep-alive session for the whole process and coalesces
+    identical in-flight requests so concurrent callers share one upstream call.
+    """
+
+    def __init__(
+        self,
+        base_url: str = OSRM_BASE_URL,
+        pool_size: int = int(os.getenv("OSRM_POOL_SIZE", "32")),
+        timeout: float = float(os.getenv("OSRM_TIMEOUT", "5"))
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=min(timeout, 2.0))
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.in_flight: Dict[Tuple, asyncio.Future] = {}
+
+    async def start(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            keepalive_timeout=30,
+            ttl_dns_cache=300
+        )
+        self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def route(
+        self,
+        src_lat: float,
+        src_lng: float,
+        dest_lat: float,
+        dest_lng: float,
+        profile: str
+    ) -> Optional[Dict]:
+        """Fetch a route, joining an identical request already in flight"""
+        key = (profile, src_lat, src_lng, dest_lat, dest_lng)
+        while key in self.in_flight:
+            pending = self.in_flight[key]
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The leader was cancelled (e.g. its client went away): retry, leading if no one else has
+
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        try:
+            result = await self._fetch(src_lat, src_lng, dest_lat, dest_lng, profile)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            # Not shared: joined callers still want the route
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unjoined failure is not logged as unhandled
+            future.exception()
+            raise
+        finally:
+            del self.in_flight[key]
+
+    async def _fetch(self, src_lat, src_lng, dest_lat, dest_lng, profile) -> Optional[Dict]:
+        if self.session is None:
+            await self.start()
+
+        url = f"{self.base_url}/route/v1/{profile}/{src_lng},{src_lat};{dest_lng},{dest_lat}"
+        params = {
+            "overview": "full",
+            "geometries": "geojson",
+            "steps": "true"
+        }
+
+        async with self.session.get(url, params=params) as response:
+            if response.status != 200:
+                return None
+            data = await response.json()
+
+        if data.get("code") != "Ok" or not data.get("routes"):
+            return None
+
+        route = data["routes"][0]
+        geometry = route.get("geometry", {})
+
+        # Extract coordinates
+        coordinates = []
+        if geometry.get("type") == "LineString":
+            coordinates = [
+                [coord[1], coord[0]]  # Convert from [lng, lat] to [lat, lng]
+                for coord in geometry.get("coordinates", [])
+            ]
+
+        return {
+            "distance": route.get("distance", 0),  # meters
+            "duration": route.get("duration", 0),  # seconds
+            "coordinates": coordinates
+        }
+
+osrm_client = OSRMClient()
 
 async def get_route_from_osrm(
     src_lat: float, 
@@ -13,48 +134,15 @@ async def get_route_from_osrm(
     """
     Get route from OSRM API
     """
-    # Map mode to OSRM profile
-    profile_map = {
-        "walk": "foot",
-        "bike": "bike",
-        "car": "car"
-    }
-    
-    profile = profile_map.get(mode, "foot")
+    profile = PROFILE_MAP.get(mode, "foot")
     
     try:
-        url = f"http://router.project-osrm.org/route/v1/{profile}/{src_lng},{src_lat};{dest_lng},{dest_lat}"
-        params = {
-            "overview": "full",
-            "geometries": "geojson",
-            "steps": "true"
-        }
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    
-                    if data.get("code") == "Ok" and data.get("routes"):
-                        route = data["routes"][0]
-                        geometry = route.get("geometry", {})
-                        
-                        # Extract coordinates
-                        coordinates = []
-                        if geometry.get("type") == "LineString":
-                            coordinates = [
-                                [coord[1], coord[0]]  # Convert from [lng, lat] to [lat, lng]
-                                for coord in geometry.get("coordinates", [])
-                            ]
-                        
-                        return {
-                            "distance": route.get("distance", 0),  # meters
-                            "duration": route.get("duration", 0),  # seconds
-                            "coordinates": coordinates
-                        }
+        route = await osrm_client.route(src_lat, src_lng, dest_lat, dest_lng, profile)
+        if route:
+            return route
     
     except Exception as e:
-        print(f"OSRM API error: {e}")
+        print(f"OSRM API error: {e!r}")
     
     # Fallback: Generate mock route
     return generate_mock_route(src_lat, src_lng, dest_lat, dest_lng)
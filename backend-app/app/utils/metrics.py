@@ -0,0 +1,184 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Histograms and counters live in a module-level registry and are rendered by
+GET /metrics. Each uvicorn worker (and each scoring process worker) keeps
+its own registry, so scrape every worker or run a single one per container.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from pymongo import monitoring
+
+# Seconds; spans sub-millisecond Mongo calls up to slow OSRM fetches
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.series: Dict[Tuple[str, ...], List] = {}
+        # Observations also come from executor threads
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += 1
+            series[2] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            snapshot = [(labels, list(series[0]), series[1], series[2]) for labels, series in self.series.items()]
+        for labels, counts, count, total in sorted(snapshot):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, labels, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_label_text(self.labelnames, labels, le)} {count}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            snapshot = sorted(self.values.items())
+        lines.extend(f"{self.name}{_label_text(self.labelnames, labels)} {value}" for labels, value in snapshot)
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+
+registry = Registry()
+
+http_request_seconds = registry.register(Histogram(
+    "shakti_http_request_duration_seconds",
+    "HTTP request latency by route template, method and status",
+    ("method", "route", "status")
+))
+stage_seconds = registry.register(Histogram(
+    "shakti_stage_duration_seconds",
+    "Time spent in instrumented stages of request handling",
+    ("stage",)
+))
+mongo_command_seconds = registry.register(Histogram(
+    "shakti_mongo_command_duration_seconds",
+    "MongoDB command latency by command and collection",
+    ("command", "collection")
+))
+mongo_command_failures = registry.register(Counter(
+    "shakti_mongo_command_failures_total",
+    "Failed MongoDB commands by command and collection",
+    ("command", "collection")
+))
+profiles_written = registry.register(Counter(
+    "shakti_profiles_written_total",
+    "Request profiles written by the sampling profiler"
+))
+
+# Stage timings of the current request, for the Server-Timing header
+request_stages: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_stages", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a stage into the stage histogram and the current request's Server-Timing"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, name)
+        stages = request_stages.get()
+        if stages is not None:
+            stages.append((name, elapsed))
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Feeds every MongoDB command's duration into the mongo histograms"""
+
+    # Admin chatter that would only add noise
+    IGNORED = {"hello", "isMaster", "ismaster", "ping", "saslStart", "saslContinue", "endSessions", "buildInfo"}
+
+    def __init__(self):
+        self.pending: Dict[Tuple, Tuple[str, str]] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        if event.command_name in self.IGNORED:
+            return
+        target = event.command.get(event.command_name)
+        collection = target if isinstance(target, str) else ""
+        self.pending[(event.connection_id, event.request_id)] = (event.command_name, collection)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        labels = self.pending.pop((event.connection_id, event.request_id), None)
+        if labels is not None:
+            mongo_command_seconds.observe(event.duration_micros / 1e6, *labels)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        labels = self.pending.pop((event.connection_id, event.request_id), None)
+        if labels is not None:
+            mongo_command_seconds.observe(event.duration_micros / 1e6, *labels)
+            mongo_command_failures.inc(*labels)
+
+
+mongo_listener = MongoCommandListener()
@@ -0,0 +1,368 @@
+"""
+Precomputed crime risk raster.
+
+A periodic job rasterizes crime_data into a severity-weighted grid and
+writes it to a single file. Layers are either the four time-of-day buckets
+or hour-of-week slots (e.g. 56 three-hour slots) in which every incident is
+also weighted by a recency decay, so last week's late-night harassment
+counts far more than a three-year-old daytime theft. API workers
+memory-map that file, so every uvicorn worker shares one page-cached copy
+and route scoring becomes bilinear lookups along the polyline in the one
+layer for the trip's time.
+
+Decay is relative to the build time, so rebuild the raster regularly
+(e.g. nightly). Slots are indexed by UTC hour of week, but each slot's
+time risk follows the deployment's local wall clock (LOCAL_TIMEZONE), as
+the scorer's own time factor does.
+
+Build with:
+    python -m app.utils.risk_raster --out data/risk_raster.bin
+"""
+import argparse
+import json
+import math
+import os
+import struct
+import time
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.utils.crime_proximity import METERS_PER_DEGREE
+from app.utils.local_time import local_timezone, now_local, to_local
+
+MAGIC = b"SHKRISK1"
+HEADER_ALIGN = 64
+TIME_BUCKETS = ["day", "evening", "night", "late_night"]
+
+# Representative hour of each bucket, for requests that name a bucket but no time
+BUCKET_HOURS = {"day": 12, "evening": 20, "night": 23, "late_night": 3}
+
+HOURS_PER_WEEK = 168
+
+# Share of an incident's weight given to its own hour-of-week slot; the rest
+# goes to the neighbouring slots so sparse data does not leave gaps
+SLOT_KERNEL = (0.25, 0.5, 0.25)
+
+
+def hour_bucket(hour: int) -> str:
+    """Map an hour of day onto the SafetyScorer.time_risk buckets"""
+    if 6 <= hour < 18:
+        return "day"
+    elif 18 <= hour < 22:
+        return "evening"
+    elif hour >= 22 or hour < 2:
+        return "night"
+    return "late_night"
+
+
+def week_slot(when: datetime, slot_hours: int) -> int:
+    """
+    Hour-of-week slot of a time, Monday 00:00 UTC being the start of slot 0.
+    Naive times are taken as UTC (as Mongo returns reported_at); aware ones
+    are converted, so trips and incidents land in the same slots.
+    """
+    if when.tzinfo is not None:
+        when = when.astimezone(timezone.utc)
+    return (when.weekday() * 24 + when.hour) // slot_hours
+
+
+def bucket_time(time_of_day: str, now: datetime) -> datetime:
+    """A time today that falls in the given bucket (now, if it already does)"""
+    if time_of_day not in BUCKET_HOURS or hour_bucket(now.hour) == time_of_day:
+        return now
+    return now.replace(hour=BUCKET_HOURS[time_of_day], minute=0, second=0, microsecond=0)
+
+
+class RiskRaster:
+    """Memory-mapped risk grid of shape (len(buckets), rows, cols)"""
+
+    def __init__(self, grid: np.ndarray, meta: Dict):
+        self.grid = grid
+        self.meta = meta
+        self.buckets = meta["buckets"]
+        self.south = meta["south"]
+        self.west = meta["west"]
+        self.cell_lat = meta["cell_lat"]
+        self.cell_lng = meta["cell_lng"]
+        self.cell_m = meta["cell_m"]
+        self.slot_hours = meta.get("slot_hours", 0)
+        self.rows, self.cols = grid.shape[1], grid.shape[2]
+
+    @property
+    def temporal(self) -> bool:
+        """Whether layers are hour-of-week slots rather than time-of-day buckets"""
+        return self.slot_hours > 0
+
+    def layer_index(self, bucket: str, when: Optional[datetime] = None) -> int:
+        if self.temporal:
+            return week_slot(when or bucket_time(bucket, now_local()), self.slot_hours)
+        return self.buckets.index(bucket) if bucket in self.buckets else 0
+
+    @classmethod
+    def load(cls, path: str) -> "RiskRaster":
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a risk raster file")
+            (header_len,) = struct.unpack("<I", f.read(4))
+            meta = json.loads(f.read(header_len))
+
+        grid = np.memmap(
+            path,
+            dtype=np.dtype(meta["dtype"]),
+            mode="r",
+            offset=meta["data_offset"],
+            shape=tuple(meta["shape"])
+        )
+        return cls(grid, meta)
+
+    def covers(self, route_coords: List[List[float]]) -> bool:
+        route = np.asarray(route_coords, dtype=np.float64).reshape(-1, 2)
+        return bool(
+            len(route) and
+            route[:, 0].min() >= self.south and
+            route[:, 0].max() <= self.south + self.rows * self.cell_lat and
+            route[:, 1].min() >= self.west and
+            route[:, 1].max() <= self.west + self.cols * self.cell_lng
+        )
+
+    def sample(self, lats: np.ndarray, lngs: np.ndarray, bucket: str, when: Optional[datetime] = None) -> np.ndarray:
+        """Bilinear lookup of the layer for a bucket (or, in hour-of-week rasters, a time)"""
+        layer = self.grid[self.layer_index(bucket, when)]
+
+        # Cell centres sit at half-cell offsets from the south-west corner
+        y = np.clip((lats - self.south) / self.cell_lat - 0.5, 0, self.rows - 1)
+        x = np.clip((lngs - self.west) / self.cell_lng - 0.5, 0, self.cols - 1)
+        y0 = np.minimum(y.astype(np.intp), self.rows - 2) if self.rows > 1 else np.zeros(len(y), np.intp)
+        x0 = np.minimum(x.astype(np.intp), self.cols - 2) if self.cols > 1 else np.zeros(len(x), np.intp)
+        y1 = np.minimum(y0 + 1, self.rows - 1)
+        x1 = np.minimum(x0 + 1, self.cols - 1)
+        fy = y - y0
+        fx = x - x0
+
+        top = layer[y0, x0].astype(np.float64) * (1 - fx) + layer[y0, x1] * fx
+        bottom = layer[y1, x0].astype(np.float64) * (1 - fx) + layer[y1, x1] * fx
+        return top * (1 - fy) + bottom * fy
+
+    def route_exposure(self, route_coords: List[List[float]], bucket: str, when: Optional[datetime] = None) -> float:
+        """Mean risk along the polyline, sampled roughly once per cell"""
+        lats, lngs = densify(route_coords, self.cell_m)
+        return float(self.sample(lats, lngs, bucket, when).mean())
+
+
+def densify(route_coords: List[List[float]], step_m: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Resample a polyline so consecutive points are at most step_m apart"""
+    route = np.asarray(route_coords, dtype=np.float64).reshape(-1, 2)
+    if len(route) < 2:
+        return route[:, 0], route[:, 1]
+
+    dlat = np.diff(route[:, 0]) * METERS_PER_DEGREE
+    dlng = np.diff(route[:, 1]) * METERS_PER_DEGREE * np.cos(np.radians(route[:-1, 0]))
+    steps = np.maximum(1, np.ceil(np.hypot(dlat, dlng) / step_m)).astype(np.intp)
+
+    # Fractional positions along each segment, excluding the segment end
+    segment = np.repeat(np.arange(len(steps)), steps)
+    offset = np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)
+    frac = offset / steps[segment]
+
+    lats = route[segment, 0] + (route[segment + 1, 0] - route[segment, 0]) * frac
+    lngs = route[segment, 1] + (route[segment + 1, 1] - route[segment, 1]) * frac
+    return np.append(lats, route[-1, 0]), np.append(lngs, route[-1, 1])
+
+
+def build_risk_raster(
+    crimes: Iterable[Dict],
+    bounds: Tuple[float, float, float, float],
+    crime_weights: Dict[str, float],
+    time_risk: Dict[str, float],
+    cell_m: float = 50.0,
+    radius_m: float = 200.0,
+    chunk_size: int = 20000,
+    slot_hours: int = 0,
+    half_life_days: Optional[float] = None,
+    now: Optional[datetime] = None,
+    local_tz: Optional[tzinfo] = None
+) -> Tuple[np.ndarray, Dict]:
+    """
+    Rasterize crimes into per-bucket risk layers.
+
+    Every crime adds severity x crime weight x time risk to each cell whose
+    centre lies within radius_m, in the layer of the bucket it was reported
+    in on the local_tz wall clock (or every layer when the hour is unknown).
+
+    With slot_hours set, layers are hour-of-week slots instead: a crime is
+    spread over its slot and the two neighbouring ones (SLOT_KERNEL),
+    weighted by 0.5 ** (age / half_life_days), and scaled by
+    slots / len(TIME_BUCKETS) so exposure stays on the scale of the
+    four-bucket layers. Each slot takes the time risk of the local bucket
+    its midpoint falls in during the build week.
+    """
+    now = now or datetime.utcnow()  # reported_at comes back from Mongo as naive UTC
+    local_tz = local_tz or local_timezone()
+    if slot_hours:
+        if HOURS_PER_WEEK % slot_hours:
+            raise ValueError("slot_hours must divide the 168 hours of a week")
+        layers = HOURS_PER_WEEK // slot_hours
+        layer_names = [f"how{slot}" for slot in range(layers)]
+        week_start = datetime(now.year, now.month, now.day) - timedelta(days=now.weekday())
+        layer_risk = np.array([
+            time_risk.get(hour_bucket(to_local(
+                week_start + timedelta(minutes=slot * slot_hours * 60 + slot_hours * 30), local_tz
+            ).hour), 0.5)
+            for slot in range(layers)
+        ], dtype=np.float32) * (layers / len(TIME_BUCKETS))
+    else:
+        layers = len(TIME_BUCKETS)
+        layer_names = TIME_BUCKETS
+        layer_risk = np.array([time_risk.get(bucket, 0.5) for bucket in TIME_BUCKETS], dtype=np.float32)
+
+    south, west, north, east = bounds
+    mid_lat = math.radians((south + north) / 2)
+    cell_lat = cell_m / METERS_PER_DEGREE
+    cell_lng = cell_lat / math.cos(mid_lat)
+
+    # Pad so crimes on the edge still spread their full radius
+    pad = int(math.ceil(radius_m / cell_m))
+    south -= pad * cell_lat
+    west -= pad * cell_lng
+    rows = int(math.ceil((north - south) / cell_lat)) + pad + 1
+    cols = int(math.ceil((east - west) / cell_lng)) + pad + 1
+    grid = np.zeros((layers, rows, cols), dtype=np.float32)
+    flat_grid = grid.reshape(-1)
+
+    # Disk of cell offsets within the radius
+    dy, dx = np.mgrid[-pad:pad + 1, -pad:pad + 1]
+    inside = (dy * dy + dx * dx) * cell_m * cell_m < radius_m * radius_m
+    kernel_dy, kernel_dx = dy[inside], dx[inside]
+
+    def layer_weights(reported_at) -> List[Tuple[int, float]]:
+        """(layer, share) pairs an incident contributes to"""
+        if reported_at is None:
+            return [(layer, 1.0) for layer in range(layers)]
+        if not slot_hours:
+            return [(TIME_BUCKETS.index(hour_bucket(to_local(reported_at, local_tz).hour)), 1.0)]
+
+        decay = 1.0
+        if half_life_days:
+            age_days = max(0.0, (now - reported_at).total_seconds() / 86400)
+            decay = 0.5 ** (age_days / half_life_days)
+        slot = week_slot(reported_at, slot_hours)
+        offset = len(SLOT_KERNEL) // 2
+        return [((slot + i - offset) % layers, share * decay) for i, share in enumerate(SLOT_KERNEL)]
+
+    def flush(batch):
+        index, layer, share = [], [], []
+        for i, crime in enumerate(batch):
+            for crime_layer, crime_share in layer_weights(crime.get("reported_at")):
+                index.append(i)
+                layer.append(crime_layer)
+                share.append(crime_share)
+        index, layer = np.array(index), np.array(layer)
+
+        lat = np.array([crime["lat"] for crime in batch])[index]
+        lng = np.array([crime["lng"] for crime in batch])[index]
+        weight = np.array([
+            crime.get("severity", 1) * crime_weights.get(crime.get("crime_type"), crime_weights["other"])
+            for crime in batch
+        ], dtype=np.float32)[index] * np.array(share, dtype=np.float32) * layer_risk[layer]
+
+        row = ((lat - south) / cell_lat).astype(np.intp)[:, None] + kernel_dy[None, :]
+        col = ((lng - west) / cell_lng).astype(np.intp)[:, None] + kernel_dx[None, :]
+        valid = (row >= 0) & (row < rows) & (col >= 0) & (col < cols)
+
+        cell = (layer[:, None] * rows + row) * cols + col
+        values = np.broadcast_to(weight[:, None], valid.shape)
+        np.add.at(flat_grid, cell[valid], values[valid])
+
+    batch = []
+    for crime in crimes:
+        if crime.get("lat") is None or crime.get("lng") is None:
+            continue
+        batch.append(crime)
+        if len(batch) >= chunk_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    meta = {
+        "buckets": layer_names,
+        "slot_hours": slot_hours,
+        "half_life_days": half_life_days,
+        "timezone": str(local_tz) if local_tz else to_local(now).tzname(),
+        "south": south,
+        "west": west,
+        "cell_lat": cell_lat,
+        "cell_lng": cell_lng,
+        "cell_m": cell_m,
+        "radius_m": radius_m,
+        "built_at": time.time()
+    }
+    return grid, meta
+
+
+def save_risk_raster(path: str, grid: np.ndarray, meta: Dict):
+    """Write header + raw grid to a temp file and atomically swap it into place"""
+    meta = dict(meta, dtype=grid.dtype.str, shape=list(grid.shape), data_offset=0)
+
+    # The header length depends on data_offset, so settle it in two passes
+    for _ in range(2):
+        header = json.dumps(meta).encode()
+        prefix = len(MAGIC) + 4 + len(header)
+        meta["data_offset"] = (prefix + HEADER_ALIGN - 1) // HEADER_ALIGN * HEADER_ALIGN
+    header = json.dumps(meta).encode()
+    prefix = len(MAGIC) + 4 + len(header)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(b"\0" * (meta["data_offset"] - prefix))
+        f.write(np.ascontiguousarray(grid).tobytes())
+    os.replace(tmp_path, path)
+
+
+def main(argv: Optional[List[str]] = None):
+    from app.database import get_sync_db
+    from app.utils.safety_scoring import scorer
+
+    parser = argparse.ArgumentParser(description="Rasterize crime_data into a risk grid")
+    parser.add_argument("--out", default=os.getenv("RISK_RASTER_PATH", "risk_raster.bin"))
+    parser.add_argument("--cell-m", type=float, default=50.0)
+    parser.add_argument("--slot-hours", type=int, default=3, help="hour-of-week slot size (0: four time-of-day buckets)")
+    parser.add_argument("--half-life-days", type=float, default=scorer.crime_half_life_days, help="recency decay half-life")
+    parser.add_argument("--tz", help="IANA timezone for time-of-day buckets (default: LOCAL_TIMEZONE or the server's)")
+    args = parser.parse_args(argv)
+
+    collection = get_sync_db().crime_data
+    extent = list(collection.aggregate([{"$group": {
+        "_id": None,
+        "south": {"$min": "$lat"},
+        "west": {"$min": "$lng"},
+        "north": {"$max": "$lat"},
+        "east": {"$max": "$lng"}
+    }}]))
+    if not extent:
+        print("crime_data is empty, nothing to rasterize")
+        return
+
+    started = time.time()
+    bounds = (extent[0]["south"], extent[0]["west"], extent[0]["north"], extent[0]["east"])
+    crimes = collection.find({}, {"lat": 1, "lng": 1, "severity": 1, "crime_type": 1, "reported_at": 1})
+    grid, meta = build_risk_raster(
+        crimes,
+        bounds,
+        scorer.crime_weights,
+        scorer.time_risk,
+        cell_m=args.cell_m,
+        radius_m=scorer.crime_radius_m,
+        slot_hours=args.slot_hours,
+        half_life_days=args.half_life_days if args.slot_hours else None,
+        local_tz=local_timezone(args.tz)
+    )
+    save_risk_raster(args.out, grid, meta)
+    print(f"Wrote {grid.shape} risk raster to {args.out} in {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import asyncio
+import math
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from pymongo.errors import PyMongoError
+from app.utils.crime_proximity import METERS_PER_DEGREE
+from app.utils.ttl_cache import TTLCache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Points per delete_many when evicting shared entries
+INVALIDATE_CHUNK = 200
+
+
+class RouteCache:
+    """
+    Two-tier cache of scored routes.
+
+    Keys snap source/destination to a grid (~110 m by default) and include
+    mode and time-of-day bucket. The first tier is an in-process LRU with
+    TTL; the optional second tier is a MongoDB TTL collection shared by all
+    workers. Entries remember their route's buffered bounding box so a
+    crime change only evicts the routes it can affect. Changes arriving
+    within invalidate_delay of each other (an ingest batch) are evicted in
+    one pass.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = int(os.getenv("ROUTE_CACHE_SIZE", "2048")),
+        ttl: float = float(os.getenv("ROUTE_CACHE_TTL", "600")),
+        snap_deg: float = float(os.getenv("ROUTE_CACHE_SNAP_DEG", "0.001")),
+        invalidate_delay: float = float(os.getenv("ROUTE_CACHE_INVALIDATE_DELAY", "0.5"))
+    ):
+        self.ttl = ttl
+        self.snap_deg = snap_deg
+        self.invalidate_delay = invalidate_delay
+        self.pending_points: List[Tuple[float, float]] = []
+        self.invalidate_task: Optional[asyncio.Task] = None
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.collection = None
+        self.stats = {
+            "local_hits": 0,
+            "shared_hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+            "hit_seconds": 0.0,
+            "miss_seconds": 0.0
+        }
+
+    async def start(self, collection):
+        """Enable the shared MongoDB tier when ROUTE_CACHE_BACKEND=mongo"""
+        if os.getenv("ROUTE_CACHE_BACKEND", "memory") != "mongo":
+            return
+        self.collection = collection
+
+    async def stop(self):
+        """Apply any queued invalidations before shutting down"""
+        if self.invalidate_task:
+            self.invalidate_task.cancel()
+            await asyncio.gather(self.invalidate_task, return_exceptions=True)
+            self.invalidate_task = None
+        await self.flush_invalidations()
+
+    def _snap(self, value: float) -> str:
+        return f"{round(value / self.snap_deg) * self.snap_deg:.6f}"
+
+    def make_key(self, src_lat, src_lng, dest_lat, dest_lng, mode: str, time_bucket: str) -> str:
+        return ":".join([
+            mode,
+            self._snap(src_lat), self._snap(src_lng),
+            self._snap(dest_lat), self._snap(dest_lng),
+            time_bucket
+        ])
+
+    async def get(self, key: str) -> Optional[Dict]:
+        entry = self.local.get(key)
+        if entry is not None:
+            self.stats["local_hits"] += 1
+            return entry["value"]
+
+        if self.collection is not None:
+            try:
+                doc = await self.collection.find_one({"_id": key})
+            except PyMongoError as e:
+                print(f"Route cache read failed: {e}")
+                doc = None
+            if doc is not None:
+                self.stats["shared_hits"] += 1
+                self.local.set(key, {"value": doc["value"], "bbox": doc["bbox"]})
+                return doc["value"]
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Dict, route_coords: List[List[float]], buffer_m: float):
+        bbox = self._bbox(route_coords, buffer_m)
+        self.local.set(key, {"value": value, "bbox": bbox})
+
+        if self.collection is not None:
+            try:
+                await self.collection.replace_one(
+                    {"_id": key},
+                    {"value": value, "bbox": bbox, **bbox, "created_at": datetime.utcnow()},
+                    upsert=True
+                )
+            except PyMongoError as e:
+                print(f"Route cache write failed: {e}")
+
+    def _bbox(self, route_coords: List[List[float]], buffer_m: float) -> Dict:
+        lats = [coord[0] for coord in route_coords]
+        lngs = [coord[1] for coord in route_coords]
+        lat_pad = buffer_m / METERS_PER_DEGREE
+        max_abs_lat = min(max(abs(lat) for lat in lats) + 1.0, 89.0)
+        lng_pad = lat_pad / math.cos(math.radians(max_abs_lat))
+        return {
+            "min_lat": min(lats) - lat_pad,
+            "max_lat": max(lats) + lat_pad,
+            "min_lng": min(lngs) - lng_pad,
+            "max_lng": max(lngs) + lng_pad
+        }
+
+    async def invalidate_point(self, lat: float, lng: float):
+        """Queue eviction of every cached route whose area contains the point"""
+        self.pending_points.append((lat, lng))
+        if self.invalidate_task is None:
+            self.invalidate_task = asyncio.create_task(self._invalidate_later())
+
+    async def _invalidate_later(self):
+        await asyncio.sleep(self.invalidate_delay)
+        # Points queued from here on start the next round
+        self.invalidate_task = None
+        await self.flush_invalidations()
+
+    async def flush_invalidations(self):
+        """Evict the routes around every queued point: one local scan and a few delete_many calls"""
+        points, self.pending_points = self.pending_points, []
+        if not points:
+            return
+
+        # Points sorted by latitude, so each entry only checks those in its latitude band
+        points = np.array(sorted(points))
+        lats, lngs = points[:, 0], points[:, 1]
+        for key, entry in self.local.items():
+            bbox = entry["bbox"]
+            lo = np.searchsorted(lats, bbox["min_lat"], side="left")
+            hi = np.searchsorted(lats, bbox["max_lat"], side="right")
+            band = lngs[lo:hi]
+            if ((band >= bbox["min_lng"]) & (band <= bbox["max_lng"])).any():
+                self.local.pop(key)
+                self.stats["invalidations"] += 1
+
+        if self.collection is None:
+            return
+        for start in range(0, len(points), INVALIDATE_CHUNK):
+            try:
+                result = await self.collection.delete_many({"$or": [
+                    {
+                        "min_lat": {"$lte": lat},
+                        "max_lat": {"$gte": lat},
+                        "min_lng": {"$lte": lng},
+                        "max_lng": {"$gte": lng}
+                    }
+                    for lat, lng in points[start:start + INVALIDATE_CHUNK].tolist()
+                ]})
+                self.stats["invalidations"] += result.deleted_count
+            except PyMongoError as e:
+                print(f"Route cache invalidation failed: {e}")
+
+    def record(self, hit: bool, seconds: float):
+        self.stats["hit_seconds" if hit else "miss_seconds"] += seconds
+
+    def metrics(self) -> Dict:
+        hits = self.stats["local_hits"] + self.stats["shared_hits"]
+        lookups = hits + self.stats["misses"]
+        avg_hit = self.stats["hit_seconds"] / hits if hits else None
+        avg_miss = self.stats["miss_seconds"] / self.stats["misses"] if self.stats["misses"] else None
+
+        return {
+            "backend": "mongo" if self.collection is not None else "memory",
+            "entries": len(self.local),
+            "local_hits": self.stats["local_hits"],
+            "shared_hits": self.stats["shared_hits"],
+            "misses": self.stats["misses"],
+            "invalidations": self.stats["invalidations"],
+            "pending_invalidations": len(self.pending_points),
+            "hit_ratio": hits / lookups if lookups else None,
+            "avg_hit_ms": avg_hit * 1000 if avg_hit is not None else None,
+            "avg_miss_ms": avg_miss * 1000 if avg_miss is not None else None,
+            "estimated_saved_seconds": (
+                (avg_miss - avg_hit) * hits if avg_hit is not None and avg_miss is not None else None
+            )
+        }
+
+
+route_cache = RouteCache()
@@ -1,8 +1,12 @@
 import numpy as np
-from geopy.distance import geodesic
 from datetime import datetime
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 import math
+from app.utils.crime_proximity import CrimeArrays, batch_crime_severity, route_crime_hits
+from app.utils.graph_router import haversine_m
+from app.utils.metrics import stage
+from app.utils.risk_raster import RiskRaster
+from app.utils.segment_table import SegmentTable
 
 class SafetyScorer:
     def __init__(self):
@@ -31,13 +35,68 @@ class SafetyScorer:
             "isolated": 0.2,
             "park": 0.4
         }
+        
+        # Crimes closer than this to the route count towards its density
+        self.crime_radius_m = 200
+        
+        # Incidents lose half their weight in the risk raster every this many days
+        self.crime_half_life_days = 180
+        
+        # Live journey alerts: distance off the planned route, and weighted
+        # crime severity within crime_radius_m of the current position
+        self.deviation_threshold_m = 100
+        self.risk_zone_threshold = 8.0
+        
+        # Precomputed risk grid, see app/utils/risk_raster.py
+        self.risk_raster = None
+        
+        # Precomputed per-cell road attributes, see app/utils/segment_table.py
+        self.segment_table = None
+    
+    def load_risk_raster(self, path: str):
+        """Memory-map a risk raster built by the risk_raster job"""
+        self.risk_raster = RiskRaster.load(path)
+        print(f"Loaded risk raster {path} with shape {self.risk_raster.grid.shape}")
+    
+    def load_segment_table(self, path: str):
+        """Load a segment table built by the segment_table job"""
+        self.segment_table = SegmentTable.load(path)
+        print(f"Loaded segment table {path} with {len(self.segment_table.keys)} cells")
+    
+    def _segment_attributes(self, route_coords, time_of_day) -> Optional[Dict[str, float]]:
+        if self.segment_table is None or not route_coords:
+            return None
+        return self.segment_table.route_attributes(route_coords, time_of_day)
+    
+    def time_key(self, time_of_day: str, when: Optional[datetime] = None) -> str:
+        """Cache key part for everything time-dependent in a score"""
+        if self.risk_raster is not None and self.risk_raster.temporal:
+            return f"{time_of_day}:{self.risk_raster.buckets[self.risk_raster.layer_index(time_of_day, when)]}"
+        return time_of_day
+    
+    def _precomputed_crime_score(self, route_coords, time_of_day, when, segments) -> Optional[float]:
+        """
+        Crime score from precomputed data covering the route: an hour-of-week
+        raster first (it knows the trip's time and how recent incidents are),
+        then the segment table (when its crime layers are fresh), then a
+        time-of-day raster
+        """
+        on_raster = self.risk_raster is not None and self.risk_raster.covers(route_coords)
+        if on_raster and self.risk_raster.temporal:
+            return self._raster_crime_score(route_coords, time_of_day, when)
+        if segments is not None and segments["crime"] is not None:
+            return self._exposure_score(segments["crime"])
+        if on_raster:
+            return self._raster_crime_score(route_coords, time_of_day, when)
+        return None
     
     def calculate_safety_score(
         self,
         route_coords: List[List[float]],
         crime_data: List[Dict],
         time_of_day: str = "day",
-        route_type: str = "walk"
+        route_type: str = "walk",
+        when: Optional[datetime] = None
     ) -> Tuple[int, List[str]]:
         """
         Calculate safety score for a route (0-100)
@@ -45,11 +104,66 @@ class SafetyScorer:
         if not route_coords:
             return 50, ["No route data available"]
         
+        # 1. Crime density analysis (raster or segment table lookups when they cover the route)
+        with stage("score.crime"):
+            segments = self._segment_attributes(route_coords, time_of_day)
+            crime_score = self._precomputed_crime_score(route_coords, time_of_day, when, segments)
+            if crime_score is None:
+                crime_score = self._analyze_crime_density(route_coords, crime_data)
+        
+        return self._compose_score(route_coords, crime_score, time_of_day, route_type, segments)
+    
+    def calculate_safety_scores(
+        self,
+        routes: List[List[List[float]]],
+        crime_data: List[Dict],
+        times_of_day: List[str],
+        route_types: List[str],
+        when: Optional[datetime] = None
+    ) -> List[Tuple[int, List[str]]]:
+        """
+        Score many routes against one crime set, with a single vectorized
+        proximity pass for every route no precomputed data covers
+        """
+        crimes = crime_data if isinstance(crime_data, CrimeArrays) else CrimeArrays.from_records(crime_data)
+        segments = [
+            self._segment_attributes(route_coords, time_of_day)
+            for route_coords, time_of_day in zip(routes, times_of_day)
+        ]
+        precomputed = [
+            self._precomputed_crime_score(route_coords, time_of_day, when, route_segments) if route_coords else None
+            for route_coords, time_of_day, route_segments in zip(routes, times_of_day, segments)
+        ]
+        with stage("score.crime_batch"):
+            severities = batch_crime_severity(
+                [route_coords if score is None else [] for route_coords, score in zip(routes, precomputed)],
+                crimes,
+                self.crime_radius_m
+            )
+        
+        results = []
+        for route_coords, route_segments, precomputed_score, severity, time_of_day, route_type in zip(
+            routes, segments, precomputed, severities, times_of_day, route_types
+        ):
+            if not route_coords:
+                results.append((50, ["No route data available"]))
+                continue
+            
+            if precomputed_score is not None:
+                crime_score = precomputed_score
+            elif not len(crimes):
+                crime_score = 85  # Default score if no crime data
+            else:
+                crime_score = self._density_score(severity, len(route_coords))
+            results.append(self._compose_score(route_coords, crime_score, time_of_day, route_type, route_segments))
+        
+        return results
+    
+    def _compose_score(self, route_coords, crime_score, time_of_day, route_type, segments=None) -> Tuple[int, List[str]]:
+        """Combine the crime score with time, isolation, lighting and mode factors"""
         warnings = []
         base_score = 100
         
-        # 1. Crime density analysis
-        crime_score = self._analyze_crime_density(route_coords, crime_data)
         if crime_score < 70:
             warnings.append("⚠ High crime density in this area")
         base_score = min(base_score, crime_score)
@@ -59,12 +173,17 @@ class SafetyScorer:
         time_adjusted_score = base_score * (1 - (time_factor * 0.3))
         
         # 3. Route isolation factor
-        isolation_factor = self._calculate_isolation(route_coords)
+        with stage("score.isolation"):
+            if segments is not None:
+                isolation_factor = 1 - segments["road_safety"]
+            else:
+                isolation_factor = self._calculate_isolation(route_coords)
         if isolation_factor > 0.7:
             warnings.append("⚠ Route passes through isolated areas")
         
         # 4. Lighting and crowd estimation (simulated)
-        lighting_score = self._estimate_lighting(route_coords, time_of_day)
+        with stage("score.lighting"):
+            lighting_score = self._estimate_lighting(route_coords, time_of_day, segments)
         if lighting_score < 40:
             warnings.append("⚠ Poor lighting conditions expected")
         
@@ -97,55 +216,58 @@ class SafetyScorer:
         if not crime_data:
             return 85  # Default score if no crime data
         
-        crime_count = 0
-        route_length = len(route_coords)
-        
-        for crime in crime_data:
-            crime_lat = crime.get("lat")
-            crime_lng = crime.get("lng")
-            
-            # Check proximity to route
-            for coord in route_coords:
-                distance = geodesic((crime_lat, crime_lng), (coord[0], coord[1])).meters
-                if distance < 200:  # Within 200 meters
-                    crime_count += crime.get("severity", 1)
-                    break
+        crimes = crime_data if isinstance(crime_data, CrimeArrays) else CrimeArrays.from_records(crime_data)
         
+        # Severity of every crime within the radius of any route segment
+        hits = route_crime_hits(route_coords, crimes, self.crime_radius_m)
+        crime_count = float(crimes.severity[hits].sum())
+        return self._density_score(crime_count, len(route_coords))
+    
+    def _density_score(self, crime_count, route_length) -> float:
         # Normalize crime density
         density = crime_count / max(route_length, 1)
         score = max(0, 100 - (density * 50))
         return score
     
+    def _raster_crime_score(self, route_coords, time_of_day, when=None) -> float:
+        """Crime score from the precomputed risk raster"""
+        return self._exposure_score(self.risk_raster.route_exposure(route_coords, time_of_day, when))
+    
+    def _exposure_score(self, exposure) -> float:
+        return max(0, 100 - (exposure * 50))
+    
     def _calculate_isolation(self, route_coords) -> float:
         """Calculate how isolated the route is"""
         if len(route_coords) < 2:
             return 0
         
         # Simple heuristic: longer distances between points might indicate isolation
-        total_distance = 0
-        for i in range(len(route_coords) - 1):
-            dist = geodesic(route_coords[i], route_coords[i + 1]).meters
-            total_distance += dist
-        
-        avg_distance = total_distance / (len(route_coords) - 1)
+        route = np.asarray(route_coords, dtype=np.float64)
+        avg_distance = float(haversine_m(route[:-1, 0], route[:-1, 1], route[1:, 0], route[1:, 1]).mean())
         
         # Normalize isolation factor (0-1)
         isolation = min(1.0, avg_distance / 1000)
         return isolation
     
-    def _estimate_lighting(self, route_coords, time_of_day) -> float:
-        """Estimate lighting conditions (simulated)"""
+    def _estimate_lighting(self, route_coords, time_of_day, segments=None) -> float:
+        """Estimate lighting conditions, from the segment table when it covers the route"""
         if time_of_day in ["day", "evening"]:
             return 80
         
-        # Night time
-        # Simulate based on coordinate patterns (this would use real data in production)
-        score = 60
-        
-        # Add randomness for simulation
-        import random
-        score += random.uniform(-20, 20)
+        # Night time: share of lit road along the route, or a flat estimate without data
+        if segments is not None:
+            score = 100 * segments["lighting"]
+        else:
+            score = 60
         
         return max(10, min(100, score))
 
-scorer = SafetyScorer()
\ No newline at end of file
+scorer = SafetyScorer()
+
+# Module-level entry points so a process pool can pickle them by reference
+
+def score_route(route_coords, crime_data, time_of_day="day", route_type="walk", when=None):
+    return scorer.calculate_safety_score(route_coords, crime_data, time_of_day, route_type, when)
+
+def score_routes(routes, crime_data, times_of_day, route_types, when=None):
+    return scorer.calculate_safety_scores(routes, crime_data, times_of_day, route_types, when)
@@ -0,0 +1,182 @@
+"""
+Precomputed road-segment attribute table.
+
+An offline job walks every edge of the routing graph and aggregates, per grid
+cell, the length of road in the cell, its length-weighted road-class safety,
+a lighting estimate and the crime exposure of each time-of-day bucket. Route
+scoring then reads these values at points sampled along the polyline, so
+identical routes always get identical scores and no per-request geodesic or
+proximity work is needed.
+
+Crime exposure is frozen when the graph is built. Tables from a graph built
+without crime, or whose crime is older than SEGMENT_CRIME_MAX_AGE_HOURS,
+report no crime value and routes fall back to live crime scoring.
+
+Build with:
+    python -m app.utils.segment_table --graph data/graph.npz --out data/segments.npz
+"""
+import argparse
+import math
+import os
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from app.utils.crime_proximity import METERS_PER_DEGREE
+from app.utils.risk_raster import TIME_BUCKETS, densify
+
+# Cell keys pack (row, col) into one int64 for sorted lookups
+KEY_SHIFT = 32
+
+# Share of route samples that must fall on known road cells to use the table
+MIN_COVERAGE = 0.8
+
+# Crime layers older than this are ignored (rebuild the graph and table regularly)
+CRIME_MAX_AGE_HOURS = float(os.getenv("SEGMENT_CRIME_MAX_AGE_HOURS", "48"))
+
+
+class SegmentTable:
+    """Sorted per-cell road attributes, looked up by binary search"""
+
+    def __init__(self, data: Dict[str, np.ndarray]):
+        self.keys = data["keys"]
+        self.length = data["length"]
+        self.road_safety = data["road_safety"]
+        self.lighting = data["lighting"]
+        self.crime = data["crime"]
+        self.buckets = [str(name) for name in data["buckets"]]
+        self.south, self.west, self.cell_lat, self.cell_lng, self.cell_m = (float(v) for v in data["grid"])
+        # When the crime layers were computed; 0 when the graph was built without crime
+        self.crime_built_at = float(data["crime_built_at"]) if "crime_built_at" in data else 0.0
+
+    @classmethod
+    def load(cls, path: str) -> "SegmentTable":
+        with np.load(path, allow_pickle=False) as data:
+            table = cls({name: data[name] for name in data.files})
+            # Tables from before the stamp: trust non-zero crime layers as of the file's age
+            if "crime_built_at" not in data.files and table.crime.any():
+                table.crime_built_at = os.path.getmtime(path)
+        return table
+
+    def crime_fresh(self) -> bool:
+        """Whether the crime layers exist and are recent enough to score with"""
+        return self.crime_built_at > 0 and time.time() - self.crime_built_at <= CRIME_MAX_AGE_HOURS * 3600
+
+    def cell_keys(self, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+        return cell_keys(lats, lngs, self.south, self.west, self.cell_lat, self.cell_lng)
+
+    def route_attributes(self, route_coords: List[List[float]], bucket: str) -> Optional[Dict[str, float]]:
+        """
+        Mean attributes of the cells a route passes through, sampled once per
+        cell, or None when too little of the route lies on the table's roads.
+        "crime" is None when the table has no fresh crime layers.
+        """
+        lats, lngs = densify(route_coords, self.cell_m)
+        if not len(lats):
+            return None
+
+        keys = self.cell_keys(lats, lngs)
+        index = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        found = self.keys[index] == keys
+        if found.mean() < MIN_COVERAGE:
+            return None
+
+        index = index[found]
+        layer = self.buckets.index(bucket) if bucket in self.buckets else 0
+        return {
+            "road_safety": float(self.road_safety[index].mean()),
+            "lighting": float(self.lighting[index].mean()),
+            "crime": float(self.crime[layer, index].mean()) if self.crime_fresh() else None,
+            "coverage": float(found.mean())
+        }
+
+
+def cell_keys(lats, lngs, south: float, west: float, cell_lat: float, cell_lng: float) -> np.ndarray:
+    rows = np.floor((np.asarray(lats) - south) / cell_lat).astype(np.int64)
+    cols = np.floor((np.asarray(lngs) - west) / cell_lng).astype(np.int64)
+    return (rows << KEY_SHIFT) + cols
+
+
+def build_segment_table(graph_path: str, road_safety: Dict[str, float], cell_m: float = 50.0) -> Dict[str, np.ndarray]:
+    """
+    Aggregate routing-graph edges into per-cell attributes.
+
+    Each undirected edge is sampled every cell_m and its length split evenly
+    across the samples. Lighting is 1 for lit roads, 0 for unlit ones and the
+    road-class safety when OSM does not say, as in the graph router.
+    """
+    graph = np.load(graph_path, allow_pickle=False)
+    node_lat, node_lng = graph["node_lat"], graph["node_lng"]
+    indptr, dst = graph["indptr"], graph["indices"].astype(np.int64)
+    src = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    class_names = [str(name) for name in graph["class_names"]]
+
+    # Two-way roads are stored as two directed edges; keep one of each pair
+    pair = np.minimum(src, dst) * len(node_lat) + np.maximum(src, dst)
+    _, first = np.unique(pair, return_index=True)
+    src, dst = src[first], dst[first]
+    length = graph["length"][first].astype(np.float64)
+    class_safety = np.array([road_safety.get(name, 0.5) for name in class_names])[graph["road_class"][first]]
+    lit = graph["lit"][first]
+    lighting = np.where(lit == 1, 1.0, np.where(lit == 0, 0.0, class_safety))
+    crime = graph["crime"][:, first].astype(np.float64)
+    if "crime_built_at" in graph.files:
+        crime_built_at = float(graph["crime_built_at"])
+    else:
+        # Graphs from before the stamp: non-zero crime layers date from the file
+        crime_built_at = os.path.getmtime(graph_path) if crime.any() else 0.0
+
+    # Sample points along every edge, excluding its end node
+    steps = np.maximum(1, np.ceil(length / cell_m)).astype(np.intp)
+    edge = np.repeat(np.arange(len(steps)), steps)
+    frac = (np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)) / steps[edge]
+    lats = node_lat[src[edge]] + (node_lat[dst[edge]] - node_lat[src[edge]]) * frac
+    lngs = node_lng[src[edge]] + (node_lng[dst[edge]] - node_lng[src[edge]]) * frac
+    weight = length[edge] / steps[edge]
+
+    south, west = float(node_lat.min()), float(node_lng.min())
+    cell_lat = cell_m / METERS_PER_DEGREE
+    cell_lng = cell_lat / math.cos(math.radians((south + float(node_lat.max())) / 2))
+    keys, cell = np.unique(cell_keys(lats, lngs, south, west, cell_lat, cell_lng), return_inverse=True)
+
+    # Length-weighted means per cell
+    cell_length = np.bincount(cell, weights=weight, minlength=len(keys))
+
+    def mean(values):
+        return (np.bincount(cell, weights=values[edge] * weight, minlength=len(keys)) / cell_length).astype(np.float32)
+
+    return {
+        "keys": keys,
+        "length": cell_length.astype(np.float32),
+        "road_safety": mean(class_safety),
+        "lighting": mean(lighting),
+        "crime": np.stack([mean(layer) for layer in crime]) if len(crime) else np.zeros((0, len(keys)), np.float32),
+        "buckets": np.array(TIME_BUCKETS),
+        "grid": np.array([south, west, cell_lat, cell_lng, cell_m]),
+        "crime_built_at": np.float64(crime_built_at)
+    }
+
+
+def save_segment_table(path: str, table: Dict[str, np.ndarray]):
+    """Write the table to a temp file and atomically swap it into place"""
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, **table)
+    os.replace(tmp_path, path)
+
+
+def main(argv: Optional[List[str]] = None):
+    from app.utils.safety_scoring import scorer
+
+    parser = argparse.ArgumentParser(description="Build the per-cell road segment attribute table")
+    parser.add_argument("--graph", default=os.getenv("ROUTING_GRAPH_PATH", "graph.npz"))
+    parser.add_argument("--out", default=os.getenv("SEGMENT_TABLE_PATH", "segments.npz"))
+    parser.add_argument("--cell-m", type=float, default=50.0)
+    args = parser.parse_args(argv)
+
+    started = time.time()
+    table = build_segment_table(args.graph, scorer.road_safety, cell_m=args.cell_m)
+    save_segment_table(args.out, table)
+    print(f"Wrote {len(table['keys'])} segment cells to {args.out} in {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import asyncio
+import os
+import smtplib
+import time
+from email.message import Message
+from typing import List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class SMTPPool:
+    """
+    Async sender over a small pool of kept-alive, authenticated SMTP connections.
+
+    Each pool worker owns one connection and drains whatever messages are
+    queued into a single batch, so an alert to many contacts costs one TLS
+    handshake and login per connection rather than per email. smtplib calls
+    run in threads; idle connections are NOOP-checked before reuse and
+    reopened when the server has dropped them.
+    """
+
+    def __init__(
+        self,
+        size: int = int(os.getenv("SMTP_POOL_SIZE", "2")),
+        batch_size: int = 20,
+        idle_timeout: float = 240.0,
+        health_check_after: float = 15.0
+    ):
+        self.size = size
+        self.batch_size = batch_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers: List[asyncio.Task] = []
+        self.stats = {"sent": 0, "failed": 0, "connects": 0, "batches": 0}
+
+    def _connect(self) -> smtplib.SMTP:
+        host = os.getenv("SMTP_HOST", "smtp.gmail.com")
+        port = int(os.getenv("SMTP_PORT", "465"))
+        sender_email = os.getenv("SMTP_EMAIL")
+        sender_password = os.getenv("SMTP_PASSWORD")
+
+        # SMTP_SSL=false allows a plain local debug server
+        if os.getenv("SMTP_SSL", "true").lower() == "true":
+            server = smtplib.SMTP_SSL(host, port, timeout=10)
+        else:
+            server = smtplib.SMTP(host, port, timeout=10)
+        if sender_password:
+            server.login(sender_email, sender_password)
+
+        self.stats["connects"] += 1
+        return server
+
+    def _is_alive(self, server: smtplib.SMTP) -> bool:
+        try:
+            return server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _close(self, server: Optional[smtplib.SMTP]):
+        if server is None:
+            return
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    def _send_batch(
+        self,
+        server: Optional[smtplib.SMTP],
+        last_used: float,
+        batch: List[Message]
+    ) -> Tuple[Optional[smtplib.SMTP], List[Optional[Exception]]]:
+        """Send a batch on one connection (runs in a thread), reconnecting as needed"""
+        idle = time.monotonic() - last_used
+        if server is not None and (idle > self.idle_timeout or (idle > self.health_check_after and not self._is_alive(server))):
+            self._close(server)
+            server = None
+
+        results = []
+        for msg in batch:
+            error = None
+            for attempt in range(2):
+                try:
+                    if server is None:
+                        server = self._connect()
+                    server.send_message(msg)
+                    error = None
+                    break
+                except (smtplib.SMTPServerDisconnected, OSError) as e:
+                    # Connection-level failure: reopen once and retry this message
+                    self._close(server)
+                    server, error = None, e
+                except smtplib.SMTPException as e:
+                    error = e
+                    break
+            results.append(error)
+        return server, results
+
+    async def _worker(self):
+        server, last_used = None, time.monotonic()
+        try:
+            while True:
+                items = [await self.queue.get()]
+                while len(items) < self.batch_size and not self.queue.empty():
+                    items.append(self.queue.get_nowait())
+
+                batch = [msg for msg, _ in items]
+                try:
+                    server, results = await asyncio.to_thread(self._send_batch, server, last_used, batch)
+                except Exception as e:
+                    server, results = None, [e] * len(items)
+                last_used = time.monotonic()
+                self.stats["batches"] += 1
+
+                for (_, future), error in zip(items, results):
+                    if future.done():
+                        continue
+                    if error is None:
+                        self.stats["sent"] += 1
+                        future.set_result(True)
+                    else:
+                        self.stats["failed"] += 1
+                        future.set_exception(error)
+        finally:
+            await asyncio.to_thread(self._close, server)
+
+    def _start(self):
+        if not self.workers:
+            self.queue = asyncio.Queue()
+            self.workers = [asyncio.create_task(self._worker()) for _ in range(self.size)]
+
+    async def send(self, msg: Message) -> bool:
+        """Queue a message on the pool and wait until it has been accepted by the server"""
+        self._start()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((msg, future))
+        return await future
+
+    async def close(self):
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+
+smtp_pool = SMTPPool()
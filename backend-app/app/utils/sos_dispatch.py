@@ -0,0 +1,203 @@
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Max notifications in flight per channel (email connections are bounded by the SMTP pool)
+DEFAULT_CHANNEL_LIMITS = {
+    "sms": 8,
+    "email": 16,
+    "authority": 2
+}
+
+
+class SOSDispatcher:
+    """
+    Durable fan-out of SOS notifications through a MongoDB outbox.
+
+    trigger_sos persists one outbox job per (contact, channel) and returns;
+    worker tasks claim due jobs, send them under per-channel concurrency
+    limits, retry failures with exponential backoff and record the delivery
+    status of every job on its sos_alerts document. Jobs left "sending" by
+    a crashed worker are reclaimed once their lease expires; every claim
+    takes a new lease_id, so a worker that outlived its lease cannot
+    overwrite the status written by the one that reclaimed the job.
+    """
+
+    def __init__(
+        self,
+        workers: int = int(os.getenv("SOS_WORKERS", "8")),
+        max_attempts: int = int(os.getenv("SOS_MAX_ATTEMPTS", "5")),
+        base_delay: float = 2.0,
+        lease_seconds: float = 60.0,
+        poll_interval: float = 5.0,
+        channel_limits: Optional[Dict[str, int]] = None
+    ):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.limits = {
+            channel: asyncio.Semaphore(limit)
+            for channel, limit in (channel_limits or DEFAULT_CHANNEL_LIMITS).items()
+        }
+        self.senders: Dict[str, Callable[[Dict], Awaitable[bool]]] = {}
+        self.outbox = None
+        self.alerts = None
+        self.tasks: List[asyncio.Task] = []
+        self.wake = None
+        self.running = False
+
+    def register(self, channel: str, sender: Callable[[Dict], Awaitable[bool]]):
+        """Register the coroutine that delivers jobs of a channel, returning success"""
+        self.senders[channel] = sender
+        self.limits.setdefault(channel, asyncio.Semaphore(1))
+
+    async def start(self, database):
+        self.outbox = database.sos_outbox
+        self.alerts = database.sos_alerts
+        self.wake = asyncio.Event()
+        self.running = True
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        # On Python 3.11 wait_for swallows a cancel that races with the wake-up,
+        # so idle workers are also told to leave their loop
+        self.running = False
+        if self.wake is not None:
+            self.wake.set()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def enqueue(self, alert_id, jobs: List[Dict]):
+        """Persist notification jobs for an alert and wake the workers"""
+        if not jobs:
+            return
+
+        now = datetime.utcnow()
+        docs = [
+            dict(
+                job,
+                alert_id=alert_id,
+                status="pending",
+                attempts=0,
+                next_attempt_at=now,
+                created_at=now
+            )
+            for job in jobs
+        ]
+        result = await self.outbox.insert_many(docs)
+
+        await self.alerts.update_one(
+            {"_id": alert_id},
+            {"$set": {
+                f"deliveries.{job_id}": self._delivery(doc, "pending")
+                for job_id, doc in zip(result.inserted_ids, docs)
+            }}
+        )
+        self.wake.set()
+
+    def _delivery(self, job: Dict, status: str, error: Optional[str] = None) -> Dict:
+        return {
+            "channel": job["channel"],
+            "recipient": job["recipient"],
+            "contact_name": job.get("contact_name"),
+            "status": status,
+            "attempts": job.get("attempts", 0),
+            "error": error,
+            "updated_at": datetime.utcnow()
+        }
+
+    async def _claim(self) -> Optional[Dict]:
+        now = datetime.utcnow()
+        return await self.outbox.find_one_and_update(
+            {"$or": [
+                {"status": "pending", "next_attempt_at": {"$lte": now}},
+                {"status": "sending", "locked_at": {"$lte": now - timedelta(seconds=self.lease_seconds)}}
+            ]},
+            {"$set": {"status": "sending", "locked_at": now, "lease_id": ObjectId()}, "$inc": {"attempts": 1}},
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _idle_timeout(self) -> float:
+        """Seconds until the earliest scheduled retry, capped at poll_interval"""
+        try:
+            job = await self.outbox.find_one(
+                {"status": "pending"},
+                {"next_attempt_at": 1},
+                sort=[("next_attempt_at", 1)]
+            )
+        except PyMongoError:
+            return self.poll_interval
+        if job is None:
+            return self.poll_interval
+        due_in = (job["next_attempt_at"] - datetime.utcnow()).total_seconds()
+        return min(self.poll_interval, max(0.0, due_in))
+
+    async def _worker(self):
+        while self.running:
+            # Cleared before claiming, so a job enqueued while the claim is in flight still wakes us
+            self.wake.clear()
+            try:
+                job = await self._claim()
+            except PyMongoError as e:
+                print(f"SOS outbox claim failed: {e}")
+                job = None
+
+            if job is None:
+                # Sleep until new work is enqueued or the next retry is due
+                try:
+                    await asyncio.wait_for(self.wake.wait(), timeout=await self._idle_timeout())
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._process(job)
+
+    async def _process(self, job: Dict):
+        sender = self.senders.get(job["channel"])
+        error = None
+        try:
+            if sender is None:
+                raise ValueError(f"No sender registered for channel {job['channel']}")
+            async with self.limits[job["channel"]]:
+                delivered = await sender(job)
+        except Exception as e:
+            delivered, error = False, str(e)
+
+        update = {"locked_at": None, "last_error": error}
+        if delivered:
+            status = "delivered"
+        elif job["attempts"] >= self.max_attempts:
+            status = "failed"
+        else:
+            status = "pending"
+            delay = self.base_delay * 2 ** (job["attempts"] - 1) * random.uniform(0.8, 1.2)
+            update["next_attempt_at"] = datetime.utcnow() + timedelta(seconds=delay)
+        update["status"] = status
+
+        try:
+            result = await self.outbox.update_one({"_id": job["_id"], "lease_id": job["lease_id"]}, {"$set": update})
+            if not result.matched_count:
+                print(f"SOS job {job['_id']} was reclaimed after its lease expired, dropping stale status {status}")
+                return
+            await self.alerts.update_one(
+                {"_id": job["alert_id"]},
+                {"$set": {f"deliveries.{job['_id']}": self._delivery(job, status, error)}}
+            )
+        except PyMongoError as e:
+            print(f"SOS outbox update failed: {e}")
+
+
+sos_dispatcher = SOSDispatcher()
@@ -0,0 +1,136 @@
+"""
+Route payload benchmark.
+
+Builds /routes/calculate-shaped responses (main route plus two
+alternatives) for winding synthetic walks and reports, for each geometry
+option, the JSON payload size, its gzip size and the time to shape and
+serialize a response:
+
+    python -m benchmarks.bench_geometry
+    python -m benchmarks.bench_geometry --compare      # exits 1 on regression
+"""
+import argparse
+import gzip
+import json
+import math
+import random
+import sys
+from typing import Dict, List
+import numpy as np
+from app.utils.geometry import decode_polyline, shape_geometry
+from benchmarks.bench_scoring import CENTER, time_case
+from benchmarks.report import compare_baseline, print_table, save_baseline
+
+OPTIONS = {
+    "coordinates": ("coordinates", None),
+    "coordinates+simplify2m": ("coordinates", 2.0),
+    "polyline": ("polyline", None),
+    "polyline+simplify2m": ("polyline", 2.0),
+    "polyline+simplify5m": ("polyline", 5.0)
+}
+
+
+def winding_route(points: int, rng: random.Random) -> List[List[float]]:
+    """Walk of ~10 m steps with drifting heading and GPS-scale jitter, like an OSRM walking geometry"""
+    lat, lng = CENTER[0] + rng.uniform(-0.05, 0.05), CENTER[1] + rng.uniform(-0.05, 0.05)
+    heading = rng.uniform(0, 2 * math.pi)
+    route = []
+    for _ in range(points):
+        route.append([lat + rng.gauss(0, 2e-6), lng + rng.gauss(0, 2e-6)])
+        # Mostly straight streets with the odd turn
+        heading += rng.gauss(0, 0.05) + (rng.choice([-1, 1]) * math.pi / 2 if rng.random() < 0.01 else 0)
+        lat += 10 * math.cos(heading) / 111320
+        lng += 10 * math.sin(heading) / (111320 * math.cos(math.radians(lat)))
+    return route
+
+
+def response(result: Dict, geometry: str, simplify_m) -> str:
+    """What routes._route_response + the JSON encoder produce for one result"""
+    body = {
+        "route_id": "route_0",
+        "safety_score": result["safety_score"],
+        "distance": result["distance"],
+        "duration": result["duration"],
+        **shape_geometry(result["coordinates"], geometry, simplify_m),
+        "warnings": result["warnings"],
+        "alternatives": [
+            {**{key: value for key, value in alt.items() if key != "coordinates"},
+             **shape_geometry(alt["coordinates"], geometry, simplify_m)}
+            for alt in result["alternatives"]
+        ]
+    }
+    return json.dumps(body)
+
+
+def max_error_m(original: List[List[float]], encoded: str) -> float:
+    """Largest distance from an original vertex to the decoded line"""
+    scale = np.array([111320.0, 111320.0 * math.cos(math.radians(CENTER[0]))])
+    points = np.asarray(original) * scale
+    line = np.asarray(decode_polyline(encoded)) * scale
+    if len(line) == 1:
+        return float(np.hypot(*(points - line[0]).T).max())
+    start, direction = line[:-1], np.diff(line, axis=0)
+    offset = points[:, None, :] - start[None, :, :]
+    t = np.clip((offset * direction).sum(-1) / np.maximum((direction ** 2).sum(-1), 1e-12), 0, 1)
+    distance = np.hypot(*(offset - t[..., None] * direction).transpose(2, 0, 1))
+    return float(distance.min(axis=1).max())
+
+
+def run(sizes: List[int], min_seconds: float, min_calls: int) -> Dict[str, Dict]:
+    rng = random.Random(11)
+    results = {}
+    for size in sizes:
+        routes = [winding_route(size, rng) for _ in range(3)]
+        result = {
+            "safety_score": 72,
+            "distance": size * 10.0,
+            "duration": size * 10.0 / 1.4,
+            "coordinates": routes[0],
+            "warnings": ["Moderate crime activity reported nearby"],
+            "alternatives": [
+                {"safety_score": 80, "distance": size * 11.0, "duration": size * 11.0 / 1.4,
+                 "coordinates": route, "description": "Safer route"}
+                for route in routes[1:]
+            ]
+        }
+        for name, (geometry, simplify_m) in OPTIONS.items():
+            payload = response(result, geometry, simplify_m).encode()
+            summary = time_case(lambda _: response(result, geometry, simplify_m), [None], min_seconds, min_calls)
+            summary["bytes"] = len(payload)
+            summary["gzip_bytes"] = len(gzip.compress(payload, 6))
+            if geometry == "polyline" and size <= 2000:
+                summary["max_error_m"] = max_error_m(routes[0], json.loads(payload)["polyline"])
+            results[f"{name}/{size}"] = summary
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark route response payloads")
+    parser.add_argument("--sizes", default="500,2000,8000", help="comma-separated vertices per route")
+    parser.add_argument("--min-seconds", type=float, default=0.3, help="minimum time per case")
+    parser.add_argument("--min-calls", type=int, default=20, help="minimum calls per case")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="compare with the stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    results = run([int(size) for size in args.sizes.split(",")], args.min_seconds, args.min_calls)
+    print_table(results)
+
+    width = max(len(name) for name in results)
+    print(f"\n{'':<{width}}  {'bytes':>10}  {'gzip_bytes':>10}  {'max_error_m':>11}")
+    for name, result in results.items():
+        error = result.get("max_error_m")
+        print(f"{name:<{width}}  {result['bytes']:>10}  {result['gzip_bytes']:>10}  {'-' if error is None else f'{error:.2f}':>11}")
+
+    if args.save_baseline:
+        save_baseline("geometry", results)
+    if args.compare:
+        regressions = compare_baseline("geometry", results, args.tolerance, metrics=("p50_ms", "p95_ms", "bytes"))
+        if regressions:
+            print(f"{len(regressions)} regressions")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
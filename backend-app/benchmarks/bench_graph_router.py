@@ -0,0 +1,103 @@
+"""
+Graph router benchmark.
+
+Builds a synthetic street grid in the routing-graph format (see
+bench_segment_table) and times GraphRouter.route, which returns the
+fastest / balanced / safest paths, for short, medium and long walks. The
+query target is 50 ms; the table shows how far off it each trip length is.
+
+    python -m benchmarks.bench_graph_router
+    python -m benchmarks.bench_graph_router --blocks 500 --queries 50
+    python -m benchmarks.bench_graph_router --compare      # exits 1 on regression
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List
+from app.utils.graph_router import GraphRouter
+from app.utils.safety_scoring import scorer
+from benchmarks.bench_segment_table import BLOCK_DEG, CENTER, write_grid_graph
+from benchmarks.report import compare_baseline, print_table, save_baseline, summarize
+
+TARGET_MS = 50.0
+
+# Trip length in blocks (about 110 m each) per case
+TRIP_BLOCKS = {
+    "short": (3, 8),
+    "medium": (10, 25),
+    "long": (30, 60),
+    "cross_city": (150, 300)
+}
+
+
+def trips(blocks: int, count: int, low: int, high: int) -> List[tuple]:
+    rng = random.Random(7)
+    result = []
+    for _ in range(count):
+        r, c = rng.randrange(blocks), rng.randrange(blocks)
+        span = rng.randint(low, high)
+        dr = rng.randint(0, span)
+        r2 = min(max(r + rng.choice([-1, 1]) * dr, 0), blocks - 1)
+        c2 = min(max(c + rng.choice([-1, 1]) * (span - dr), 0), blocks - 1)
+        result.append((CENTER[0] + r * BLOCK_DEG, CENTER[1] + c * BLOCK_DEG,
+                       CENTER[0] + r2 * BLOCK_DEG, CENTER[1] + c2 * BLOCK_DEG))
+    return result
+
+
+def run(blocks: int, queries: int) -> Dict[str, Dict]:
+    router = GraphRouter()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "graph.npz")
+        write_grid_graph(path, blocks)
+        started = time.perf_counter()
+        router.load(path, scorer.road_safety, scorer.time_risk)
+        load_s = time.perf_counter() - started
+
+    results = {}
+    for case, (low, high) in TRIP_BLOCKS.items():
+        requests = trips(blocks, queries, low, high)
+        # Warm the per-bucket cost arrays outside the timed loop
+        router.route(*requests[0], "night", "walk")
+        latencies = []
+        started = time.perf_counter()
+        for trip in requests:
+            begun = time.perf_counter()
+            router.route(*trip, "night", "walk")
+            latencies.append((time.perf_counter() - begun) * 1000)
+        results[f"route/{case}"] = summarize(latencies, time.perf_counter() - started)
+
+    cost_mb = sum(len(exposure) * exposure.itemsize for exposure, _ in router.exposure.values()) / 1e6
+    print(f"{len(router.node_lat)} nodes, {len(router.indices)} edges, loaded in {load_s:.2f} s, "
+          f"cost arrays {cost_mb:.1f} MB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark safety-aware graph routing")
+    parser.add_argument("--blocks", type=int, default=300, help="grid size in blocks per side")
+    parser.add_argument("--queries", type=int, default=30, help="queries per trip length")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="compare with the stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    results = run(args.blocks, args.queries)
+    print_table(results)
+    for name, result in results.items():
+        verdict = "meets" if result["p50_ms"] <= TARGET_MS else "misses"
+        print(f"{name}: p50 {result['p50_ms']:.1f} ms {verdict} the {TARGET_MS:.0f} ms target")
+
+    if args.save_baseline:
+        save_baseline("graph_router", results)
+    if args.compare:
+        regressions = compare_baseline("graph_router", results, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Hotspot aggregation benchmark.
+
+Seeds a throwaway database with synthetic incidents around Delhi, applies the
+index registry and times query_hotspots for viewports at several zoom levels.
+
+    python -m benchmarks.bench_hotspots --incidents 1000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.utils.db_indexes import crime_location, ensure_indexes
+from app.utils.hotspots import query_hotspots
+from benchmarks.report import compare_baseline, print_table, save_baseline, summarize
+
+CENTER = (28.6139, 77.2090)
+
+# (zoom, half-height of the viewport in degrees)
+VIEWPORTS = [(10, 0.35), (12, 0.09), (14, 0.025), (16, 0.006)]
+
+
+async def seed(collection, incidents: int, batch: int = 10000):
+    await collection.drop()
+    random.seed(42)
+    now = datetime.utcnow()
+    types = ["theft", "harassment", "assault", "robbery", "other"]
+    for offset in range(0, incidents, batch):
+        docs = []
+        for _ in range(min(batch, incidents - offset)):
+            lat = random.gauss(CENTER[0], 0.15)
+            lng = random.gauss(CENTER[1], 0.15)
+            docs.append({
+                "lat": lat,
+                "lng": lng,
+                "location": crime_location(lat, lng),
+                "crime_type": random.choice(types),
+                "severity": random.randint(1, 5),
+                "reported_at": now - timedelta(minutes=random.randint(0, 525600))
+            })
+        await collection.insert_many(docs, ordered=False)
+
+
+async def run(incidents: int, repeats: int, keep: bool) -> dict:
+    client = AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    database = client[os.getenv("BENCH_DB", "shakti_bench")]
+    try:
+        if keep and await database.crime_data.estimated_document_count() == incidents:
+            print(f"Reusing {incidents} seeded incidents")
+        else:
+            started = time.perf_counter()
+            await seed(database.crime_data, incidents)
+            print(f"Seeded {incidents} incidents in {time.perf_counter() - started:.1f}s")
+        await ensure_indexes(database)
+
+        results = {}
+        for zoom, half in VIEWPORTS:
+            bbox = (CENTER[0] - half, CENTER[1] - half * 1.6, CENTER[0] + half, CENTER[1] + half * 1.6)
+            timings = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                result = await query_hotspots(database.crime_data, *bbox, zoom=zoom)
+                pages, cursor = 1, result["next_cursor"]
+                while cursor:
+                    page = await query_hotspots(database.crime_data, *bbox, zoom=zoom, cursor=cursor)
+                    pages, cursor = pages + 1, page["next_cursor"]
+                timings.append((time.perf_counter() - started) * 1000)
+            print(f"zoom {zoom}: {result['total_incidents']} incidents in {result['total_cells']} cells, {pages} pages")
+            results[f"zoom_{zoom}"] = summarize(timings)
+        return results
+    finally:
+        if not keep:
+            await database.crime_data.drop()
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hotspot aggregation")
+    parser.add_argument("--incidents", type=int, default=1_000_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="keep (and reuse) the seeded collection")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="compare with the stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.incidents, args.repeats, args.keep))
+    print_table(results)
+    if args.save_baseline:
+        save_baseline("hotspots", results)
+    if args.compare:
+        regressions = compare_baseline("hotspots", results, args.tolerance, metrics=("p50_ms", "p95_ms"))
+        if regressions:
+            print(f"{len(regressions)} regressions")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
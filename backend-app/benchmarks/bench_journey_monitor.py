@@ -0,0 +1,73 @@
+"""
+Journey monitor micro-benchmark.
+
+Times JourneyMonitor.update per position along a long synthetic route with a
+dense crime index, including positions that wander off the route.
+
+    python -m benchmarks.bench_journey_monitor --vertices 2000 --crimes 100000
+"""
+import argparse
+import math
+import random
+import time
+from app.utils.crime_index import CrimeIndex
+from app.utils.journey_monitor import JourneyMonitor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-position journey monitoring")
+    parser.add_argument("--vertices", type=int, default=2000)
+    parser.add_argument("--crimes", type=int, default=100000)
+    parser.add_argument("--positions", type=int, default=50000)
+    args = parser.parse_args()
+
+    random.seed(7)
+    lat, lng = 28.55, 77.10
+    route = []
+    for i in range(args.vertices):
+        lat += 0.0002 + random.uniform(-0.0001, 0.0001)
+        lng += 0.0002 * math.sin(i / 50) + random.uniform(-0.0001, 0.0001)
+        route.append([lat, lng])
+
+    index = CrimeIndex()
+    for i in range(args.crimes):
+        index.upsert({
+            "_id": i,
+            "lat": random.uniform(28.5, 29.0),
+            "lng": random.uniform(77.0, 77.5),
+            "crime_type": random.choice(["theft", "harassment", "assault", "robbery", "other"]),
+            "severity": random.randint(1, 5)
+        })
+
+    started = time.perf_counter()
+    monitor = JourneyMonitor(route, route[0], index=index)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    # Walk the route with GPS noise, leaving it for a stretch in the middle
+    positions = []
+    for i in range(args.positions):
+        vertex = route[i * len(route) // args.positions]
+        offset = 0.003 if args.positions // 3 < i < args.positions // 2 else 0.0
+        positions.append((vertex[0] + random.gauss(0, 0.00005) + offset, vertex[1] + random.gauss(0, 0.00005)))
+
+    # First pass loads crime tiles along the way; the second is the steady state
+    for timed in (False, True):
+        monitor = JourneyMonitor(route, route[0], index=index)
+        events = 0
+        started = time.perf_counter()
+        for position in positions:
+            events += len(monitor.update(*position))
+        elapsed = time.perf_counter() - started
+        if timed:
+            print(f"index build: {build_ms:.1f} ms for {len(monitor.route.segments)} segments")
+            print(f"update: {elapsed / len(positions) * 1e6:.1f} us per position ({events} alerts)")
+            tiles_monitor = monitor
+
+    started = time.perf_counter()
+    for position in positions[:1000]:
+        tiles_monitor.crimes.exposure(*tiles_monitor.projection.project(*position))
+    print(f"crime exposure alone (tiles loaded): {(time.perf_counter() - started) * 1000:.1f} us per position")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+OSRM client benchmark.
+
+Sends bursts of route requests to benchmarks.stub_osrm (on its own thread
+and loop) and compares a new aiohttp session per request, which is how
+routes were fetched before OSRMClient, with the pooled keep-alive client.
+Every case runs at several concurrencies; the "repeat" cases draw from a
+small pool of trips so identical requests overlap and are coalesced:
+
+    python -m benchmarks.bench_osrm
+    python -m benchmarks.bench_osrm --concurrency 1,16,64 --delay-ms 50
+    python -m benchmarks.bench_osrm --compare      # exits 1 on regression
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from typing import Dict, List
+import aiohttp
+from app.utils.map_utils import OSRMClient
+from benchmarks.bench_scoring import CENTER
+from benchmarks.report import compare_baseline, print_table, save_baseline, summarize
+from benchmarks.stub_osrm import StubOSRMThread
+
+
+def trips(count: int, distinct: int) -> List[tuple]:
+    rng = random.Random(7)
+    pool = []
+    for _ in range(distinct):
+        lat, lng = CENTER[0] + rng.uniform(-0.05, 0.05), CENTER[1] + rng.uniform(-0.05, 0.05)
+        pool.append((round(lat, 5), round(lng, 5), round(lat + rng.uniform(-0.03, 0.03), 5),
+                     round(lng + rng.uniform(-0.03, 0.03), 5)))
+    return [pool[i % distinct] for i in range(count)]
+
+
+async def fetch_unpooled(base_url: str, trip: tuple):
+    """A session per request, as get_route_from_osrm did before OSRMClient"""
+    src_lat, src_lng, dest_lat, dest_lng = trip
+    url = f"{base_url}/route/v1/foot/{src_lng},{src_lat};{dest_lng},{dest_lat}"
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url, params={"overview": "full", "geometries": "geojson", "steps": "true"}) as response:
+            response.raise_for_status()
+            return await response.json()
+
+
+async def burst(fetch, requests: List[tuple], concurrency: int) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    queue = iter(requests)
+
+    async def worker():
+        nonlocal errors
+        for trip in queue:
+            started = time.perf_counter()
+            try:
+                await fetch(trip)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+async def run(requests: int, concurrencies: List[int], delay_ms: float, points: int, pool_size: int) -> Dict[str, Dict]:
+    stub = StubOSRMThread(points=points, delay_ms=delay_ms).start()
+    client = OSRMClient(base_url=stub.url, pool_size=pool_size)
+    await client.start()
+    cases = {"distinct": trips(requests, requests), "repeat": trips(requests, 20)}
+    results = {}
+    try:
+        for concurrency in concurrencies:
+            for case, trip_list in cases.items():
+                for name, fetch in [
+                    ("per_request", lambda trip: fetch_unpooled(stub.url, trip)),
+                    ("pooled", lambda trip: client.route(trip[0], trip[1], trip[2], trip[3], "foot"))
+                ]:
+                    upstream = stub.app["requests"]
+                    summary = await burst(fetch, trip_list, concurrency)
+                    summary["upstream"] = stub.app["requests"] - upstream
+                    results[f"{name}/{case}/c{concurrency}"] = summary
+    finally:
+        await client.close()
+        stub.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pooled OSRM client")
+    parser.add_argument("--requests", type=int, default=400, help="requests per case")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrent callers")
+    parser.add_argument("--delay-ms", type=float, default=20.0, help="stub OSRM latency")
+    parser.add_argument("--points", type=int, default=200, help="coordinates per stub route")
+    parser.add_argument("--pool-size", type=int, default=32, help="OSRMClient connection pool size")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="compare with the stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(
+        args.requests,
+        [int(concurrency) for concurrency in args.concurrency.split(",")],
+        args.delay_ms,
+        args.points,
+        args.pool_size
+    ))
+    print_table(results)
+
+    width = max(len(name) for name in results)
+    print(f"\n{'':<{width}}  {'upstream':>10}")
+    for name, result in results.items():
+        print(f"{name:<{width}}  {result['upstream']:>10}")
+
+    if args.save_baseline:
+        save_baseline("osrm", results)
+    if args.compare:
+        regressions = compare_baseline("osrm", results, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
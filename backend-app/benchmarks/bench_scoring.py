@@ -0,0 +1,139 @@
+"""
+Route scoring micro-benchmarks.
+
+Times SafetyScorer entry points, the crime index lookup feeding them and
+generate_mock_route over synthetic crime sets of several sizes, reporting
+per-call percentiles. Results can be stored as a baseline and compared on
+later runs:
+
+    python -m benchmarks.bench_scoring --save-baseline
+    python -m benchmarks.bench_scoring --compare      # exits 1 on regression
+"""
+import argparse
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+from app.utils.crime_index import CrimeIndex
+from app.utils.map_utils import generate_mock_route
+from app.utils.safety_scoring import SafetyScorer
+from benchmarks.report import compare_baseline, print_table, save_baseline, summarize
+from benchmarks.stub_osrm import stub_route
+
+CENTER = (28.6139, 77.2090)
+SPREAD_DEG = 0.1
+
+
+def synthetic_crimes(count: int, seed: int = 42) -> List[Dict]:
+    rng = random.Random(seed)
+    types = ["theft", "harassment", "assault", "robbery", "other"]
+    return [
+        {
+            "_id": i,
+            "lat": CENTER[0] + rng.uniform(-SPREAD_DEG, SPREAD_DEG),
+            "lng": CENTER[1] + rng.uniform(-SPREAD_DEG, SPREAD_DEG),
+            "crime_type": rng.choice(types),
+            "severity": rng.randint(1, 5)
+        }
+        for i in range(count)
+    ]
+
+
+def synthetic_routes(count: int, points: int, seed: int = 7) -> List[List[List[float]]]:
+    """Polylines of 2-5 km in the shape the OSRM client returns ([lat, lng])"""
+    rng = random.Random(seed)
+    routes = []
+    for _ in range(count):
+        src_lat = CENTER[0] + rng.uniform(-0.05, 0.05)
+        src_lng = CENTER[1] + rng.uniform(-0.05, 0.05)
+        dest_lat = src_lat + rng.choice([-1, 1]) * rng.uniform(0.015, 0.03)
+        dest_lng = src_lng + rng.choice([-1, 1]) * rng.uniform(0.015, 0.03)
+        geometry = stub_route(src_lng, src_lat, dest_lng, dest_lat, points)["routes"][0]["geometry"]
+        routes.append([[lat, lng] for lng, lat in geometry["coordinates"]])
+    return routes
+
+
+def time_case(fn: Callable, inputs: List, min_seconds: float, min_calls: int) -> Dict:
+    """Call fn over the inputs round-robin until both minimums are met"""
+    fn(inputs[0])  # warm-up
+    latencies = []
+    started = time.perf_counter()
+    i = 0
+    while len(latencies) < min_calls or time.perf_counter() - started < min_seconds:
+        call_started = time.perf_counter()
+        fn(inputs[i % len(inputs)])
+        latencies.append((time.perf_counter() - call_started) * 1000)
+        i += 1
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def run(sizes: List[int], points: int, batch: int, min_seconds: float, min_calls: int) -> Dict[str, Dict]:
+    scorer = SafetyScorer()
+    routes = synthetic_routes(64, points)
+    batches = [routes[i:i + batch] for i in range(0, len(routes), batch)]
+    results = {}
+
+    # Crime-independent parts
+    results["isolation"] = time_case(scorer._calculate_isolation, routes, min_seconds, min_calls)
+    results["lighting_night"] = time_case(lambda route: scorer._estimate_lighting(route, "night"), routes, min_seconds, min_calls)
+    results["generate_mock_route"] = time_case(
+        lambda route: generate_mock_route(route[0][0], route[0][1], route[-1][0], route[-1][1]),
+        routes, min_seconds, min_calls
+    )
+
+    for size in sizes:
+        index = CrimeIndex()
+        for crime in synthetic_crimes(size):
+            index.upsert(crime)
+        # What routes.py hands to the scorer: crimes near each route, as arrays
+        nearby = [index.query_route(route, scorer.crime_radius_m) for route in routes]
+        cases = list(zip(routes, nearby))
+
+        results[f"crime_index.query_route/{size}"] = time_case(
+            lambda route: index.query_route(route, scorer.crime_radius_m), routes, min_seconds, min_calls
+        )
+        results[f"analyze_crime_density/{size}"] = time_case(
+            lambda case: scorer._analyze_crime_density(*case), cases, min_seconds, min_calls
+        )
+        results[f"calculate_safety_score/{size}"] = time_case(
+            lambda case: scorer.calculate_safety_score(case[0], case[1], "night", "walk"), cases, min_seconds, min_calls
+        )
+        results[f"calculate_safety_scores_x{batch}/{size}"] = time_case(
+            lambda routes_batch: scorer.calculate_safety_scores(
+                routes_batch,
+                index.query_routes(routes_batch, scorer.crime_radius_m),
+                ["night"] * len(routes_batch),
+                ["walk"] * len(routes_batch)
+            ),
+            batches, min_seconds, min_calls
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark route scoring")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated crime set sizes")
+    parser.add_argument("--points", type=int, default=200, help="coordinates per route")
+    parser.add_argument("--batch", type=int, default=16, help="routes per calculate_safety_scores call")
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="minimum time per case")
+    parser.add_argument("--min-calls", type=int, default=20, help="minimum calls per case")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="compare with the stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = run(sizes, args.points, args.batch, args.min_seconds, args.min_calls)
+    print_table(results)
+
+    if args.save_baseline:
+        save_baseline("scoring", results)
+    if args.compare:
+        regressions = compare_baseline("scoring", results, args.tolerance, metrics=("p50_ms", "p95_ms"))
+        if regressions:
+            print(f"{len(regressions)} regressions")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Segment table benchmark.
+
+Builds a synthetic street grid in the routing-graph format, compiles it into
+a segment table and times route scoring with and without the table. Every
+route is scored twice and the run fails if any score differs.
+
+    python -m benchmarks.bench_segment_table --blocks 200 --routes 2000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import numpy as np
+from app.utils.graph_router import haversine_m
+from app.utils.risk_raster import TIME_BUCKETS
+from app.utils.safety_scoring import SafetyScorer
+from app.utils.segment_table import build_segment_table, save_segment_table
+
+CENTER = (28.6139, 77.2090)
+BLOCK_DEG = 0.001
+
+
+def write_grid_graph(path: str, blocks: int):
+    """Square street grid with random road classes, lighting and crime"""
+    rng = np.random.default_rng(42)
+    rows, cols = np.divmod(np.arange(blocks * blocks), blocks)
+    node_lat = CENTER[0] + rows * BLOCK_DEG
+    node_lng = CENTER[1] + cols * BLOCK_DEG
+
+    right = np.flatnonzero(cols < blocks - 1)
+    up = np.flatnonzero(rows < blocks - 1)
+    a = np.concatenate([right, up])
+    b = np.concatenate([right + 1, up + blocks])
+    src, dst = np.concatenate([a, b]), np.concatenate([b, a])
+    order = np.argsort(src, kind="stable")
+    src, dst = src[order], dst[order]
+
+    class_names = np.array(["isolated", "main_road", "market", "residential"])
+    np.savez(
+        path,
+        node_lat=node_lat,
+        node_lng=node_lng,
+        indptr=np.concatenate([[0], np.cumsum(np.bincount(src, minlength=len(node_lat)))]).astype(np.int64),
+        indices=dst.astype(np.int32),
+        length=haversine_m(node_lat[src], node_lng[src], node_lat[dst], node_lng[dst]).astype(np.float32),
+        road_class=rng.integers(0, len(class_names), len(src)).astype(np.int8),
+        lit=rng.integers(-1, 2, len(src)).astype(np.int8),
+        crime=rng.gamma(1.0, 0.3, (len(TIME_BUCKETS), len(src))).astype(np.float32),
+        crime_built_at=np.float64(time.time()),
+        class_names=class_names
+    )
+
+
+def random_route(blocks: int):
+    """Manhattan walk between two random intersections, one vertex per block"""
+    r, c = random.randrange(blocks), random.randrange(blocks)
+    r2, c2 = random.randrange(blocks), random.randrange(blocks)
+    route = [[r, c]]
+    while (r, c) != (r2, c2):
+        if c != c2 and (r == r2 or random.random() < 0.5):
+            c += 1 if c2 > c else -1
+        else:
+            r += 1 if r2 > r else -1
+        route.append([r, c])
+    return [[CENTER[0] + r * BLOCK_DEG, CENTER[1] + c * BLOCK_DEG] for r, c in route]
+
+
+def score_all(scorer: SafetyScorer, routes, crimes):
+    started = time.perf_counter()
+    scores = [scorer.calculate_safety_score(route, crimes, "night")[0] for route in routes]
+    return scores, (time.perf_counter() - started) / len(routes) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark segment-table route scoring")
+    parser.add_argument("--blocks", type=int, default=200, help="grid size in blocks per side")
+    parser.add_argument("--routes", type=int, default=2000)
+    parser.add_argument("--crimes", type=int, default=20000)
+    args = parser.parse_args()
+
+    random.seed(7)
+    routes = [random_route(args.blocks) for _ in range(args.routes)]
+    span = args.blocks * BLOCK_DEG
+    crimes = [
+        {
+            "lat": CENTER[0] + random.uniform(0, span),
+            "lng": CENTER[1] + random.uniform(0, span),
+            "crime_type": random.choice(["theft", "harassment", "assault", "robbery", "other"]),
+            "severity": random.randint(1, 5)
+        }
+        for _ in range(args.crimes)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        graph_path = os.path.join(tmp, "graph.npz")
+        table_path = os.path.join(tmp, "segments.npz")
+        write_grid_graph(graph_path, args.blocks)
+
+        started = time.perf_counter()
+        plain = SafetyScorer()
+        save_segment_table(table_path, build_segment_table(graph_path, plain.road_safety))
+        build_s = time.perf_counter() - started
+
+        tabled = SafetyScorer()
+        tabled.load_segment_table(table_path)
+        print(f"table build: {build_s:.2f} s, {len(tabled.segment_table.keys)} cells")
+
+        for name, scorer in [("proximity", plain), ("segment table", tabled)]:
+            first, ms = score_all(scorer, routes, crimes)
+            second, _ = score_all(scorer, routes, crimes)
+            mismatches = sum(a != b for a, b in zip(first, second))
+            print(f"{name}: {ms:.3f} ms per route, mean score {np.mean(first):.1f}, mismatches {mismatches}")
+            if mismatches:
+                raise SystemExit(f"{name} scoring is not deterministic")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Response serialization benchmark.
+
+Compares FastAPI's default path (response_model validation and/or
+jsonable_encoder, then json.dumps) with FastJSONResponse for the bodies of
+/routes/calculate, /routes/crime-hotspots, /sos/history and /auth/me.
+Reports time per response, peak traced memory per response, and fails if
+the two paths produce different JSON:
+
+    python -m benchmarks.bench_serialization
+    python -m benchmarks.bench_serialization --compare      # exits 1 on regression
+"""
+import argparse
+import json
+import random
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from app.models import RouteRequest, RouteResponse, User
+from app.routes.routes import _route_response
+from app.utils.json_response import FastJSONResponse
+from benchmarks.bench_geometry import winding_route
+from benchmarks.bench_scoring import CENTER, time_case
+from benchmarks.report import compare_baseline, print_table, save_baseline
+
+
+def run_sync(coro):
+    """Drive a coroutine that never suspends (serialize_response with is_coroutine=True)"""
+    try:
+        coro.send(None)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError("coroutine suspended")
+
+
+def route_case(points: int):
+    rng = random.Random(3)
+    routes = [winding_route(points, rng) for _ in range(3)]
+    result = {
+        "safety_score": 72,
+        "distance": points * 10.0,
+        "duration": points * 10.0 / 1.4,
+        "coordinates": routes[0],
+        "warnings": ["Moderate crime activity reported nearby"],
+        "alternatives": [
+            {"safety_score": 80, "distance": points * 11.0, "duration": points * 11.0 / 1.4,
+             "coordinates": route, "description": "Safer route"}
+            for route in routes[1:]
+        ]
+    }
+    body = _route_response(RouteRequest(source_lat=0, source_lng=0, dest_lat=0, dest_lng=0), result)
+    field = create_response_field("Response_calculate", RouteResponse, mode="serialization")
+
+    def default():
+        # Handler builds the model, FastAPI re-validates and encodes it
+        content = run_sync(serialize_response(field=field, response_content=RouteResponse(**body), exclude_none=True))
+        return JSONResponse(content).body
+
+    return default, lambda: FastJSONResponse(body).body
+
+
+def hotspots_case(cells: int):
+    rng = random.Random(5)
+    body = {
+        "zoom": 14, "cell_size_deg": 0.005, "total_incidents": cells * 40, "total_severity": cells * 90,
+        "total_cells": cells * 3, "count": cells,
+        "hotspots": [
+            {"lat": CENTER[0] + rng.uniform(-0.1, 0.1), "lng": CENTER[1] + rng.uniform(-0.1, 0.1),
+             "count": rng.randint(1, 80), "severity": rng.randint(1, 200), "max_severity": rng.randint(1, 5)}
+            for _ in range(cells)
+        ],
+        "next_cursor": "1234:5678"
+    }
+
+    def default():
+        return JSONResponse(run_sync(serialize_response(response_content=body))).body
+
+    return default, lambda: FastJSONResponse(body).body
+
+
+def sos_history_case(alerts: int):
+    now = datetime(2026, 10, 1, 12, 0, 0, 123456)
+    docs = [
+        {"_id": ObjectId(), "lat": CENTER[0], "lng": CENTER[1], "timestamp": now - timedelta(hours=i), "status": "resolved"}
+        for i in range(alerts)
+    ]
+
+    def default():
+        content = {"alerts": [
+            {"id": str(doc["_id"]), "lat": doc["lat"], "lng": doc["lng"], "timestamp": doc["timestamp"], "status": doc["status"]}
+            for doc in docs
+        ]}
+        return JSONResponse(run_sync(serialize_response(response_content=content))).body
+
+    def fast():
+        return FastJSONResponse({"alerts": [
+            {"id": doc["_id"], "lat": doc["lat"], "lng": doc["lng"], "timestamp": doc["timestamp"], "status": doc["status"]}
+            for doc in docs
+        ]}).body
+
+    return default, fast
+
+
+def me_case(contacts: int):
+    user = User(
+        email="bench@example.com", name="Bench", phone="+910000000000",
+        emergency_contacts=[{"name": f"Contact {i}", "phone": "+91000000000{i}", "email": f"c{i}@example.com"} for i in range(contacts)]
+    )
+    field = create_response_field("Response_me", User, mode="serialization")
+
+    def default():
+        return JSONResponse(run_sync(serialize_response(field=field, response_content=user))).body
+
+    return default, lambda: FastJSONResponse(user.model_dump(by_alias=True)).body
+
+
+def peak_kib(fn: Callable) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def run(min_seconds: float, min_calls: int) -> Dict[str, Dict]:
+    cases = {
+        "route/500": route_case(500),
+        "route/2000": route_case(2000),
+        "hotspots/100": hotspots_case(100),
+        "hotspots/2000": hotspots_case(2000),
+        "sos_history/50": sos_history_case(50),
+        "me": me_case(5)
+    }
+    results = {}
+    for name, (default, fast) in cases.items():
+        if json.loads(default()) != json.loads(fast()):
+            raise SystemExit(f"{name}: FastJSONResponse output differs from the default path")
+        for path, fn in [("default", default), ("orjson", fast)]:
+            summary = time_case(lambda _: fn(), [None], min_seconds, min_calls)
+            summary["peak_kib"] = peak_kib(fn)
+            results[f"{name}/{path}"] = summary
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response serialization")
+    parser.add_argument("--min-seconds", type=float, default=0.3, help="minimum time per case")
+    parser.add_argument("--min-calls", type=int, default=20, help="minimum calls per case")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="compare with the stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    results = run(args.min_seconds, args.min_calls)
+    print_table(results)
+
+    width = max(len(name) for name in results)
+    print(f"\n{'':<{width}}  {'peak_kib':>10}")
+    for name, result in results.items():
+        print(f"{name:<{width}}  {result['peak_kib']:>10.1f}")
+
+    if args.save_baseline:
+        save_baseline("serialization", results)
+    if args.compare:
+        regressions = compare_baseline("serialization", results, args.tolerance, metrics=("p50_ms", "p95_ms"))
+        if regressions:
+            print(f"{len(regressions)} regressions")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Alert email throughput benchmark.
+
+Sends a burst of SOS-style emails to a local aiosmtpd server (needs the
+aiosmtpd package) and compares a fresh connection per message, which is
+how alerts were sent before the pool, with SMTPPool at several sizes.
+The server can add a delay to each connection's EHLO and to each message,
+standing in for the TLS handshake plus login and for the network round
+trip of a real provider:
+
+    python -m benchmarks.bench_smtp
+    python -m benchmarks.bench_smtp --connect-ms 150 --message-ms 20
+    python -m benchmarks.bench_smtp --compare      # exits 1 on regression
+"""
+import argparse
+import asyncio
+import os
+import smtplib
+import socket
+import sys
+import time
+from email.mime.text import MIMEText
+from typing import Dict, List
+from app.utils.smtp_pool import SMTPPool
+from benchmarks.report import compare_baseline, print_table, save_baseline, summarize
+
+# Concurrent sends, as the SOS dispatcher allows on its email channel
+CONCURRENCY = 16
+
+
+class DelayedHandler:
+    """Counts delivered messages, sleeping to imitate a remote server"""
+
+    def __init__(self, connect_s: float, message_s: float):
+        self.connect_s = connect_s
+        self.message_s = message_s
+        self.messages = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.connect_s)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.message_s)
+        self.messages += 1
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def alert(i: int) -> MIMEText:
+    msg = MIMEText(f"Emergency alert {i}: your contact triggered SOS at 28.6139, 77.2090")
+    msg["Subject"] = "SOS Alert"
+    msg["From"] = "alerts@example.com"
+    msg["To"] = f"contact{i}@example.com"
+    return msg
+
+
+def send_unpooled(host: str, port: int, msg: MIMEText):
+    """Connect, send and quit, as send_email_alert did before the pool"""
+    with smtplib.SMTP(host, port, timeout=10) as server:
+        server.send_message(msg)
+
+
+async def burst(send, messages: int) -> Dict:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await send(alert(i))
+            except (smtplib.SMTPException, OSError):
+                errors += 1
+                return
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(messages)])
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+async def run(messages: int, pool_sizes: List[int], connect_s: float, message_s: float) -> Dict[str, Dict]:
+    from aiosmtpd.controller import Controller
+
+    handler = DelayedHandler(connect_s, message_s)
+    host, port = "127.0.0.1", free_port()
+    controller = Controller(handler, hostname=host, port=port)
+    controller.start()
+    # SMTPPool reads its server from the environment at connect time
+    os.environ.update(SMTP_HOST=host, SMTP_PORT=str(port), SMTP_SSL="false")
+    os.environ.pop("SMTP_PASSWORD", None)
+
+    results = {}
+    try:
+        delivered = handler.messages
+        results["per_message"] = await burst(lambda msg: asyncio.to_thread(send_unpooled, host, port, msg), messages)
+        results["per_message"]["connects"] = messages
+        if handler.messages - delivered != messages - results["per_message"]["errors"]:
+            raise SystemExit("per_message: server count does not match sent messages")
+
+        for size in pool_sizes:
+            pool = SMTPPool(size=size)
+            delivered = handler.messages
+            try:
+                summary = await burst(pool.send, messages)
+            finally:
+                await pool.close()
+            summary["connects"] = pool.stats["connects"]
+            summary["batches"] = pool.stats["batches"]
+            if handler.messages - delivered != pool.stats["sent"]:
+                raise SystemExit(f"pool/{size}: server count does not match sent messages")
+            results[f"pool/{size}"] = summary
+    finally:
+        controller.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pooled SMTP alert sending")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--pool-sizes", default="1,2,4", help="comma-separated SMTPPool sizes")
+    parser.add_argument("--connect-ms", type=float, default=50.0, help="server delay per connection (EHLO)")
+    parser.add_argument("--message-ms", type=float, default=5.0, help="server delay per message (DATA)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="compare with the stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(
+        args.messages,
+        [int(size) for size in args.pool_sizes.split(",")],
+        args.connect_ms / 1000,
+        args.message_ms / 1000
+    ))
+    print_table(results)
+
+    width = max(len(name) for name in results)
+    print(f"\n{'':<{width}}  {'connects':>10}  {'batches':>10}")
+    for name, result in results.items():
+        print(f"{name:<{width}}  {result['connects']:>10}  {result.get('batches', '-'):>10}")
+
+    if args.save_baseline:
+        save_baseline("smtp", results)
+    if args.compare:
+        regressions = compare_baseline("smtp", results, args.tolerance, metrics=("p50_ms", "p95_ms", "throughput_rps"))
+        if regressions:
+            print(f"{len(regressions)} regressions")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""
+In-process API load generator.
+
+Drives the FastAPI app through httpx's ASGI transport (no sockets to the
+API), with OSRM answered by benchmarks.stub_osrm and MongoDB either a local
+mongod (--mongo-uri, using a throwaway shakti_bench database) or mongomock
+(the default, which needs the mongomock-motor package). Each scenario runs
+a closed loop of --concurrency clients for --requests requests and reports
+throughput and p50/p95/p99 latency; results can be stored as a baseline and
+compared against on later runs.
+
+    python -m benchmarks.load_api --scenarios routes,sos,login
+    python -m benchmarks.load_api --mongo-uri mongodb://localhost:27017 --save-baseline
+    python -m benchmarks.load_api --compare          # exits 1 on regression
+
+Scenarios:
+    login        POST /auth/login at modest concurrency
+    login_storm  POST /auth/login from many clients at once (queued for the
+                 hashing executor; 503 once HASH_WAIT_SECONDS runs out)
+    routes       POST /routes/calculate over a pool of trips (repeats hit the route cache)
+    routes_cold  POST /routes/calculate with every trip distinct
+    sos          POST /sos/trigger for a user with emergency contacts
+    health       GET /health
+    me           GET /auth/me with the token and user caches warm
+    me_uncached  GET /auth/me with both caches disabled (a JWT decode and a
+                 users lookup per request)
+    scoring_storm  routes_cold from more clients than the scoring executor
+                 admits (expect 429 shedding)
+
+Under-load scenarios send paced probe requests (--probe-interval-ms apart)
+while a background scenario keeps the API busy, and also sample event loop
+lag (how late a 10 ms sleep wakes up):
+    health_during_login_storm  /health while login_storm runs
+    sos_during_login_storm     /sos/trigger while login_storm runs
+    health_during_scoring      /health while scoring_storm saturates the scoring executor
+
+mongomock lacks time-series collections and change streams, so instead of
+the app's startup hook the harness starts the services these endpoints use
+and loads synthetic crimes straight into the in-memory crime index.
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import random
+import sys
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional
+import httpx
+from app.main import app
+from app.database import db
+from app.routes.auth import token_cache, user_cache
+from app.utils.crime_index import crime_index
+from app.utils.db_indexes import ensure_indexes
+from app.utils.executors import hashing_executor, scoring_executor
+from app.utils.map_utils import osrm_client
+from app.utils.route_cache import route_cache
+from app.utils.sos_dispatch import sos_dispatcher
+from benchmarks.bench_scoring import CENTER, synthetic_crimes
+from benchmarks.report import compare_baseline, print_table, save_baseline, summarize
+from benchmarks.stub_osrm import StubOSRMThread
+
+BENCH_DB = "shakti_bench"
+EMAIL = "bench@example.com"
+PASSWORD = "bench-password"
+
+# Scenario -> default concurrency
+SCENARIOS = {
+    "login": 4,
+    "login_storm": 64,
+    "routes": 16,
+    "routes_cold": 16,
+    "sos": 16,
+    "health": 4,
+    "me": 16,
+    "me_uncached": 16,
+    "scoring_storm": 128
+}
+
+# Scenarios run with the auth caches disabled, to compare against their cached twin
+UNCACHED = {"me_uncached"}
+
+# Under-load scenario -> (probe scenario, background scenario)
+UNDER_LOAD = {
+    "health_during_login_storm": ("health", "login_storm"),
+    "sos_during_login_storm": ("sos", "login_storm"),
+    "health_during_scoring": ("health", "scoring_storm")
+}
+
+# Probes run at this concurrency, paced so they sample the whole background run
+PROBE_CONCURRENCY = 2
+
+LAG_INTERVAL = 0.01
+
+
+@contextlib.contextmanager
+def auth_caches_disabled():
+    """Make every token and user lookup miss the auth caches"""
+    saved = token_cache.maxsize, user_cache.maxsize
+    token_cache.clear()
+    user_cache.clear()
+    token_cache.maxsize = user_cache.maxsize = 0
+    try:
+        yield
+    finally:
+        token_cache.maxsize, user_cache.maxsize = saved
+
+
+async def start_services(mongo_uri: Optional[str], osrm_url: str, crimes: int):
+    if mongo_uri:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(mongo_uri)
+        await client.drop_database(BENCH_DB)
+        database = client[BENCH_DB]
+        await ensure_indexes(database)
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+        database = client[BENCH_DB]
+    db.client, db.db = client, database
+
+    osrm_client.base_url = osrm_url
+    await osrm_client.start()
+    await sos_dispatcher.start(database)
+    await route_cache.start(database.route_cache)
+    scoring_executor.start()
+    hashing_executor.start()
+
+    crime_index.clear()
+    for crime in synthetic_crimes(crimes):
+        crime_index.upsert(crime)
+
+
+async def stop_services(mongo_uri: Optional[str]):
+    await sos_dispatcher.stop()
+    await osrm_client.close()
+    scoring_executor.shutdown()
+    hashing_executor.shutdown()
+    if mongo_uri:
+        await db.client.drop_database(BENCH_DB)
+        db.client.close()
+
+
+async def setup_user(client: httpx.AsyncClient) -> Dict[str, str]:
+    await client.post("/auth/signup", json={"email": EMAIL, "password": PASSWORD, "name": "Bench"})
+    response = await client.post("/auth/login", data={"username": EMAIL, "password": PASSWORD})
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    for i in range(3):
+        await client.post("/auth/contacts", json={"name": f"Contact {i}", "phone": f"+9100000000{i}"}, headers=headers)
+    return headers
+
+
+def random_trip(rng: random.Random) -> Dict:
+    src_lat = CENTER[0] + rng.uniform(-0.05, 0.05)
+    src_lng = CENTER[1] + rng.uniform(-0.05, 0.05)
+    return {
+        "source_lat": round(src_lat, 5),
+        "source_lng": round(src_lng, 5),
+        "dest_lat": round(src_lat + rng.uniform(-0.03, 0.03), 5),
+        "dest_lng": round(src_lng + rng.uniform(-0.03, 0.03), 5),
+        "mode": "walk",
+        "time_of_day": "night"
+    }
+
+
+def make_scenario(name: str, headers: Dict[str, str], trip_pool: int) -> Callable[[httpx.AsyncClient, int], Awaitable]:
+    rng = random.Random(name)
+    pool = [random_trip(rng) for _ in range(trip_pool)]
+
+    async def login(client, i):
+        return await client.post("/auth/login", data={"username": EMAIL, "password": PASSWORD})
+
+    async def routes(client, i):
+        return await client.post("/routes/calculate", json=rng.choice(pool))
+
+    async def routes_cold(client, i):
+        return await client.post("/routes/calculate", json=random_trip(rng))
+
+    async def sos(client, i):
+        return await client.post("/sos/trigger", json={"lat": CENTER[0], "lng": CENTER[1], "message": f"bench {i}"}, headers=headers)
+
+    async def health(client, i):
+        return await client.get("/health")
+
+    async def me(client, i):
+        return await client.get("/auth/me", headers=headers)
+
+    return {
+        "login": login, "login_storm": login, "routes": routes, "routes_cold": routes_cold, "sos": sos,
+        "health": health, "me": me, "me_uncached": me, "scoring_storm": routes_cold
+    }[name]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    request: Callable,
+    total: int,
+    concurrency: int,
+    interval: float = 0.0
+) -> Dict:
+    latencies: List[float] = []
+    statuses = Counter()
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                response = await request(client, i)
+                status = response.status_code
+            except Exception as e:
+                status = type(e).__name__
+            statuses[status] += 1
+            if status == 200:
+                latencies.append((time.perf_counter() - started) * 1000)
+            if interval:
+                await asyncio.sleep(interval)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    summary = summarize(latencies, time.perf_counter() - started, errors=total - len(latencies))
+    summary["concurrency"] = concurrency
+    summary["statuses"] = {str(status): count for status, count in sorted(statuses.items(), key=str)}
+    return summary
+
+
+async def run_background(client: httpx.AsyncClient, request: Callable, concurrency: int, stop: asyncio.Event) -> Counter:
+    """Keep concurrency clients sending requests until stop is set"""
+    statuses = Counter()
+
+    async def worker():
+        i = 0
+        while not stop.is_set():
+            try:
+                statuses[(await request(client, i)).status_code] += 1
+            except Exception as e:
+                statuses[type(e).__name__] += 1
+            i += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return statuses
+
+
+async def sample_loop_lag(stop: asyncio.Event) -> List[float]:
+    """How late (ms) each LAG_INTERVAL sleep wakes up until stop is set"""
+    lags = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        lags.append(max(0.0, time.perf_counter() - started - LAG_INTERVAL) * 1000)
+    return lags
+
+
+async def run_under_load(client: httpx.AsyncClient, probe: Callable, background: Callable, args, name: str) -> Dict:
+    stop = asyncio.Event()
+    background_name = UNDER_LOAD[name][1]
+    loaded = asyncio.create_task(run_background(client, background, SCENARIOS[background_name], stop))
+    lag = asyncio.create_task(sample_loop_lag(stop))
+    try:
+        # Let the background fill its queues before probing
+        await asyncio.sleep(args.probe_delay_ms / 1000)
+        summary = await run_scenario(client, probe, args.requests, PROBE_CONCURRENCY, args.probe_interval_ms / 1000)
+    finally:
+        stop.set()
+        statuses, lags = await asyncio.gather(loaded, lag)
+
+    lag_summary = summarize(lags)
+    summary.update(
+        loop_lag_p50_ms=lag_summary.get("p50_ms"),
+        loop_lag_p99_ms=lag_summary.get("p99_ms"),
+        loop_lag_max_ms=lag_summary.get("max_ms"),
+        background_statuses={str(status): count for status, count in sorted(statuses.items(), key=str)}
+    )
+    return summary
+
+
+async def run(args) -> Dict[str, Dict]:
+    stub = StubOSRMThread(points=args.osrm_points, delay_ms=args.osrm_delay_ms).start()
+    await start_services(args.mongo_uri, stub.url, args.crimes)
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            headers = await setup_user(client)
+            for name in args.scenarios.split(","):
+                # The app logs every alert it sends; keep that out of the report
+                uncached = auth_caches_disabled() if name in UNCACHED else contextlib.nullcontext()
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), uncached:
+                    if name in UNDER_LOAD:
+                        probe_name, background_name = UNDER_LOAD[name]
+                        probe = make_scenario(probe_name, headers, args.trip_pool)
+                        background = make_scenario(background_name, headers, args.trip_pool)
+                        results[name] = await run_under_load(client, probe, background, args, name)
+                    else:
+                        request = make_scenario(name, headers, args.trip_pool)
+                        concurrency = args.concurrency or SCENARIOS[name]
+                        await run_scenario(client, request, min(args.warmup, args.requests), concurrency)
+                        results[name] = await run_scenario(client, request, args.requests, concurrency)
+                print(f"{name}: {results[name]['statuses']}", file=sys.stderr)
+                if "background_statuses" in results[name]:
+                    print(f"{name} background: {results[name]['background_statuses']}", file=sys.stderr)
+    finally:
+        await stop_services(args.mongo_uri)
+        stub.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API in-process")
+    parser.add_argument(
+        "--scenarios",
+        default="routes,routes_cold,sos,login,login_storm,health,me,me_uncached,health_during_login_storm,"
+                "sos_during_login_storm,health_during_scoring"
+    )
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests before each scenario")
+    parser.add_argument("--concurrency", type=int, default=0, help="override each scenario's default")
+    parser.add_argument("--mongo-uri", help="local mongod to use instead of mongomock")
+    parser.add_argument("--crimes", type=int, default=50000, help="synthetic crimes in the index")
+    parser.add_argument("--trip-pool", type=int, default=200, help="distinct trips in the routes scenario")
+    parser.add_argument("--osrm-points", type=int, default=200, help="coordinates per stub OSRM route")
+    parser.add_argument("--osrm-delay-ms", type=float, default=20.0, help="stub OSRM latency")
+    parser.add_argument("--probe-interval-ms", type=float, default=20.0, help="pause between probe requests")
+    parser.add_argument("--probe-delay-ms", type=float, default=500.0, help="background run time before probing")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="compare with the stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios.split(",")) - set(SCENARIOS) - set(UNDER_LOAD)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = asyncio.run(run(args))
+    print_table(results)
+
+    loaded = {name: result for name, result in results.items() if "loop_lag_p99_ms" in result}
+    if loaded:
+        width = max(len(name) for name in loaded)
+        print(f"\n{'':<{width}}  {'loop_lag_p50':>12}  {'loop_lag_p99':>12}  {'loop_lag_max':>12}")
+        for name, result in loaded.items():
+            print(f"{name:<{width}}  {result['loop_lag_p50_ms']:>12.3f}  {result['loop_lag_p99_ms']:>12.3f}  {result['loop_lag_max_ms']:>12.3f}")
+
+    if "me" in results and "me_uncached" in results:
+        speedup = results["me"]["throughput_rps"] / results["me_uncached"]["throughput_rps"]
+        print(f"\n/auth/me with the auth caches: {speedup:.2f}x the uncached throughput")
+
+    name = "api_mongod" if args.mongo_uri else "api_mongomock"
+    if args.save_baseline:
+        save_baseline(name, results)
+    if args.compare:
+        regressions = compare_baseline(
+            name, results, args.tolerance, metrics=("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "loop_lag_p99_ms")
+        )
+        if regressions:
+            print(f"{len(regressions)} regressions")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
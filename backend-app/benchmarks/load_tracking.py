@@ -0,0 +1,126 @@
+"""
+Live-tracking load test.
+
+Simulates many phones streaming positions over /tracking/ws and one watching
+contact per journey, against a running API, and reports delivery latency.
+
+    uvicorn app.main:app --port 8000
+    python -m benchmarks.load_tracking --journeys 2000 --rate 1 --duration 60
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from datetime import datetime, timezone
+import aiohttp
+import websockets
+from benchmarks.report import compare_baseline, print_table, save_baseline, summarize
+
+
+async def create_journeys(base_url: str, count: int, email: str, password: str):
+    async with aiohttp.ClientSession() as session:
+        await session.post(f"{base_url}/auth/signup", json={"email": email, "password": password, "name": "Load Test"})
+        async with session.post(f"{base_url}/auth/login", data={"username": email, "password": password}) as response:
+            token = (await response.json())["access_token"]
+
+        headers = {"Authorization": f"Bearer {token}"}
+        journeys = []
+        for _ in range(count):
+            async with session.post(f"{base_url}/tracking/journeys", headers=headers) as response:
+                journeys.append(await response.json())
+        return token, journeys
+
+
+async def tracker(ws_url: str, journey: dict, token: str, rate: float, duration: float, delay: float, stats: dict):
+    await asyncio.sleep(delay)
+    lat, lng = 28.6139 + random.uniform(-0.05, 0.05), 77.2090 + random.uniform(-0.05, 0.05)
+    async with websockets.connect(f"{ws_url}/tracking/ws/{journey['journey_id']}?token={token}") as socket:
+        stats["trackers"] += 1
+        # Spread sends across the interval so connections do not fire in lockstep
+        await asyncio.sleep(random.uniform(0, 1 / rate))
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            lat += random.uniform(-0.0002, 0.0002)
+            lng += random.uniform(-0.0002, 0.0002)
+            await socket.send(json.dumps({"lat": lat, "lng": lng, "accuracy": 10, "ts": time.time() * 1000}))
+            stats["sent"] += 1
+            await asyncio.sleep(1 / rate)
+
+
+async def watcher(ws_url: str, journey: dict, duration: float, delay: float, stats: dict):
+    await asyncio.sleep(delay)
+    url = f"{ws_url}/tracking/ws/{journey['journey_id']}/watch?share_token={journey['share_token']}"
+    async with websockets.connect(url) as socket:
+        stats["watchers"] += 1
+
+        async def receive():
+            async for message in socket:
+                data = json.loads(message)
+                if data["type"] == "position":
+                    # ts echoes the tracker's send time in UTC
+                    sent_at = datetime.fromisoformat(data["ts"]).replace(tzinfo=timezone.utc).timestamp()
+                    stats["latencies"].append((time.time() - sent_at) * 1000)
+
+        try:
+            await asyncio.wait_for(receive(), timeout=duration + 6)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run(args) -> dict:
+    ws_url = args.url.replace("http", "ws", 1)
+    token, journeys = await create_journeys(args.url, args.journeys, args.email, args.password)
+    stats = {"trackers": 0, "watchers": 0, "sent": 0, "latencies": []}
+
+    started = time.perf_counter()
+    # Connections ramp up over --ramp seconds, each watcher shortly before its tracker
+    delays = [args.ramp * i / len(journeys) for i in range(len(journeys))]
+    watchers = [
+        asyncio.create_task(watcher(ws_url, journey, args.duration, delay, stats))
+        for journey, delay in zip(journeys, delays)
+    ]
+    trackers = [
+        asyncio.create_task(tracker(ws_url, journey, token, args.rate, args.duration, delay + 1, stats))
+        for journey, delay in zip(journeys, delays)
+    ]
+    results = await asyncio.gather(*trackers, *watchers, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    errors = [result for result in results if isinstance(result, Exception)]
+    print(f"journeys: {len(journeys)}  trackers: {stats['trackers']}  watchers: {stats['watchers']}  errors: {len(errors)}")
+    print(f"sent: {stats['sent']}  received: {len(stats['latencies'])}  throughput: {stats['sent'] / elapsed:.0f} msg/s")
+    if errors:
+        print(f"first error: {errors[0]!r}")
+    # Latency of delivered positions; lost positions count as errors
+    return {"delivery": summarize(stats["latencies"], elapsed, errors=max(0, stats["sent"] - len(stats["latencies"])))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test live location tracking")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--journeys", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=1.0, help="positions per second per tracker")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds each tracker streams")
+    parser.add_argument("--ramp", type=float, default=10.0, help="seconds over which connections open")
+    parser.add_argument("--email", default="loadtest@example.com")
+    parser.add_argument("--password", default="loadtest-password")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="compare with the stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_table(results)
+    if args.save_baseline:
+        save_baseline("tracking", results)
+    if args.compare:
+        regressions = compare_baseline("tracking", results, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
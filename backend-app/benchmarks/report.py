@@ -0,0 +1,102 @@
+"""
+Shared reporting for the benchmark scripts: latency percentiles, result
+tables and JSON baselines for regression comparison.
+
+Baselines are machine-specific; record one on the machine that runs the
+comparison (e.g. the CI runner) before relying on --compare.
+"""
+import json
+import os
+import platform
+import time
+from typing import Dict, List, Optional
+import numpy as np
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+# Metrics where a larger value is a regression; the rest (throughput) regress when smaller
+LOWER_IS_BETTER = {"p50_ms", "p95_ms", "p99_ms", "mean_ms", "error_rate", "bytes", "gzip_bytes", "loop_lag_p99_ms"}
+
+# Latency changes smaller than this are timer and scheduler noise, whatever the ratio
+MIN_DELTA_MS = 0.5
+
+
+def summarize(latencies_ms: List[float], elapsed_s: Optional[float] = None, errors: int = 0) -> Dict:
+    """Count, percentiles and (given the wall time) throughput of a sample"""
+    samples = np.asarray(latencies_ms, dtype=np.float64)
+    total = len(samples) + errors
+    summary = {"count": len(samples), "errors": errors, "error_rate": errors / total if total else 0.0}
+    if len(samples):
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        summary.update(
+            mean_ms=float(samples.mean()),
+            p50_ms=float(p50),
+            p95_ms=float(p95),
+            p99_ms=float(p99),
+            max_ms=float(samples.max())
+        )
+    if elapsed_s:
+        summary["throughput_rps"] = len(samples) / elapsed_s
+    return summary
+
+
+def print_table(results: Dict[str, Dict]):
+    columns = ["count", "errors", "throughput_rps", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+    shown = [column for column in columns if any(column in result for result in results.values())]
+    width = max([len(name) for name in results] + [10])
+    print(f"{'':<{width}}  " + "  ".join(f"{column:>14}" for column in shown))
+    for name, result in results.items():
+        cells = []
+        for column in shown:
+            value = result.get(column)
+            cells.append(f"{'-':>14}" if value is None else f"{value:>14.3f}" if isinstance(value, float) else f"{value:>14}")
+        print(f"{name:<{width}}  " + "  ".join(cells))
+
+
+def save_baseline(name: str, results: Dict[str, Dict], path: Optional[str] = None) -> str:
+    path = path or os.path.join(BASELINE_DIR, f"{name}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({
+            "name": name,
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "machine": {"python": platform.python_version(), "processor": platform.machine(), "cpus": os.cpu_count()},
+            "results": results
+        }, f, indent=2, sort_keys=True)
+    print(f"Saved baseline {path}")
+    return path
+
+
+def compare_baseline(
+    name: str,
+    results: Dict[str, Dict],
+    tolerance: float = 0.2,
+    metrics: tuple = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"),
+    path: Optional[str] = None
+) -> List[str]:
+    """
+    Compare results against a stored baseline and return the regressions:
+    metrics more than tolerance worse than the baseline value (and, for
+    latencies, at least MIN_DELTA_MS worse)
+    """
+    path = path or os.path.join(BASELINE_DIR, f"{name}.json")
+    with open(path) as f:
+        baseline = json.load(f)["results"]
+
+    regressions = []
+    for case, result in results.items():
+        if case not in baseline:
+            continue
+        for metric in metrics:
+            old, new = baseline[case].get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change > tolerance if metric in LOWER_IS_BETTER else change < -tolerance
+            if metric.endswith("_ms") and abs(new - old) < MIN_DELTA_MS:
+                worse = False
+            marker = "  REGRESSION" if worse else ""
+            print(f"{case:<40} {metric:<15} {old:>12.3f} -> {new:>12.3f} ({change:+.1%}){marker}")
+            if worse:
+                regressions.append(f"{case} {metric} {change:+.1%}")
+    return regressions
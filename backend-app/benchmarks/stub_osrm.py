@@ -0,0 +1,102 @@
+"""
+Stub OSRM server for benchmarks.
+
+Answers /route/v1/{profile}/{lng,lat;lng,lat} like OSRM with a deterministic
+zig-zag polyline between the two points, after an optional delay, so route
+benchmarks do not depend on (or hammer) the public OSRM demo server.
+
+    python -m benchmarks.stub_osrm --port 5001 --points 200 --delay-ms 20
+    OSRM_BASE_URL=http://localhost:5001 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import math
+import threading
+from aiohttp import web
+from app.utils.graph_router import haversine_m
+
+
+def stub_route(src_lng: float, src_lat: float, dest_lng: float, dest_lat: float, points: int) -> dict:
+    coordinates = []
+    for i in range(points):
+        t = i / (points - 1)
+        # Small perpendicular wiggle so the path is not a straight line
+        wiggle = 0.0003 * math.sin(t * math.pi * 8) if 0 < i < points - 1 else 0.0
+        coordinates.append([src_lng + (dest_lng - src_lng) * t + wiggle, src_lat + (dest_lat - src_lat) * t - wiggle])
+
+    distance = sum(
+        float(haversine_m(a[1], a[0], b[1], b[0]))
+        for a, b in zip(coordinates, coordinates[1:])
+    )
+    return {
+        "code": "Ok",
+        "routes": [{
+            "distance": distance,
+            "duration": distance / 1.4,
+            "geometry": {"type": "LineString", "coordinates": coordinates}
+        }]
+    }
+
+
+def make_app(points: int = 200, delay_ms: float = 0.0) -> web.Application:
+    async def route(request: web.Request) -> web.Response:
+        try:
+            (src_lng, src_lat), (dest_lng, dest_lat) = (
+                map(float, pair.split(",")) for pair in request.match_info["coords"].split(";")
+            )
+        except ValueError:
+            return web.json_response({"code": "InvalidQuery"}, status=400)
+        if delay_ms:
+            await asyncio.sleep(delay_ms / 1000)
+        request.app["requests"] += 1
+        return web.json_response(stub_route(src_lng, src_lat, dest_lng, dest_lat, points))
+
+    app = web.Application()
+    app["requests"] = 0
+    app.router.add_get("/route/v1/{profile}/{coords}", route)
+    return app
+
+
+class StubOSRMThread:
+    """Run the stub on its own event loop so it does not load the loop under test"""
+
+    def __init__(self, port: int = 0, points: int = 200, delay_ms: float = 0.0):
+        self.port = port
+        self.app = make_app(points, delay_ms)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.runner = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> "StubOSRMThread":
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+        return self
+
+    async def _start(self):
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve stub OSRM routes")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--points", type=int, default=200, help="coordinates per route")
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="simulated upstream latency")
+    args = parser.parse_args()
+    web.run_app(make_app(args.points, args.delay_ms), host="127.0.0.1", port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Shared fixtures. Run from backend-app/ with `python -m pytest`.
+
+The API is driven in-process through httpx's ASGI transport against
+mongomock (no lifespan events, so each test starts what it needs).
+"""
+import os
+
+# Cheapest bcrypt cost, set before app.routes.auth reads it
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import httpx
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def mock_db():
+    from app.database import db
+    from app.routes.auth import token_cache, user_cache
+    saved = db.client, db.db
+    db.client = AsyncMongoMockClient()
+    db.db = db.client.shakti_test
+    token_cache.clear()
+    user_cache.clear()
+    yield db.db
+    db.client, db.db = saved
+
+
+@pytest.fixture
+async def api(mock_db):
+    from app.main import app
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+async def sign_in(api, email: str = "user@example.com", password: str = "correct-horse") -> dict:
+    """Sign up (if needed) and log in, returning auth headers"""
+    await api.post("/auth/signup", json={"email": email, "password": password, "name": "Test"})
+    response = await api.post("/auth/login", data={"username": email, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
@@ -0,0 +1,80 @@
+import time
+from datetime import timedelta
+import pytest
+from app.routes import auth
+from app.routes.auth import create_access_token, email_from_token, token_cache, user_cache
+from tests.conftest import sign_in
+
+
+@pytest.fixture
+def decodes(monkeypatch):
+    """Count JWT signature checks"""
+    calls = []
+    decode = auth.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(auth.jwt, "decode", counting_decode)
+    token_cache.clear()
+    return calls
+
+
+def test_verified_tokens_are_cached(decodes):
+    token = create_access_token({"sub": "user@example.com"}, timedelta(hours=1))
+    assert email_from_token(token) == "user@example.com"
+    assert email_from_token(token) == "user@example.com"
+    assert len(decodes) == 1
+
+
+def test_invalid_tokens_are_not_cached(decodes):
+    assert email_from_token("not-a-jwt") is None
+    assert email_from_token("not-a-jwt") is None
+    assert len(decodes) == 2
+    assert len(token_cache) == 0
+
+
+def test_tokens_are_not_cached_past_expiry(decodes, monkeypatch):
+    token = create_access_token({"sub": "user@example.com"}, timedelta(seconds=-1))
+    assert email_from_token(token) is None
+    assert len(token_cache) == 0
+
+    # Ahead of UTC, where naive-UTC timestamps read as local time would be hours off
+    monkeypatch.setenv("TZ", "Asia/Kolkata")
+    time.tzset()
+    try:
+        soon = create_access_token({"sub": "user@example.com"}, timedelta(seconds=30))
+        assert email_from_token(soon) == "user@example.com"
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+    expires_at, _ = token_cache.data[soon]
+    assert 25 < expires_at - time.monotonic() <= 30
+
+
+@pytest.mark.anyio
+async def test_user_lookups_are_cached_until_invalidated(mock_db, api):
+    headers = await sign_in(api)
+    assert (await api.get("/auth/me", headers=headers)).json()["name"] == "Test"
+    assert "user@example.com" in user_cache.data
+
+    # A change made elsewhere is not seen while the cached copy lives
+    await mock_db.users.update_one({"email": "user@example.com"}, {"$set": {"name": "Renamed"}})
+    assert (await api.get("/auth/me", headers=headers)).json()["name"] == "Test"
+
+    # Changes made through this worker evict it
+    await api.post("/auth/contacts", json={"name": "Mum", "phone": "+910000000000"}, headers=headers)
+    me = (await api.get("/auth/me", headers=headers)).json()
+    assert me["name"] == "Renamed"
+    assert me["emergency_contacts"][0]["name"] == "Mum"
+
+
+@pytest.mark.anyio
+async def test_deleted_users_are_rejected_after_cache_expiry(mock_db, api):
+    headers = await sign_in(api)
+    assert (await api.get("/auth/me", headers=headers)).status_code == 200
+
+    await mock_db.users.delete_one({"email": "user@example.com"})
+    user_cache.clear()
+    assert (await api.get("/auth/me", headers=headers)).status_code == 401
@@ -0,0 +1,81 @@
+import asyncio
+import json
+import time
+import pytest
+from app.routes import routes
+from app.utils.map_utils import generate_mock_route
+
+
+@pytest.fixture
+def slow_routes(monkeypatch):
+    """Route fetches that finish in reverse request order; dest_lng 0 finds no route"""
+    async def fetch_route(route_request, time_of_day, wait=False):
+        await asyncio.sleep(0.25 - route_request.source_lat * 0.05)
+        if route_request.dest_lng == 0:
+            return None, []
+        return generate_mock_route(route_request.source_lat, route_request.source_lng,
+                                   route_request.dest_lat, route_request.dest_lng), []
+
+    monkeypatch.setattr(routes, "_fetch_route", fetch_route)
+
+
+def batch(count):
+    return {"routes": [
+        {"source_lat": i, "source_lng": 77.2, "dest_lat": i + 0.01, "dest_lng": 0 if i == 2 else 77.21}
+        for i in range(count)
+    ]}
+
+
+@pytest.mark.anyio
+async def test_batch_streams_in_completion_order(api, slow_routes):
+    lines = []
+    async with api.stream("POST", "/routes/calculate/batch", json=batch(5)) as response:
+        assert response.headers["content-type"] == "application/x-ndjson"
+        async for line in response.aiter_lines():
+            if line:
+                lines.append(json.loads(line))
+
+    # Later requests finish first, and every request gets exactly one line
+    assert [line["index"] for line in lines] == [4, 3, 2, 1, 0]
+    failed = [line for line in lines if "error" in line]
+    assert [line["index"] for line in failed] == [2]
+    for line in lines:
+        if "error" not in line:
+            assert 0 <= line["safety_score"] <= 100
+            assert line["coordinates"][0] == [line["index"], 77.2]
+
+
+@pytest.mark.anyio
+async def test_batch_uses_each_request_geometry(api, slow_routes):
+    body = batch(2)
+    body["routes"][1]["geometry"] = "polyline"
+    response = await api.post("/routes/calculate/batch", json=body)
+    lines = {line["index"]: line for line in map(json.loads, response.text.splitlines())}
+
+    assert "coordinates" in lines[0] and "polyline" not in lines[0]
+    assert "polyline" in lines[1] and "coordinates" not in lines[1]
+
+
+@pytest.mark.anyio
+async def test_batch_items_wait_for_graph_routing_slots(api, monkeypatch):
+    from app.utils.executors import scoring_executor
+    from app.utils.graph_router import graph_router
+
+    def route_paths(src_lat, src_lng, dest_lat, dest_lng, time_of_day, mode):
+        time.sleep(0.02)
+        return [{**generate_mock_route(src_lat, src_lng, dest_lat, dest_lng), "description": "Graph route"}]
+
+    monkeypatch.setattr(graph_router, "loaded", True)
+    monkeypatch.setattr(routes, "route_paths", route_paths)
+    # Far fewer slots than concurrent batch items
+    monkeypatch.setattr(scoring_executor, "max_pending", 1)
+    body = batch(6)
+    body["routes"][2]["dest_lng"] = 77.21
+    body["concurrency"] = 6
+    rejected = scoring_executor.metrics()["rejected"]
+
+    response = await api.post("/routes/calculate/batch", json=body)
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == list(range(6))
+    assert [line for line in lines if "error" in line] == []
+    assert scoring_executor.metrics()["rejected"] == rejected
@@ -0,0 +1,75 @@
+import io
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+import pytest
+from app.utils import local_time
+from app.utils.crime_ingest import _parse_date, _parse_date_string, ingest
+from tests.conftest import sign_in
+
+KOLKATA = ZoneInfo("Asia/Kolkata")
+
+
+def test_offset_timestamps_are_converted_to_utc():
+    assert _parse_date_string("2024-01-01T10:00:00+05:30") == datetime(2024, 1, 1, 4, 30)
+    assert _parse_date_string("2024-01-01T10:00:00Z") == datetime(2024, 1, 1, 10, 0)
+    assert _parse_date_string("2024-01-01 10:00:00", timezone.utc) == datetime(2024, 1, 1, 10, 0)
+    # An explicit offset wins over the local timezone
+    assert _parse_date_string("2024-01-01T10:00:00Z", KOLKATA) == datetime(2024, 1, 1, 10, 0)
+
+
+def test_naive_timestamps_are_local_times():
+    assert _parse_date_string("2024-01-01 10:00:00", KOLKATA) == datetime(2024, 1, 1, 4, 30)
+    assert _parse_date_string("01/15/2024 11:30:00 PM", KOLKATA) == datetime(2024, 1, 15, 18, 0)
+    assert _parse_date_string("15/01/2024 01:00", KOLKATA) == datetime(2024, 1, 14, 19, 30)
+    assert _parse_date(datetime(2024, 1, 1, 10, 0), KOLKATA) == datetime(2024, 1, 1, 4, 30)
+
+
+def test_aware_datetimes_are_converted_to_utc():
+    ist = timezone(timedelta(hours=5, minutes=30))
+    assert _parse_date(datetime(2024, 1, 1, 10, 0, tzinfo=ist)) == datetime(2024, 1, 1, 4, 30)
+
+
+@pytest.mark.anyio
+async def test_ingest_stores_utc(mock_db):
+    stream = io.StringIO("lat,lng,type,date\n28.61,77.2,theft,2024-01-01T10:00:00+05:30\n")
+    report = await ingest(mock_db.crime_data, stream, "csv")
+    assert report["inserted"] == 1
+    crime = await mock_db.crime_data.find_one()
+    assert crime["reported_at"] == datetime(2024, 1, 1, 4, 30)
+
+
+@pytest.mark.anyio
+async def test_ingest_reads_naive_timestamps_on_the_deployment_timezone(mock_db, monkeypatch):
+    monkeypatch.setattr(local_time, "LOCAL_TIMEZONE", "Asia/Kolkata")
+    stream = io.StringIO("lat,lng,type,date\n28.61,77.2,theft,01/15/2024 11:30:00 PM\n")
+    await ingest(mock_db.crime_data, stream, "csv")
+    crime = await mock_db.crime_data.find_one()
+    assert crime["reported_at"] == datetime(2024, 1, 15, 18, 0)
+
+
+@pytest.mark.anyio
+async def test_ingest_endpoint_takes_a_timezone(api, mock_db):
+    headers = await sign_in(api)
+    await mock_db.users.update_one({"email": "user@example.com"}, {"$set": {"role": "admin"}})
+    files = {"file": ("crimes.csv", b"lat,lng,type,date\n28.61,77.2,theft,2024-01-01 10:00:00\n", "text/csv")}
+
+    response = await api.post("/crime/ingest", params={"tz": "Mars/Olympus"}, files=files, headers=headers)
+    assert response.status_code == 400
+
+    response = await api.post("/crime/ingest", params={"tz": "Asia/Kolkata"}, files=files, headers=headers)
+    assert response.json()["inserted"] == 1
+    crime = await mock_db.crime_data.find_one()
+    assert crime["reported_at"] == datetime(2024, 1, 1, 4, 30)
+
+
+@pytest.mark.anyio
+async def test_ingest_endpoint_requires_admin(api, mock_db):
+    headers = await sign_in(api)
+    files = {"file": ("crimes.csv", b"lat,lng,type,date\n28.61,77.2,theft,2024-01-01\n", "text/csv")}
+    response = await api.post("/crime/ingest", files=files, headers=headers)
+    assert response.status_code == 403
+
+    await mock_db.users.update_one({"email": "user@example.com"}, {"$set": {"role": "admin"}})
+    response = await api.post("/crime/ingest", files=files, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 1
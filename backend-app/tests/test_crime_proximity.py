@@ -0,0 +1,103 @@
+import numpy as np
+from app.utils import crime_proximity
+from app.utils.crime_index import CrimeIndex
+from app.utils.crime_proximity import CrimeArrays, batch_crime_severity, route_crime_hits
+from app.utils.graph_router import haversine_m
+from app.utils.risk_raster import densify
+
+CENTER = (28.6139, 77.2090)
+
+
+def random_crimes(rng, count, spread=0.02):
+    return [
+        {"_id": str(i), "lat": CENTER[0] + rng.uniform(-spread, spread), "lng": CENTER[1] + rng.uniform(-spread, spread),
+         "severity": int(rng.integers(1, 6)), "crime_type": "theft"}
+        for i in range(count)
+    ]
+
+
+def random_route(rng, points, spread=0.02):
+    start = np.array(CENTER) + rng.uniform(-spread, spread, 2)
+    return (start + np.cumsum(rng.normal(0, 0.0005, (points, 2)), axis=0)).tolist()
+
+
+def brute_force_distances(route, crimes):
+    """Haversine distance from every crime to a route resampled every metre"""
+    lats, lngs = densify(route, 1.0)
+    return np.array([haversine_m(lat, lng, lats, lngs).min() for lat, lng in zip(crimes.lat, crimes.lng)])
+
+
+def test_route_hits_match_brute_force_haversine():
+    rng = np.random.default_rng(0)
+    crimes = CrimeArrays.from_records(random_crimes(rng, 1500, spread=0.01))
+    for _ in range(5):
+        route = random_route(rng, 40, spread=0.005)
+        distance = brute_force_distances(route, crimes)
+        hits = route_crime_hits(route, crimes, 200.0)
+
+        # Exact up to the 1 m resampling and the local projection
+        assert hits[distance < 199.0].all()
+        assert not hits[distance > 201.0].any()
+        assert hits.sum() > 0
+
+
+def test_index_query_keeps_every_crime_near_the_route():
+    rng = np.random.default_rng(4)
+    records = random_crimes(rng, 3000, spread=0.03)
+    everything = CrimeArrays.from_records(records)
+    index = CrimeIndex()
+    for crime in records:
+        index.upsert(crime)
+
+    for _ in range(5):
+        route = random_route(rng, 60)
+        nearby = index.query_route(route, 200.0)
+        assert len(nearby) < len(everything)
+        expected = brute_force_distances(route, everything) < 200.0
+        assert nearby.severity[route_crime_hits(route, nearby, 200.0)].sum() == everything.severity[expected].sum()
+
+
+def test_batch_severity_matches_per_route_hits():
+    rng = np.random.default_rng(1)
+    crimes = CrimeArrays.from_records(random_crimes(rng, 3000))
+    routes = [random_route(rng, 200) for _ in range(6)] + [[], [list(CENTER)]]
+
+    totals = batch_crime_severity(routes, crimes, 200.0)
+
+    expected = [crimes.severity[route_crime_hits(route, crimes, 200.0)].sum() for route in routes]
+    assert totals.tolist() == expected
+    assert totals[:6].sum() > 0
+
+
+def test_batch_severity_is_chunk_independent(monkeypatch):
+    rng = np.random.default_rng(2)
+    crimes = CrimeArrays.from_records(random_crimes(rng, 1000))
+    routes = [random_route(rng, 300) for _ in range(4)]
+    expected = batch_crime_severity(routes, crimes, 200.0)
+
+    # Smaller than one route's segment count, so every candidate is its own block
+    monkeypatch.setattr(crime_proximity, "MAX_PAIRS_PER_CHUNK", 50)
+    assert batch_crime_severity(routes, crimes, 200.0).tolist() == expected.tolist()
+
+
+def test_query_routes_skips_the_gap_between_routes():
+    rng = np.random.default_rng(3)
+    index = CrimeIndex()
+    for crime in random_crimes(rng, 2000, spread=0.1):
+        index.upsert(crime)
+    west = [[CENTER[0], CENTER[1] - 0.08], [CENTER[0] + 0.01, CENTER[1] - 0.07]]
+    east = [[CENTER[0], CENTER[1] + 0.07], [CENTER[0] + 0.01, CENTER[1] + 0.08]]
+
+    nearby = index.query_routes([west, east], 200.0)
+    combined = index.query_route(west + east, 200.0)
+
+    assert len(nearby) < len(combined)
+    assert len(nearby) == len(index.query_route(west, 200.0)) + len(index.query_route(east, 200.0))
+    # Nothing the scorer would count is lost
+    for route in (west, east):
+        assert crimes_near(route, nearby) == crimes_near(route, combined)
+
+
+def crimes_near(route, crimes):
+    hits = route_crime_hits(route, crimes, 200.0)
+    return sorted(zip(crimes.lat[hits], crimes.lng[hits]))
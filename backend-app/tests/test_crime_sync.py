@@ -0,0 +1,100 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from app.utils.crime_index import CrimeIndex
+from app.utils.crime_sync import CrimeIndexSync
+
+
+def crime(lat, lng, **fields):
+    return {"_id": ObjectId(), "lat": lat, "lng": lng, "crime_type": "theft", "severity": 2,
+            "reported_at": datetime(2026, 10, 1), **fields}
+
+
+def indexed(index):
+    return sorted((record["_id"], record["lat"], record["lng"]) for record in index.query_bbox(-90, -180, 90, 180))
+
+
+@pytest.fixture
+def sync():
+    sync = CrimeIndexSync(CrimeIndex(), poll_interval=0.01)
+    sync.moved = []
+
+    async def listener(lat, lng):
+        sync.moved.append((lat, lng))
+
+    sync.listeners.append(listener)
+    return sync
+
+
+@pytest.mark.anyio
+async def test_change_events_keep_index_in_step(sync):
+    first, second = crime(28.61, 77.20), crime(28.62, 77.21)
+    for doc in (first, second):
+        await sync.apply_change({"operationType": "insert", "documentKey": {"_id": doc["_id"]}, "fullDocument": doc})
+    assert indexed(sync.index) == sorted([(str(first["_id"]), 28.61, 77.20), (str(second["_id"]), 28.62, 77.21)])
+
+    # A move notifies both the old and the new location
+    moved = {**first, "lat": 28.70, "lng": 77.30}
+    await sync.apply_change({"operationType": "update", "documentKey": {"_id": first["_id"]}, "fullDocument": moved})
+    assert sync.index.query_bbox(28.60, 77.19, 28.615, 77.205) == []
+    assert sync.moved[-2:] == [(28.61, 77.20), (28.70, 77.30)]
+
+    await sync.apply_change({"operationType": "delete", "documentKey": {"_id": second["_id"]}})
+    assert indexed(sync.index) == [(str(first["_id"]), 28.70, 77.30)]
+    assert sync.moved[-1] == (28.62, 77.21)
+
+    # Deleted before the update lookup ran
+    await sync.apply_change({"operationType": "update", "documentKey": {"_id": first["_id"]}, "fullDocument": None})
+    assert len(sync.index) == 0
+    assert sync.metrics()["applied"] == {"insert": 2, "update": 2, "delete": 1}
+
+
+@pytest.mark.anyio
+async def test_unknown_events_are_ignored(sync):
+    await sync.apply_change({"operationType": "invalidate"})
+    assert sync.metrics()["applied"] == {"insert": 0, "update": 0, "delete": 0}
+    assert sync.moved == []
+
+
+@pytest.mark.anyio
+async def test_polling_picks_up_new_incidents(mock_db, sync):
+    existing = crime(28.61, 77.20)
+    await mock_db.crime_data.insert_one(existing)
+    await sync.index.load(mock_db.crime_data)
+
+    task = asyncio.create_task(sync._poll(mock_db.crime_data))
+    try:
+        later = crime(28.63, 77.22, reported_at=existing["reported_at"] + timedelta(hours=1))
+        same_time = crime(28.64, 77.23)
+        await mock_db.crime_data.insert_many([later, same_time])
+        for _ in range(100):
+            if len(sync.index) == 3:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    assert sync.mode == "polling"
+    assert indexed(sync.index) == sorted(
+        (str(doc["_id"]), doc["lat"], doc["lng"]) for doc in (existing, later, same_time)
+    )
+    assert (28.63, 77.22) in sync.moved and (28.64, 77.23) in sync.moved
+
+
+@pytest.mark.anyio
+async def test_incidents_without_location_get_one(mock_db, sync):
+    sync.collection = mock_db.crime_data
+    bare = crime(28.61, 77.20)
+    await mock_db.crime_data.insert_one(bare)
+    await sync.apply_change({"operationType": "insert", "documentKey": {"_id": bare["_id"]}, "fullDocument": bare})
+    stored = await mock_db.crime_data.find_one({"_id": bare["_id"]})
+    assert stored["location"] == {"type": "Point", "coordinates": [77.20, 28.61]}
+
+    # Moved by a writer that left the old location behind
+    await mock_db.crime_data.update_one({"_id": bare["_id"]}, {"$set": {"lat": 28.70, "lng": 77.30}})
+    moved = await mock_db.crime_data.find_one({"_id": bare["_id"]})
+    await sync.apply_change({"operationType": "update", "documentKey": {"_id": bare["_id"]}, "fullDocument": moved})
+    stored = await mock_db.crime_data.find_one({"_id": bare["_id"]})
+    assert stored["location"] == {"type": "Point", "coordinates": [77.30, 28.70]}
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+import pytest
+from app.utils import db_indexes
+from app.utils.db_indexes import apply_migration, assert_query_plans
+
+
+@pytest.mark.anyio
+async def test_migrations_run_once(mock_db):
+    await mock_db.crime_data.insert_many([
+        {"lat": 28.61, "lng": 77.20, "severity": 2},
+        {"lat": 28.62, "lng": 77.21, "location": {"type": "Point", "coordinates": [77.21, 28.62]}}
+    ])
+    assert await apply_migration(mock_db, "crime_location_v1") == 1
+    assert await mock_db.crime_data.count_documents({"location": {"$exists": False}}) == 0
+
+    # A later start skips the collection scan
+    await mock_db.crime_data.insert_one({"lat": 28.63, "lng": 77.22})
+    assert await apply_migration(mock_db, "crime_location_v1") is None
+    assert await mock_db.crime_data.count_documents({"location": {"$exists": False}}) == 1
+    record = await mock_db.migrations.find_one({"_id": "crime_location_v1"})
+    assert record["modified"] == 1 and record["applied_at"]
+
+
+@pytest.mark.anyio
+async def test_failed_migration_is_retried(mock_db, monkeypatch):
+    from pymongo.errors import PyMongoError
+
+    async def broken(database):
+        raise PyMongoError("interrupted")
+
+    monkeypatch.setitem(db_indexes.MIGRATIONS, "crime_location_v1", broken)
+    with pytest.raises(PyMongoError):
+        await apply_migration(mock_db, "crime_location_v1")
+    assert await mock_db.migrations.count_documents({}) == 0
+
+
+@pytest.mark.anyio
+async def test_claim_is_released_on_any_error(mock_db, monkeypatch):
+    async def buggy(database):
+        raise KeyError("location")
+
+    monkeypatch.setitem(db_indexes.MIGRATIONS, "crime_location_v1", buggy)
+    with pytest.raises(KeyError):
+        await apply_migration(mock_db, "crime_location_v1")
+    assert await mock_db.migrations.count_documents({}) == 0
+
+
+@pytest.mark.anyio
+async def test_expired_claims_are_taken_over(mock_db):
+    await mock_db.crime_data.insert_one({"lat": 28.61, "lng": 77.20})
+    # A worker that claimed the migration is still within its lease
+    await mock_db.migrations.insert_one({"_id": "crime_location_v1", "started_at": datetime.utcnow() - timedelta(seconds=30)})
+    assert await apply_migration(mock_db, "crime_location_v1", lease_seconds=60) is None
+
+    # One that died mid-run leaves a claim older than the lease
+    await mock_db.migrations.update_one(
+        {"_id": "crime_location_v1"},
+        {"$set": {"started_at": datetime.utcnow() - timedelta(seconds=120)}}
+    )
+    assert await apply_migration(mock_db, "crime_location_v1", lease_seconds=60) == 1
+    record = await mock_db.migrations.find_one({"_id": "crime_location_v1"})
+    assert record["modified"] == 1 and record["applied_at"]
+
+    # Applied migrations are never taken over, however old
+    await mock_db.migrations.update_one({"_id": "crime_location_v1"}, {"$set": {"started_at": datetime(2000, 1, 1)}})
+    assert await apply_migration(mock_db, "crime_location_v1", lease_seconds=60) is None
+
+
+class ExplainedCursor:
+    def __init__(self, plan):
+        self.plan = plan
+
+    async def explain(self):
+        return {"queryPlanner": {"winningPlan": self.plan}}
+
+
+@pytest.mark.anyio
+async def test_query_plans_fail_on_collection_scans(monkeypatch):
+    index_scan = {"stage": "LIMIT", "inputStage": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "email_unique"}}}
+    collection_scan = {"stage": "SORT", "inputStage": {"stage": "COLLSCAN", "direction": "forward"}}
+
+    monkeypatch.setattr(db_indexes, "hot_queries", lambda database: {"users by email": ExplainedCursor(index_scan)})
+    await assert_query_plans(None)
+
+    monkeypatch.setattr(db_indexes, "hot_queries", lambda database: {
+        "users by email": ExplainedCursor(index_scan),
+        "sos history": ExplainedCursor(collection_scan),
+        "crime bbox": ExplainedCursor({"stage": "SHARDING_FILTER", "inputStages": [index_scan, collection_scan]})
+    })
+    with pytest.raises(RuntimeError, match="sos history, crime bbox"):
+        await assert_query_plans(None)
@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import pytest
+from app.routes import routes
+from app.utils.executors import BoundedExecutor, ExecutorSaturated, scoring_executor
+from app.utils.map_utils import generate_mock_route
+from app.utils.route_cache import route_cache
+
+
+@pytest.fixture
+async def executor():
+    executor = BoundedExecutor("test", max_workers=2, max_pending=2)
+    yield executor
+    executor.shutdown()
+
+
+async def occupy(executor, count):
+    """Start count jobs that block until the returned event is set"""
+    release = threading.Event()
+    jobs = [asyncio.create_task(executor.run(release.wait, 5)) for _ in range(count)]
+    while executor.pending < count:
+        await asyncio.sleep(0.001)
+    return release, jobs
+
+
+@pytest.mark.anyio
+async def test_saturated_executor_rejects(executor):
+    release, jobs = await occupy(executor, 2)
+    with pytest.raises(ExecutorSaturated):
+        await executor.run(sum, [1, 2])
+    assert executor.metrics()["rejected"] == 1
+
+    release.set()
+    await asyncio.gather(*jobs)
+    assert await executor.run(sum, [1, 2]) == 3
+    assert executor.metrics()["pending"] == 0
+
+
+@pytest.mark.anyio
+async def test_bulk_callers_wait_for_a_slot(executor):
+    release, jobs = await occupy(executor, 2)
+    waiting = asyncio.create_task(executor.run(sum, [1, 2], wait=True))
+    await asyncio.sleep(0.05)
+    assert not waiting.done()
+
+    release.set()
+    assert await waiting == 3
+    await asyncio.gather(*jobs)
+    assert executor.metrics()["rejected"] == 0
+
+
+@pytest.mark.anyio
+async def test_waiting_gives_up_after_timeout(executor):
+    release, jobs = await occupy(executor, 2)
+    with pytest.raises(ExecutorSaturated):
+        await executor.run(sum, [1, 2], wait=True, timeout=0.05)
+    assert executor.metrics()["rejected"] == 1
+
+    waiting = asyncio.create_task(executor.run(sum, [1, 2], wait=True, timeout=5))
+    await asyncio.sleep(0.02)
+    release.set()
+    assert await waiting == 3
+    await asyncio.gather(*jobs)
+
+
+@pytest.mark.anyio
+async def test_waiters_are_served_in_arrival_order(executor):
+    release, jobs = await occupy(executor, 2)
+    served = []
+    waiting = []
+    for i in range(4):
+        waiting.append(asyncio.create_task(executor.run(served.append, i, wait=True)))
+        await asyncio.sleep(0)
+    assert executor.metrics()["waiting"] == 4
+
+    release.set()
+    await asyncio.gather(*jobs, *waiting)
+    assert served == [0, 1, 2, 3]
+    assert executor.metrics()["waiting"] == 0
+
+
+@pytest.mark.anyio
+async def test_waiter_queue_is_bounded():
+    executor = BoundedExecutor("test", max_workers=1, max_pending=1, max_waiters=1)
+    try:
+        release, jobs = await occupy(executor, 1)
+        waiting = asyncio.create_task(executor.run(sum, [1, 2], wait=True))
+        await asyncio.sleep(0)
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(sum, [1, 2], wait=True)
+
+        # A waiter that gives up leaves the queue
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert executor.metrics()["waiting"] == 0
+        release.set()
+        await asyncio.gather(*jobs)
+        assert await executor.run(sum, [1, 2], wait=True) == 3
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.anyio
+async def test_cancelled_callers_hold_their_slot_until_the_job_ends(executor):
+    release, jobs = await occupy(executor, 2)
+    jobs[0].cancel()
+    await asyncio.gather(jobs[0], return_exceptions=True)
+
+    # The job keeps a pool thread busy, so its slot is not free yet
+    assert executor.metrics()["pending"] == 2
+    with pytest.raises(ExecutorSaturated):
+        await executor.run(sum, [1, 2])
+
+    release.set()
+    await jobs[1]
+    while executor.metrics()["pending"]:
+        await asyncio.sleep(0.001)
+    assert await executor.run(sum, [1, 2]) == 3
+
+
+@pytest.mark.anyio
+async def test_failed_jobs_are_not_counted_as_completed(executor):
+    with pytest.raises(ZeroDivisionError):
+        await executor.run(divmod, 1, 0)
+    assert await executor.run(sum, [1, 2]) == 3
+    metrics = executor.metrics()
+    assert (metrics["completed"], metrics["failed"], metrics["pending"]) == (1, 1, 0)
+
+
+@pytest.mark.anyio
+async def test_calculate_returns_429_when_scoring_is_saturated(api, monkeypatch):
+    async def fetch_route(route_request, time_of_day):
+        return generate_mock_route(route_request.source_lat, route_request.source_lng,
+                                   route_request.dest_lat, route_request.dest_lng), []
+
+    monkeypatch.setattr(routes, "_fetch_route", fetch_route)
+    monkeypatch.setattr(scoring_executor, "max_pending", 0)
+    route_cache.local.clear()
+
+    response = await api.post("/routes/calculate", json={
+        "source_lat": 28.6139, "source_lng": 77.2090, "dest_lat": 28.6239, "dest_lng": 77.2190
+    })
+    assert response.status_code == 429
@@ -0,0 +1,151 @@
+import heapq
+import math
+import numpy as np
+import pytest
+from app.utils.graph_router import GraphRouter, build_graph, haversine_m
+from app.utils.risk_raster import TIME_BUCKETS
+from app.utils.safety_scoring import scorer
+
+# A 3x3 grid of residential streets about 110 m apart
+GRID_OSM = """<?xml version="1.0"?>
+<osm version="0.6">
+{nodes}
+{ways}
+</osm>
+"""
+
+
+def grid_osm(path):
+    nodes = [
+        f'<node id="{r * 3 + c + 1}" lat="{28.6 + r * 0.001}" lon="{77.2 + c * 0.001}"/>'
+        for r in range(3) for c in range(3)
+    ]
+    ways, way_id = [], 100
+    for line in [[1, 2, 3], [4, 5, 6], [7, 8, 9], [1, 4, 7], [2, 5, 8], [3, 6, 9]]:
+        refs = "".join(f'<nd ref="{ref}"/>' for ref in line)
+        ways.append(f'<way id="{way_id}">{refs}<tag k="highway" v="residential"/></way>')
+        way_id += 1
+    path.write_text(GRID_OSM.format(nodes="\n".join(nodes), ways="\n".join(ways)))
+    return str(path)
+
+
+@pytest.fixture
+def graph_path(tmp_path):
+    out = str(tmp_path / "graph.npz")
+    build_graph(grid_osm(tmp_path / "grid.osm"), out, "foot")
+    return out
+
+
+def load(path, **kwargs):
+    router = GraphRouter(**kwargs)
+    router.load(path, scorer.road_safety, scorer.time_risk)
+    return router
+
+
+def test_routes_within_snap_distance(graph_path):
+    paths = load(graph_path).route(28.6001, 77.2001, 28.6019, 77.2021, "day", "walk")
+    assert paths
+    assert paths[0]["coordinates"][0] == [28.6, 77.2]
+    assert paths[0]["coordinates"][-1] == [28.602, 77.202]
+
+
+def test_no_paths_for_points_off_the_graph(graph_path):
+    router = load(graph_path)
+    # About 1.1 km north of the grid
+    assert router.route(28.6120, 77.2010, 28.6, 77.2, "day", "walk") == []
+    assert router.route(28.6, 77.2, 28.6120, 77.2010, "day", "walk") == []
+    # A larger limit snaps it again
+    assert load(graph_path, max_snap_m=2000).route(28.6120, 77.2010, 28.6, 77.2, "day", "walk")
+
+
+def test_no_paths_for_other_modes(graph_path):
+    router = load(graph_path)
+    assert router.profile == "foot"
+    assert router.route(28.6, 77.2, 28.602, 77.202, "day", "car") == []
+    assert router.route(28.6, 77.2, 28.602, 77.202, "day", "bike") == []
+
+
+def test_graph_without_stored_profile_is_foot(graph_path, tmp_path):
+    data = dict(np.load(graph_path))
+    del data["profile"]
+    legacy = str(tmp_path / "legacy.npz")
+    np.savez(legacy, **data)
+
+    router = load(legacy)
+    assert router.profile == "foot"
+    assert router.route(28.6, 77.2, 28.602, 77.202, "day", "walk")
+
+
+def random_graph(path, size=6, seed=3):
+    """size x size grid of two-way streets with uneven lengths, crime and lighting"""
+    rng = np.random.default_rng(seed)
+    rows, cols = np.divmod(np.arange(size * size), size)
+    node_lat = 28.6 + rows * 0.001 + rng.uniform(-0.0003, 0.0003, size * size)
+    node_lng = 77.2 + cols * 0.001 + rng.uniform(-0.0003, 0.0003, size * size)
+    right, up = np.flatnonzero(cols < size - 1), np.flatnonzero(rows < size - 1)
+    a, b = np.concatenate([right, up]), np.concatenate([right + 1, up + size])
+    src, dst = np.concatenate([a, b]), np.concatenate([b, a])
+    order = np.argsort(src, kind="stable")
+    src, dst = src[order], dst[order]
+    class_names = np.array(["isolated", "main_road", "market", "residential"])
+    np.savez(
+        path,
+        node_lat=node_lat,
+        node_lng=node_lng,
+        indptr=np.concatenate([[0], np.cumsum(np.bincount(src, minlength=size * size))]).astype(np.int64),
+        indices=dst.astype(np.int32),
+        length=haversine_m(node_lat[src], node_lng[src], node_lat[dst], node_lng[dst]).astype(np.float32),
+        road_class=rng.integers(0, len(class_names), len(src)).astype(np.int8),
+        lit=rng.integers(-1, 2, len(src)).astype(np.int8),
+        crime=rng.gamma(1.0, 2.0, (len(TIME_BUCKETS), len(src))).astype(np.float32),
+        class_names=class_names,
+        profile=np.array("foot")
+    )
+    return str(path)
+
+
+def dijkstra(router, source, target, cost):
+    """Plain one-directional Dijkstra over the CSR arrays"""
+    dist, heap = {source: 0.0}, [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if u == target:
+            return d
+        if d > dist[u]:
+            continue
+        for e in range(router.indptr[u], router.indptr[u + 1]):
+            v = int(router.indices[e])
+            if d + cost[e] < dist.get(v, math.inf):
+                dist[v] = d + cost[e]
+                heapq.heappush(heap, (dist[v], v))
+    return math.inf
+
+
+def test_paths_are_optimal_for_their_edge_costs(tmp_path):
+    router = load(random_graph(tmp_path / "random.npz"))
+    nodes = len(router.node_lat)
+    for bucket in ("day", "night"):
+        exposure, min_risk = router._exposure(bucket)
+        for risk_weight in (0.0, 1.5, 5.0):
+            cost = router.length + risk_weight * np.frombuffer(exposure)
+            # Penalties on a few edges, as for a later route preference
+            extra = {e: 0.4 * cost[e] for e in range(0, len(cost), 7)}
+            penalized = cost.copy()
+            penalized[list(extra)] += list(extra.values())
+            for source, target in [(0, nodes - 1), (5, nodes - 6), (nodes // 2, 1), (7, 7 + 2 * 6 + 3)]:
+                for edge_extra, edge_cost in [(None, cost), (extra, penalized)]:
+                    edges = router.shortest_path(source, target, exposure, risk_weight, 1.0 + risk_weight * min_risk, edge_extra)
+                    assert sum(edge_cost[e] for e in edges) == pytest.approx(dijkstra(router, source, target, edge_cost))
+
+
+def test_alternatives_are_distinct(tmp_path):
+    router = load(random_graph(tmp_path / "random.npz"))
+    paths = router.route(28.6, 77.2, 28.605, 77.205, "night", "walk")
+    assert len(paths) >= 2
+    assert [path["type"] for path in paths] == ["fastest", "balanced", "safest"][:len(paths)]
+    routes = [tuple(map(tuple, path["coordinates"])) for path in paths]
+    assert len(set(routes)) == len(routes)
+    # The fastest path is the shortest one on the graph
+    source, target = routes[0][0], routes[0][-1]
+    shortest = dijkstra(router, router.nearest_node(*source), router.nearest_node(*target), router.length)
+    assert paths[0]["distance"] == pytest.approx(shortest)
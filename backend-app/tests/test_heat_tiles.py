@@ -0,0 +1,99 @@
+import asyncio
+import os
+import threading
+import pytest
+from app.utils import heat_tiles as heat_tiles_module
+from app.utils.crime_index import CrimeIndex
+from app.utils.heat_tiles import EMPTY_TILE, HeatTileCache, _world_px
+
+# Tile containing the crimes at zoom 14
+ZOOM = 14
+
+
+def tile_of(lat, lng, zoom=ZOOM):
+    px, py = _world_px(lat, lng, zoom)
+    return zoom, int(px // 256), int(py // 256)
+
+
+def index_with(*crimes):
+    index = CrimeIndex()
+    for i, (lat, lng) in enumerate(crimes):
+        index.upsert({"_id": i, "lat": lat, "lng": lng, "severity": 3})
+    return index
+
+
+@pytest.fixture
+async def tiles(tmp_path):
+    cache = HeatTileCache(index_with((28.6139, 77.2090), (28.6145, 77.2100)), str(tmp_path), invalidate_delay=0.05)
+    await cache.start()
+    yield cache
+    await cache.stop()
+
+
+@pytest.mark.anyio
+async def test_tiles_are_cached_under_the_data_version(tiles, tmp_path):
+    key = tile_of(28.6139, 77.2090)
+    tile = await tiles.get(*key)
+    assert tile != EMPTY_TILE
+    assert os.path.exists(tmp_path / tiles.version / str(ZOOM) / str(key[1]) / f"{key[2]}.png")
+    assert await tiles.get(*key) == tile
+    assert tiles.metrics()["hits"] == 1
+
+
+@pytest.mark.anyio
+async def test_restart_with_other_data_does_not_serve_old_tiles(tiles, tmp_path):
+    key = tile_of(28.6139, 77.2090)
+    before = await tiles.get(*key)
+
+    # Incidents changed while the server was down
+    restarted = HeatTileCache(index_with((28.6139, 77.2090)), str(tmp_path))
+    await restarted.start()
+    assert restarted.version != tiles.version
+    assert await restarted.get(*key) != before
+    assert os.listdir(tmp_path) == [restarted.version]
+
+    # Same data, same version: the disk cache survives the restart
+    again = HeatTileCache(index_with((28.6139, 77.2090)), str(tmp_path))
+    await again.start()
+    assert again.version == restarted.version
+    await again.get(*key)
+    assert again.metrics()["renders"] == 0
+
+
+@pytest.mark.anyio
+async def test_a_burst_of_changes_deletes_tiles_once_off_the_loop(tiles, monkeypatch):
+    key = tile_of(28.6139, 77.2090)
+    far = tile_of(28.70, 77.30)
+    await tiles.get(*key)
+    await tiles.get(*far)
+
+    threads = []
+    remove = os.remove
+
+    def recording_remove(path):
+        threads.append(threading.current_thread())
+        remove(path)
+
+    monkeypatch.setattr(heat_tiles_module.os, "remove", recording_remove)
+    for i in range(50):
+        tiles.index.upsert({"_id": f"new{i}", "lat": 28.6139 + i * 1e-5, "lng": 77.2090, "severity": 5})
+        await tiles.invalidate_point(28.6139 + i * 1e-5, 77.2090)
+    assert threads == []
+
+    await asyncio.sleep(0.1)
+    assert threads and threading.main_thread() not in threads
+    # One attempted removal per distinct tile, not per incident
+    assert len(threads) < 19 * 4
+    assert not os.path.exists(tiles._path(*key))
+    assert os.path.exists(tiles._path(*far))
+    assert tiles.metrics()["pending_invalidations"] == 0
+
+
+@pytest.mark.anyio
+async def test_render_racing_a_change_is_not_cached(tiles):
+    key = tile_of(28.6139, 77.2090)
+    render = asyncio.create_task(tiles.get(*key))
+    await asyncio.sleep(0)  # rendering in its thread
+    await tiles.invalidate_point(28.6139, 77.2090)
+    await render
+    assert not os.path.exists(tiles._path(*key))
@@ -0,0 +1,112 @@
+import random
+import pytest
+from app.utils.db_indexes import crime_location
+from app.utils.hotspots import bbox_geometry, cell_size_deg, hotspot_pipeline, query_hotspots
+
+VIEW = (28.5, 77.0, 28.7, 77.3)
+
+
+class WithoutGeoWithin:
+    """
+    crime_data stand-in: mongomock lacks $geoWithin, so the 2dsphere clause is
+    dropped and the exact lat/lng bounds of the same $match select the view
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def aggregate(self, pipeline, **kwargs):
+        match = dict(pipeline[0]["$match"])
+        assert "$geoWithin" in match.pop("location")
+        return self.collection.aggregate([{"$match": match}] + pipeline[1:])
+
+
+async def seed(mock_db, count=600):
+    rng = random.Random(5)
+    crimes = []
+    for _ in range(count):
+        lat, lng = rng.uniform(28.4, 28.8), rng.uniform(76.9, 77.4)
+        crimes.append({"lat": lat, "lng": lng, "severity": rng.randint(1, 5), "location": crime_location(lat, lng)})
+    # One without a severity counts as 1
+    crimes.append({"lat": 28.6, "lng": 77.1, "location": crime_location(28.6, 77.1)})
+    await mock_db.crime_data.insert_many(crimes)
+    return crimes
+
+
+def expected_cells(crimes, zoom):
+    """Brute-force grid clustering of the crimes in VIEW"""
+    size = cell_size_deg(zoom)
+    sw_lat, sw_lng, ne_lat, ne_lng = VIEW
+    cells = {}
+    for crime in crimes:
+        if sw_lat <= crime["lat"] <= ne_lat and sw_lng <= crime["lng"] <= ne_lng:
+            key = (int(crime["lat"] // size), int(crime["lng"] // size))
+            cells.setdefault(key, []).append(crime)
+    return cells
+
+
+@pytest.mark.anyio
+async def test_incidents_are_clustered_per_grid_cell(mock_db):
+    crimes = await seed(mock_db)
+    result = await query_hotspots(WithoutGeoWithin(mock_db.crime_data), *VIEW, zoom=10, limit=2000)
+    cells = expected_cells(crimes, 10)
+
+    assert result["total_cells"] == result["count"] == len(cells)
+    assert result["total_incidents"] == sum(len(members) for members in cells.values())
+    assert result["next_cursor"] is None
+
+    by_centroid = {(round(spot["lat"], 9), round(spot["lng"], 9)): spot for spot in result["hotspots"]}
+    for members in cells.values():
+        lat = sum(crime["lat"] for crime in members) / len(members)
+        lng = sum(crime["lng"] for crime in members) / len(members)
+        spot = by_centroid[(round(lat, 9), round(lng, 9))]
+        severities = [crime.get("severity", 1) for crime in members]
+        assert (spot["count"], spot["severity"], spot["max_severity"]) == (len(members), sum(severities), max(severities))
+
+
+@pytest.mark.anyio
+async def test_pages_cover_every_cell_once(mock_db):
+    crimes = await seed(mock_db)
+    collection = WithoutGeoWithin(mock_db.crime_data)
+    cells = expected_cells(crimes, 11)
+
+    pages, cursor = [], None
+    while True:
+        page = await query_hotspots(collection, *VIEW, zoom=11, cursor=cursor, limit=25)
+        pages.append(page)
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(pages) == -(-len(cells) // 25)
+    assert all(page["count"] == 25 for page in pages[:-1])
+    # Totals describe the whole view on every page
+    assert {(page["total_cells"], page["total_incidents"]) for page in pages} == {
+        (len(cells), sum(len(members) for members in cells.values()))
+    }
+    hotspots = [spot for page in pages for spot in page["hotspots"]]
+    assert sum(spot["count"] for spot in hotspots) == pages[0]["total_incidents"]
+    assert len({(spot["lat"], spot["lng"]) for spot in hotspots}) == len(cells)
+
+
+@pytest.mark.anyio
+async def test_empty_view(mock_db):
+    await seed(mock_db, 20)
+    result = await query_hotspots(WithoutGeoWithin(mock_db.crime_data), 10.0, 10.0, 10.1, 10.1, zoom=12)
+    assert (result["count"], result["total_incidents"], result["hotspots"], result["next_cursor"]) == (0, 0, [], None)
+
+
+def test_cursor_resumes_after_the_last_cell():
+    first = hotspot_pipeline(*VIEW, zoom=12, after=(5, 7), limit=10)[-1]["$facet"]["cells"][0]
+    assert first == {"$match": {"$or": [{"_id.row": {"$gt": 5}}, {"_id.row": 5, "_id.col": {"$gt": 7}}]}}
+
+
+def test_wide_views_are_split_under_180_degrees():
+    assert bbox_geometry(*VIEW)["type"] == "Polygon"
+    wide = bbox_geometry(-60.0, -170.0, 60.0, 170.0)
+    assert wide["type"] == "MultiPolygon"
+    for polygon in wide["coordinates"]:
+        lngs = [lng for lng, lat in polygon[0]]
+        assert max(lngs) - min(lngs) < 180
+        # Edges are densified to follow the parallels
+        assert max(b - a for a, b in zip(lngs, lngs[1:]) if b > a) <= 1.0
@@ -0,0 +1,83 @@
+import math
+from app.utils.crime_index import CrimeIndex
+from app.utils.crime_proximity import METERS_PER_DEGREE
+from app.utils.journey_monitor import JourneyMonitor
+from app.utils.safety_scoring import SafetyScorer
+
+START = (28.6, 77.2)
+# About 1.1 km due north
+ROUTE = [[28.6, 77.2], [28.605, 77.2], [28.61, 77.2]]
+
+
+def at(north_m: float = 0.0, east_m: float = 0.0):
+    """Position offset in metres from START"""
+    return (
+        START[0] + north_m / METERS_PER_DEGREE,
+        START[1] + east_m / (METERS_PER_DEGREE * math.cos(math.radians(START[0])))
+    )
+
+
+def crime(crime_id, severity, north_m=0.0, east_m=0.0):
+    lat, lng = at(north_m, east_m)
+    return {"_id": crime_id, "lat": lat, "lng": lng, "crime_type": "assault", "severity": severity}
+
+
+def alerts(monitor, *positions):
+    return [[event["alert"] for event in monitor.update(*position)] for position in positions]
+
+
+def test_deviation_needs_two_consecutive_fixes():
+    # deviation_threshold_m is 100 m
+    monitor = JourneyMonitor(ROUTE, START, SafetyScorer(), CrimeIndex())
+    assert alerts(monitor, at(200, 150), at(250, 0), at(300, 150)) == [[], [], []]
+    assert alerts(monitor, at(350, 150), at(400, 300)) == [["route_deviation"], []]
+    assert monitor.off_route
+
+
+def test_back_on_route_clears_below_the_hysteresis_band():
+    monitor = JourneyMonitor(ROUTE, START, SafetyScorer(), CrimeIndex())
+    alerts(monitor, at(200, 150), at(250, 150))
+    # Within the 100 m threshold but not under 80 m stays off route
+    assert alerts(monitor, at(300, 90), at(350, 85)) == [[], []]
+    assert monitor.off_route
+    assert alerts(monitor, at(400, 70), at(450, 0)) == [["back_on_route"], []]
+    assert not monitor.off_route
+
+
+def test_risk_zone_enter_and_leave_with_hysteresis():
+    # risk_zone_threshold is 8 within crime_radius_m (200 m); assault weighs severity x 1.0
+    index = CrimeIndex()
+    for c in [crime("a", 4, 300), crime("b", 4, 300), crime("c", 5, 700), crime("d", 2, 700)]:
+        index.upsert(c)
+    monitor = JourneyMonitor(ROUTE, START, SafetyScorer(), index)
+
+    assert alerts(monitor, at(0)) == [[]]
+    events = monitor.update(*at(300))
+    assert [(event["alert"], event["exposure"]) for event in events] == [("risk_zone_entered", 8.0)]
+    # 7 is under the threshold but above 80% of it
+    assert alerts(monitor, at(550)) == [[]]
+    assert monitor.in_risk_zone
+    assert alerts(monitor, at(1000)) == [["risk_zone_left"]]
+    assert alerts(monitor, at(1050)) == [[]]
+
+
+def test_journey_without_route_only_checks_risk():
+    index = CrimeIndex()
+    index.upsert(crime("a", 5, 0, 2000))
+    index.upsert(crime("b", 5, 0, 2000))
+    monitor = JourneyMonitor(None, START, SafetyScorer(), index)
+    assert monitor.route is None
+    assert alerts(monitor, at(0), at(0, 1000), at(0, 1500)) == [[], [], []]
+    assert alerts(monitor, at(0, 2000)) == [["risk_zone_entered"]]
+
+
+def test_crimes_reported_mid_journey_count():
+    index = CrimeIndex()
+    monitor = JourneyMonitor(ROUTE, START, SafetyScorer(), index)
+    assert alerts(monitor, at(300)) == [[]]
+
+    index.upsert(crime("a", 5, 300))
+    index.upsert(crime("b", 5, 300))
+    assert alerts(monitor, at(300)) == [["risk_zone_entered"]]
+    index.remove("a")
+    assert alerts(monitor, at(300)) == [["risk_zone_left"]]
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import pytest
+from passlib.hash import bcrypt
+from app.routes.auth import BCRYPT_ROUNDS
+from app.utils.executors import hashing_executor
+from tests.conftest import sign_in
+
+
+async def login(api, password, email="user@example.com"):
+    return await api.post("/auth/login", data={"username": email, "password": password})
+
+
+@pytest.mark.anyio
+async def test_signup_and_login_hash_on_the_executor(mock_db, api, monkeypatch):
+    threads = []
+    run = hashing_executor.run
+
+    async def recording_run(fn, *args, **kwargs):
+        def job(*job_args):
+            threads.append(threading.current_thread().name)
+            return fn(*job_args)
+        return await run(job, *args, **kwargs)
+
+    monkeypatch.setattr(hashing_executor, "run", recording_run)
+    await sign_in(api)
+
+    assert len(threads) == 2  # hash at signup, verify at login
+    assert all(name.startswith("hashing") for name in threads)
+    user = await mock_db.users.find_one({"email": "user@example.com"})
+    assert bcrypt.identify(user["hashed_password"])
+    assert "correct-horse" not in user["hashed_password"]
+
+
+@pytest.mark.anyio
+async def test_wrong_password_and_unknown_user_are_rejected(mock_db, api):
+    await sign_in(api)
+    for response in (await login(api, "wrong"), await login(api, "correct-horse", email="nobody@example.com")):
+        assert response.status_code == 401
+        assert response.json()["detail"] == "Incorrect email or password"
+
+
+@pytest.mark.anyio
+async def test_users_without_a_password_hash_cannot_log_in(mock_db, api):
+    await mock_db.users.insert_one({"email": "user@example.com", "name": "Legacy"})
+    assert (await login(api, "anything")).status_code == 401
+
+
+@pytest.mark.anyio
+async def test_hashes_with_other_rounds_are_upgraded_on_login(mock_db, api):
+    await sign_in(api)
+    old_hash = bcrypt.using(rounds=BCRYPT_ROUNDS + 1).hash("correct-horse")
+    await mock_db.users.update_one({"email": "user@example.com"}, {"$set": {"hashed_password": old_hash}})
+
+    assert (await login(api, "correct-horse")).status_code == 200
+    upgraded = (await mock_db.users.find_one({"email": "user@example.com"}))["hashed_password"]
+    assert upgraded != old_hash
+    assert bcrypt.verify("correct-horse", upgraded)
+    assert f"${BCRYPT_ROUNDS:02d}$" in upgraded
+
+    # Already current: left alone
+    assert (await login(api, "correct-horse")).status_code == 200
+    assert (await mock_db.users.find_one({"email": "user@example.com"}))["hashed_password"] == upgraded
+
+
+@pytest.mark.anyio
+async def test_failed_login_does_not_upgrade(mock_db, api):
+    await sign_in(api)
+    old_hash = bcrypt.using(rounds=BCRYPT_ROUNDS + 1).hash("correct-horse")
+    await mock_db.users.update_one({"email": "user@example.com"}, {"$set": {"hashed_password": old_hash}})
+
+    assert (await login(api, "wrong")).status_code == 401
+    assert (await mock_db.users.find_one({"email": "user@example.com"}))["hashed_password"] == old_hash
+
+
+@pytest.mark.anyio
+async def test_login_waits_for_a_hashing_slot(mock_db, api, monkeypatch):
+    from app.routes import auth
+    await sign_in(api)
+    monkeypatch.setattr(hashing_executor, "max_pending", 1)
+    release = threading.Event()
+    busy = asyncio.create_task(hashing_executor.run(release.wait, 5))
+    await asyncio.sleep(0.01)
+
+    monkeypatch.setattr(auth, "HASH_WAIT_SECONDS", 0.05)
+    response = await login(api, "correct-horse")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+
+    # A slot that frees up within the wait is taken instead
+    monkeypatch.setattr(auth, "HASH_WAIT_SECONDS", 5)
+    asyncio.get_running_loop().call_later(0.05, release.set)
+    assert (await login(api, "correct-horse")).status_code == 200
+    await busy
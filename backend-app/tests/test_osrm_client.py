@@ -0,0 +1,97 @@
+import asyncio
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from app.utils.map_utils import OSRMClient
+
+
+@pytest.fixture
+async def osrm():
+    """Stub OSRM server counting upstream calls; routes to lng 0 fail"""
+    calls = []
+
+    async def route(request):
+        calls.append(request.match_info["coords"])
+        await asyncio.sleep(0.05)
+        (src_lng, src_lat), (dest_lng, dest_lat) = [
+            map(float, point.split(",")) for point in request.match_info["coords"].split(";")
+        ]
+        if dest_lng == 0:
+            return web.json_response({"code": "NoRoute", "routes": []})
+        return web.json_response({"code": "Ok", "routes": [{
+            "distance": 1000.0, "duration": 700.0,
+            "geometry": {"type": "LineString", "coordinates": [[src_lng, src_lat], [dest_lng, dest_lat]]}
+        }]})
+
+    app = web.Application()
+    app.router.add_get("/route/v1/{profile}/{coords}", route)
+    server = TestServer(app)
+    await server.start_server()
+    client = OSRMClient(base_url=str(server.make_url("")), timeout=2)
+    client.calls = calls
+    yield client
+    await client.close()
+    await server.close()
+
+
+@pytest.mark.anyio
+async def test_identical_requests_share_one_upstream_call(osrm):
+    results = await asyncio.gather(*[osrm.route(28.6, 77.2, 28.7, 77.3, "foot") for _ in range(5)])
+    assert len(osrm.calls) == 1
+    assert all(result == results[0] for result in results)
+    assert results[0]["coordinates"] == [[28.6, 77.2], [28.7, 77.3]]
+    assert osrm.in_flight == {}
+
+
+@pytest.mark.anyio
+async def test_different_requests_each_go_upstream(osrm):
+    await asyncio.gather(
+        osrm.route(28.6, 77.2, 28.7, 77.3, "foot"),
+        osrm.route(28.6, 77.2, 28.7, 77.3, "car"),
+        osrm.route(28.6, 77.2, 28.8, 77.3, "foot")
+    )
+    assert len(osrm.calls) == 3
+
+
+@pytest.mark.anyio
+async def test_finished_requests_are_not_reused(osrm):
+    await osrm.route(28.6, 77.2, 28.7, 77.3, "foot")
+    await osrm.route(28.6, 77.2, 28.7, 77.3, "foot")
+    assert len(osrm.calls) == 2
+
+
+@pytest.mark.anyio
+async def test_no_route_is_shared_as_none(osrm):
+    results = await asyncio.gather(*[osrm.route(28.6, 77.2, 28.7, 0, "foot") for _ in range(3)])
+    assert results == [None, None, None]
+    assert len(osrm.calls) == 1
+
+
+@pytest.mark.anyio
+async def test_failures_reach_every_joined_caller():
+    client = OSRMClient(base_url="http://127.0.0.1:9", timeout=1)
+    try:
+        results = await asyncio.gather(
+            *[client.route(28.6, 77.2, 28.7, 77.3, "foot") for _ in range(3)], return_exceptions=True
+        )
+    finally:
+        await client.close()
+    assert all(isinstance(result, Exception) for result in results)
+    assert client.in_flight == {}
+
+
+@pytest.mark.anyio
+async def test_cancelled_leader_hands_over_to_joined_callers(osrm):
+    leader = asyncio.create_task(osrm.route(28.6, 77.2, 28.7, 77.3, "foot"))
+    await asyncio.sleep(0.01)
+    followers = [asyncio.create_task(osrm.route(28.6, 77.2, 28.7, 77.3, "foot")) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    results = await asyncio.gather(*followers)
+    assert leader.cancelled()
+    assert results[0]["coordinates"] == [[28.6, 77.2], [28.7, 77.3]]
+    assert all(result == results[0] for result in results)
+    # One follower took over and the others joined it
+    assert len(osrm.calls) == 2
+    assert osrm.in_flight == {}
@@ -0,0 +1,119 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import numpy as np
+import pytest
+from app.utils.graph_router import haversine_m
+from app.utils.risk_raster import RiskRaster, TIME_BUCKETS, build_risk_raster, save_risk_raster
+from app.utils.safety_scoring import SafetyScorer
+
+CENTER = (28.6139, 77.2090)
+BOUNDS = (CENTER[0] - 0.02, CENTER[1] - 0.02, CENTER[0] + 0.02, CENTER[1] + 0.02)
+
+
+def crimes_around(rng, center, count, spread):
+    return [
+        {"lat": center[0] + rng.uniform(-spread, spread), "lng": center[1] + rng.uniform(-spread, spread),
+         "severity": int(rng.integers(1, 6)), "crime_type": rng.choice(["theft", "assault", "harassment"]),
+         "reported_at": None}
+        for _ in range(count)
+    ]
+
+
+def saved_raster(tmp_path, crimes, scorer):
+    grid, meta = build_risk_raster(crimes, BOUNDS, scorer.crime_weights, scorer.time_risk)
+    path = str(tmp_path / "risk.bin")
+    save_risk_raster(path, grid, meta)
+    return RiskRaster.load(path)
+
+
+def test_cell_values_match_brute_force_radius_sums(tmp_path):
+    rng = np.random.default_rng(0)
+    scorer = SafetyScorer()
+    crimes = crimes_around(rng, CENTER, 400, 0.01)
+    raster = saved_raster(tmp_path, crimes, scorer)
+
+    lat = np.array([crime["lat"] for crime in crimes])
+    lng = np.array([crime["lng"] for crime in crimes])
+    weight = np.array([crime["severity"] * scorer.crime_weights[crime["crime_type"]] for crime in crimes])
+    # A crime is placed in its cell, so it may count from up to one cell diagonal further or nearer
+    slack = raster.cell_m * np.sqrt(2)
+
+    rows = rng.integers(0, raster.rows, 200)
+    cols = rng.integers(0, raster.cols, 200)
+    centre_lat = raster.south + (rows + 0.5) * raster.cell_lat
+    centre_lng = raster.west + (cols + 0.5) * raster.cell_lng
+    for bucket in TIME_BUCKETS:
+        sampled = raster.sample(centre_lat, centre_lng, bucket)
+        for value, clat, clng in zip(sampled, centre_lat, centre_lng):
+            distance = haversine_m(clat, clng, lat, lng)
+            risk = scorer.time_risk[bucket]
+            assert weight[distance < 200 - slack].sum() * risk - 1e-3 <= value
+            assert value <= weight[distance <= 200 + slack].sum() * risk + 1e-3
+
+
+def test_raster_ranks_routes_like_the_per_route_scorer(tmp_path):
+    rng = np.random.default_rng(1)
+    scorer = SafetyScorer()
+    hotspot = (CENTER[0] + 0.005, CENTER[1])
+    crimes = crimes_around(rng, hotspot, 300, 0.002) + crimes_around(rng, CENTER, 60, 0.015)
+    raster = saved_raster(tmp_path, crimes, scorer)
+
+    routes = [
+        [[hotspot[0], hotspot[1] - 0.01], [hotspot[0], hotspot[1] + 0.01]],  # straight through the hotspot
+        [[CENTER[0] - 0.005, CENTER[1] - 0.01], [CENTER[0] - 0.005, CENTER[1] + 0.01]],
+        [[CENTER[0] - 0.015, CENTER[1] - 0.01], [CENTER[0] - 0.015, CENTER[1] + 0.01]]
+    ]
+    routes = [np.linspace(start, end, 50).tolist() for start, end in routes]
+
+    per_route = [scorer._analyze_crime_density(route, crimes) for route in routes]
+    scorer.risk_raster = raster
+    from_raster = [scorer._raster_crime_score(route, "night") for route in routes]
+
+    assert np.argsort(per_route).tolist() == np.argsort(from_raster).tolist()
+    assert from_raster[0] < 70 and per_route[0] < 70
+
+
+def test_routes_off_the_raster_use_the_per_route_scorer(tmp_path):
+    rng = np.random.default_rng(2)
+    crimes = crimes_around(rng, CENTER, 200, 0.01)
+    outside = np.linspace([CENTER[0] + 0.05, CENTER[1]], [CENTER[0] + 0.06, CENTER[1] + 0.01], 30).tolist()
+    plain = SafetyScorer()
+    with_raster = SafetyScorer()
+    with_raster.risk_raster = saved_raster(tmp_path, crimes, with_raster)
+
+    assert not with_raster.risk_raster.covers(outside)
+    nearby = crimes + crimes_around(rng, outside[10], 50, 0.001)
+    assert with_raster.calculate_safety_score(outside, nearby, "night") == plain.calculate_safety_score(outside, nearby, "night")
+
+
+def test_hour_of_week_layers_take_the_local_time_risk():
+    scorer = SafetyScorer()
+    kolkata = ZoneInfo("Asia/Kolkata")
+    # Undated incidents land in every layer, so each layer is scaled by its slot's time risk alone
+    grid, meta = build_risk_raster(
+        [{"lat": CENTER[0], "lng": CENTER[1], "severity": 1, "crime_type": "theft", "reported_at": None}],
+        BOUNDS, scorer.crime_weights, scorer.time_risk,
+        slot_hours=3, now=datetime(2026, 10, 14), local_tz=kolkata
+    )
+    raster = RiskRaster(grid, meta)
+
+    def risk(when):
+        return raster.sample(np.array([CENTER[0]]), np.array([CENTER[1]]), "day", when)[0]
+
+    # 22:00 in India is 16:30 UTC, in the 15-18 UTC slot
+    night = risk(datetime(2026, 10, 14, 22, 0, tzinfo=kolkata))
+    noon = risk(datetime(2026, 10, 14, 12, 0, tzinfo=kolkata))
+    assert night / noon == pytest.approx(scorer.time_risk["night"] / scorer.time_risk["day"])
+    assert meta["timezone"] == "Asia/Kolkata"
+
+
+def test_time_of_day_layers_bucket_incidents_by_local_hour():
+    scorer = SafetyScorer()
+    # 16:30 UTC is 22:00 in India: a night incident, not a daytime one
+    crime = {"lat": CENTER[0], "lng": CENTER[1], "severity": 1, "crime_type": "theft",
+             "reported_at": datetime(2026, 10, 14, 16, 30)}
+    grid, meta = build_risk_raster([crime], BOUNDS, scorer.crime_weights, scorer.time_risk,
+                                   local_tz=ZoneInfo("Asia/Kolkata"))
+    totals = dict(zip(TIME_BUCKETS, grid.sum(axis=(1, 2))))
+    assert totals["night"] > 0
+    assert totals["day"] == totals["evening"] == totals["late_night"] == 0
@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from app.utils import route_cache as route_cache_module
+from app.utils.route_cache import RouteCache
+
+ROUTES = {
+    "north": [[28.70, 77.20], [28.71, 77.21]],
+    "south": [[28.50, 77.20], [28.51, 77.21]],
+    "east": [[28.60, 77.40], [28.61, 77.41]]
+}
+
+
+class CountingCollection:
+    """Wraps a mongomock collection, counting delete_many calls"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.deletes = 0
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def delete_many(self, query):
+        self.deletes += 1
+        return await self.collection.delete_many(query)
+
+
+@pytest.fixture
+async def cache(mock_db):
+    cache = RouteCache(invalidate_delay=0.05)
+    cache.collection = CountingCollection(mock_db.route_cache)
+    for name, coords in ROUTES.items():
+        await cache.set(name, {"name": name}, coords, 200)
+    yield cache
+    await cache.stop()
+
+
+async def shared_keys(cache):
+    return sorted(doc["_id"] for doc in await cache.collection.find({}).to_list(None))
+
+
+@pytest.mark.anyio
+async def test_a_burst_of_changes_is_evicted_in_one_pass(cache, monkeypatch):
+    monkeypatch.setattr(route_cache_module, "INVALIDATE_CHUNK", 50)
+    # An ingest batch: many incidents around the north route, none near the others
+    for i in range(120):
+        await cache.invalidate_point(28.70 + i * 0.00008, 77.20 + i * 0.00008)
+    assert cache.collection.deletes == 0
+    assert cache.metrics()["pending_invalidations"] == 120
+
+    await asyncio.sleep(0.1)
+    assert cache.collection.deletes == 3
+    assert sorted(key for key, _ in cache.local.items()) == ["east", "south"]
+    assert await shared_keys(cache) == ["east", "south"]
+    assert cache.metrics()["pending_invalidations"] == 0
+
+
+@pytest.mark.anyio
+async def test_points_outside_every_route_evict_nothing(cache):
+    await cache.invalidate_point(28.60, 77.20)  # between north and south, west of east
+    await cache.invalidate_point(28.70, 77.40)  # north's latitude, east's longitude
+    await cache.flush_invalidations()
+    assert len(cache.local) == 3
+    assert await shared_keys(cache) == ["east", "north", "south"]
+
+
+@pytest.mark.anyio
+async def test_points_in_separate_bursts_each_evict(cache):
+    await cache.invalidate_point(28.505, 77.205)
+    await asyncio.sleep(0.1)
+    assert await cache.get("south") is None
+
+    await cache.invalidate_point(28.605, 77.405)
+    await asyncio.sleep(0.1)
+    assert await cache.get("east") is None
+    assert await cache.get("north") == {"name": "north"}
+
+
+@pytest.mark.anyio
+async def test_stop_applies_queued_changes(cache):
+    await cache.invalidate_point(28.705, 77.205)
+    await cache.stop()
+    assert cache.local.get("north") is None
+    assert await shared_keys(cache) == ["east", "south"]
@@ -0,0 +1,65 @@
+import time
+import numpy as np
+import pytest
+from app.utils import segment_table as segment_table_module
+from app.utils.graph_router import build_graph
+from app.utils.safety_scoring import SafetyScorer
+from app.utils.segment_table import SegmentTable, build_segment_table, save_segment_table
+from tests.test_graph_router import grid_osm
+
+ROUTE = [[28.6, 77.2], [28.6, 77.201], [28.6, 77.202]]
+CRIMES = [{"lat": 28.6, "lng": 77.201 + i * 0.0001, "crime_type": "assault", "severity": 5} for i in range(10)]
+
+
+def tabled_scorer(tmp_path, crimes=None, name="segments.npz"):
+    scorer = SafetyScorer()
+    graph_path = str(tmp_path / f"graph-{name}")
+    build_graph(grid_osm(tmp_path / "grid.osm"), graph_path, "foot", crimes, scorer.crime_weights, scorer.time_risk)
+    table_path = str(tmp_path / name)
+    save_segment_table(table_path, build_segment_table(graph_path, scorer.road_safety))
+    scorer.load_segment_table(table_path)
+    return scorer
+
+
+def crime_score(scorer):
+    segments = scorer._segment_attributes(ROUTE, "night")
+    assert segments is not None
+    return scorer._precomputed_crime_score(ROUTE, "night", None, segments)
+
+
+def test_table_without_crime_defers_to_live_scoring(tmp_path):
+    scorer = tabled_scorer(tmp_path)
+    assert not scorer.segment_table.crime_fresh()
+    assert crime_score(scorer) is None
+
+    # Road attributes still come from the table; crime from the incidents near the route
+    plain = SafetyScorer()
+    _, warnings = scorer.calculate_safety_score(ROUTE, CRIMES, "night")
+    assert "⚠ High crime density in this area" in warnings
+    assert plain._analyze_crime_density(ROUTE, CRIMES) < 70
+
+
+def test_fresh_crime_layers_are_used(tmp_path):
+    scorer = tabled_scorer(tmp_path, CRIMES)
+    assert scorer.segment_table.crime_fresh()
+    assert crime_score(scorer) < 100
+
+
+def test_stale_crime_layers_are_ignored(tmp_path, monkeypatch):
+    scorer = tabled_scorer(tmp_path, CRIMES)
+    scorer.segment_table.crime_built_at = time.time() - 49 * 3600
+    assert crime_score(scorer) is None
+
+    monkeypatch.setattr(segment_table_module, "CRIME_MAX_AGE_HOURS", 72)
+    assert crime_score(scorer) is not None
+
+
+@pytest.mark.parametrize("crimes, fresh", [(None, False), (CRIMES, True)])
+def test_unstamped_tables_use_crime_only_when_present(tmp_path, crimes, fresh):
+    scorer = tabled_scorer(tmp_path, crimes)
+    with np.load(str(tmp_path / "segments.npz")) as data:
+        legacy = {name: data[name] for name in data.files if name != "crime_built_at"}
+    np.savez(str(tmp_path / "legacy.npz"), **legacy)
+
+    table = SegmentTable.load(str(tmp_path / "legacy.npz"))
+    assert table.crime_fresh() == fresh
@@ -0,0 +1,182 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from app.utils.sos_dispatch import SOSDispatcher, sos_dispatcher
+from tests.conftest import sign_in
+
+
+async def until(predicate, timeout=2.0):
+    """Await predicate() becoming truthy, returning its value"""
+    deadline = time.monotonic() + timeout
+    while True:
+        value = await predicate()
+        if value or time.monotonic() > deadline:
+            return value
+        await asyncio.sleep(0.01)
+
+
+def dispatcher_with(sender, **options) -> SOSDispatcher:
+    options.setdefault("workers", 1)
+    dispatcher = SOSDispatcher(**options)
+    dispatcher.register("sms", sender)
+    return dispatcher
+
+
+async def enqueue_one(mock_db, dispatcher) -> ObjectId:
+    alert_id = (await mock_db.sos_alerts.insert_one({"user_id": "u1", "lat": 28.6, "lng": 77.2})).inserted_id
+    await dispatcher.enqueue(alert_id, [{"channel": "sms", "recipient": "+910000000000", "contact_name": "Asha"}])
+    return alert_id
+
+
+@pytest.mark.anyio
+async def test_enqueue_during_claim_is_not_lost(mock_db):
+    dispatcher = SOSDispatcher(workers=1, poll_interval=5.0)
+    claims = []
+    claimed_again = asyncio.Event()
+
+    async def claim():
+        claims.append(len(claims))
+        if len(claims) == 1:
+            # A job lands after the claim query missed it
+            dispatcher.wake.set()
+        else:
+            claimed_again.set()
+        return None
+
+    dispatcher._claim = claim
+    await dispatcher.start(mock_db)
+    try:
+        await asyncio.wait_for(claimed_again.wait(), timeout=1.0)
+    finally:
+        await dispatcher.stop()
+    assert len(claims) >= 2
+
+
+@pytest.mark.anyio
+async def test_trigger_delivers_to_every_contact(mock_db, api):
+    headers = await sign_in(api)
+    await api.post("/auth/contacts", json={"name": "Asha", "phone": "+910000000001"}, headers=headers)
+    await api.post("/auth/contacts", json={"name": "Ravi", "phone": "+910000000002"}, headers=headers)
+
+    await sos_dispatcher.start(mock_db)
+    try:
+        response = await api.post("/sos/trigger", json={"lat": 28.61, "lng": 77.2, "message": "help"}, headers=headers)
+        assert response.status_code == 200
+        sos_id = response.json()["sos_id"]
+
+        async def delivered():
+            status = (await api.get(f"/sos/{sos_id}/status", headers=headers)).json()
+            done = all(delivery["status"] == "delivered" for delivery in status["deliveries"])
+            return status if done else None
+
+        status = await until(delivered)
+    finally:
+        await sos_dispatcher.stop()
+
+    assert status, "notifications were not all delivered"
+    by_contact = sorted((d["contact_name"] or "", d["channel"], d["recipient"], d["attempts"]) for d in status["deliveries"])
+    assert by_contact == [
+        ("", "authority", "authorities", 1),
+        ("Asha", "sms", "+910000000001", 1),
+        ("Ravi", "sms", "+910000000002", 1)
+    ]
+
+
+@pytest.mark.anyio
+async def test_retries_go_out_after_the_backoff_not_the_poll_interval(mock_db):
+    attempts = []
+
+    async def flaky(job):
+        attempts.append(time.monotonic())
+        return len(attempts) >= 3
+
+    dispatcher = dispatcher_with(flaky, base_delay=0.1, poll_interval=5.0)
+    await dispatcher.start(mock_db)
+    try:
+        await enqueue_one(mock_db, dispatcher)
+        job = await until(lambda: mock_db.sos_outbox.find_one({"status": "delivered"}))
+    finally:
+        await dispatcher.stop()
+
+    assert job and job["attempts"] == 3
+    gaps = [later - earlier for earlier, later in zip(attempts, attempts[1:])]
+    # base_delay * 2 ** (attempt - 1), with +-20% jitter
+    assert 0.08 <= gaps[0] < 0.5
+    assert 0.16 <= gaps[1] < 0.7
+
+
+@pytest.mark.anyio
+async def test_jobs_fail_after_max_attempts(mock_db):
+    async def down(job):
+        raise ConnectionError("gateway down")
+
+    dispatcher = dispatcher_with(down, base_delay=0.01, max_attempts=3)
+    await dispatcher.start(mock_db)
+    try:
+        alert_id = await enqueue_one(mock_db, dispatcher)
+        job = await until(lambda: mock_db.sos_outbox.find_one({"status": "failed"}))
+    finally:
+        await dispatcher.stop()
+
+    assert job and job["attempts"] == 3
+    assert job["last_error"] == "gateway down"
+    delivery, = (await mock_db.sos_alerts.find_one({"_id": alert_id}))["deliveries"].values()
+    assert (delivery["status"], delivery["attempts"], delivery["error"]) == ("failed", 3, "gateway down")
+
+
+@pytest.mark.anyio
+async def test_expired_leases_are_reclaimed(mock_db):
+    sent = []
+
+    async def sender(job):
+        sent.append(job["_id"])
+        return True
+
+    dispatcher = dispatcher_with(sender, lease_seconds=60)
+    now = datetime.utcnow()
+    alert_id = (await mock_db.sos_alerts.insert_one({"user_id": "u1"})).inserted_id
+    stuck, held = [
+        {"_id": ObjectId(), "alert_id": alert_id, "channel": "sms", "recipient": "+91", "status": "sending",
+         "attempts": 1, "next_attempt_at": now - timedelta(minutes=5), "locked_at": locked_at, "lease_id": ObjectId()}
+        for locked_at in (now - timedelta(seconds=120), now - timedelta(seconds=10))
+    ]
+    await mock_db.sos_outbox.insert_many([stuck, held])
+
+    await dispatcher.start(mock_db)
+    try:
+        job = await until(lambda: mock_db.sos_outbox.find_one({"_id": stuck["_id"], "status": "delivered"}))
+    finally:
+        await dispatcher.stop()
+
+    assert job and job["attempts"] == 2
+    # A live lease is left to its worker
+    assert sent == [stuck["_id"]]
+    assert (await mock_db.sos_outbox.find_one({"_id": held["_id"]}))["status"] == "sending"
+
+
+@pytest.mark.anyio
+async def test_stale_worker_cannot_overwrite_a_reclaimed_job(mock_db):
+    async def sender(job):
+        return False
+
+    dispatcher = dispatcher_with(sender, lease_seconds=60)
+    dispatcher.outbox, dispatcher.alerts, dispatcher.wake = mock_db.sos_outbox, mock_db.sos_alerts, asyncio.Event()
+    alert_id = await enqueue_one(mock_db, dispatcher)
+
+    stale = await dispatcher._claim()
+    # The first worker stalls past its lease and another one reclaims the job
+    await mock_db.sos_outbox.update_one({"_id": stale["_id"]}, {"$set": {"locked_at": datetime.utcnow() - timedelta(minutes=2)}})
+    fresh = await dispatcher._claim()
+    assert fresh["_id"] == stale["_id"] and fresh["lease_id"] != stale["lease_id"]
+
+    await dispatcher._process(stale)
+    job = await mock_db.sos_outbox.find_one({"_id": stale["_id"]})
+    assert (job["status"], job["lease_id"], job["attempts"]) == ("sending", fresh["lease_id"], 2)
+    delivery, = (await mock_db.sos_alerts.find_one({"_id": alert_id}))["deliveries"].values()
+    assert delivery["status"] == "pending"
+
+    # The current owner's result is recorded
+    await dispatcher._process(fresh)
+    assert (await mock_db.sos_outbox.find_one({"_id": stale["_id"]}))["status"] == "pending"
@@ -0,0 +1,211 @@
+import json
+import time
+from datetime import datetime
+import anyio
+import pytest
+from bson import ObjectId
+from pymongo.errors import AutoReconnect, BulkWriteError
+from starlette.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from app.main import app
+from app.routes import tracking
+from app.routes.tracking import _parse_points
+from app.utils.location_hub import LocationHub, location_hub
+from tests.conftest import sign_in
+
+
+class FlakyCollection:
+    """insert_many stub that fails the listed batch indexes with the given error codes"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.inserted = []
+
+    async def insert_many(self, docs, ordered=False):
+        if not self.failures:
+            self.inserted.extend(docs)
+            return
+        errors = [{"index": index, "code": code, "errmsg": "failed"} for index, code in self.failures.items()]
+        self.failures = {}
+        written = [doc for i, doc in enumerate(docs) if i not in {error["index"] for error in errors}]
+        self.inserted.extend(written)
+        raise BulkWriteError({"writeErrors": errors, "nInserted": len(written)})
+
+
+def hub_with(points):
+    hub = LocationHub(batch_size=10)
+    for i in range(points):
+        hub.publish("j", {"_id": i, "lat": 0.0, "lng": 0.0})
+    return hub
+
+
+@pytest.mark.anyio
+async def test_flush_drops_duplicates_and_retries_other_failures():
+    hub = hub_with(5)
+    hub.collection = FlakyCollection({1: 11000, 3: 91})
+
+    assert not await hub._flush()
+    assert [point["_id"] for point in hub.buffer] == [3]
+    assert hub.stats["persisted"] == 3
+    assert hub.stats["duplicates"] == 1
+
+    assert await hub._flush()
+    assert sorted(point["_id"] for point in hub.collection.inserted) == [0, 2, 3, 4]
+    assert hub.stats["persisted"] == 4
+
+
+@pytest.mark.anyio
+async def test_flush_of_only_duplicates_succeeds():
+    hub = hub_with(2)
+    hub.collection = FlakyCollection({0: 11000, 1: 11000})
+
+    assert await hub._flush()
+    assert not hub.buffer
+
+
+@pytest.mark.anyio
+async def test_flush_requeues_batch_on_connection_error():
+    hub = hub_with(3)
+
+    class Down:
+        async def insert_many(self, docs, ordered=False):
+            raise AutoReconnect("down")
+
+    hub.collection = Down()
+    assert not await hub._flush()
+    assert [point["_id"] for point in hub.buffer] == [0, 1, 2]
+
+
+@pytest.mark.parametrize("ts", [1e20, -1e20, 10 ** 400, float("nan"), float("inf"), "1700000000000", True, None])
+def test_parse_points_ignores_unusable_timestamps(ts):
+    before = datetime.utcnow()
+    [point] = _parse_points(json.dumps({"lat": 1, "lng": 2, "ts": ts}))
+    assert point["ts"] >= before
+
+
+def test_parse_points_keeps_client_timestamps():
+    [point] = _parse_points(json.dumps({"lat": 1, "lng": 2, "ts": 1700000000000}))
+    assert point["ts"] == datetime(2023, 11, 14, 22, 13, 20)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("route", [[[28.6]], [[28.6, 77.2, 5]], [[128.6, 77.2]], [["a", 77.2]], [28.6, 77.2]])
+async def test_start_journey_rejects_malformed_routes(mock_db, api, route):
+    headers = await sign_in(api)
+    response = await api.post("/tracking/journeys", json={"route_coordinates": route}, headers=headers)
+    assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_start_journey_stores_route(mock_db, api):
+    headers = await sign_in(api)
+    response = await api.post("/tracking/journeys", json={"route_coordinates": [[28.6, 77.2], [28.61, 77.21]]}, headers=headers)
+    assert response.status_code == 200
+
+    journey = await mock_db.journeys.find_one({})
+    assert journey["route"] == [[28.6, 77.2], [28.61, 77.21]]
+
+
+def test_parse_points_keeps_the_newest_points_of_a_long_backlog():
+    message = json.dumps([{"lat": 1, "lng": 2, "ts": 1700000000000 + i} for i in range(150)])
+    points = _parse_points(message, limit=100)
+    assert len(points) == 100
+    assert points[0]["ts"] == datetime.utcfromtimestamp(1700000000.050)
+
+
+@pytest.fixture
+def client(mock_db):
+    """TestClient running requests and sockets on one event loop, without the app's startup"""
+    client = TestClient(app)
+    with anyio.from_thread.start_blocking_portal() as portal:
+        client.portal = portal
+        yield client
+
+
+def start_tracked_journey(client):
+    client.post("/auth/signup", json={"email": "user@example.com", "password": "correct-horse", "name": "Test"})
+    token = client.post("/auth/login", data={"username": "user@example.com", "password": "correct-horse"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    journey_id = client.post("/tracking/journeys", headers=headers).json()["journey_id"]
+    return journey_id, token, headers
+
+
+def eventually(predicate, timeout=2.0):
+    """Wait for predicate() to become truthy (the app runs on the portal's thread), returning its value"""
+    deadline = time.monotonic() + timeout
+    while True:
+        value = predicate()
+        if value or time.monotonic() > deadline:
+            return value
+        time.sleep(0.01)
+
+
+def published_to(journey_id, count=0):
+    """Points the hub has queued for a journey, once there are at least count of them"""
+    def points():
+        return [point for point in location_hub.buffer if point["journey"]["journey_id"] == journey_id]
+
+    eventually(lambda: len(points()) >= count)
+    return points()
+
+
+def test_ending_a_journey_closes_its_tracker(client):
+    journey_id, token, headers = start_tracked_journey(client)
+
+    with client.websocket_connect(f"/tracking/ws/{journey_id}?token={token}") as tracker:
+        tracker.send_text(json.dumps({"lat": 28.6, "lng": 77.2}))
+        assert len(published_to(journey_id, 1)) == 1
+        assert client.post(f"/tracking/journeys/{journey_id}/end", headers=headers).status_code == 200
+        assert all(ended.is_set() for ended in location_hub.trackers[journey_id])
+        with pytest.raises(WebSocketDisconnect):
+            tracker.receive_text()
+
+    assert len(published_to(journey_id)) == 1
+    assert eventually(lambda: journey_id not in location_hub.trackers)
+
+
+def test_tracker_stops_once_the_journey_ended_elsewhere(client, mock_db, monkeypatch):
+    monkeypatch.setattr(tracking, "STATUS_CHECK_SECONDS", 0)
+    journey_id, token, headers = start_tracked_journey(client)
+
+    with client.websocket_connect(f"/tracking/ws/{journey_id}?token={token}") as tracker:
+        tracker.send_text(json.dumps({"lat": 28.6, "lng": 77.2}))
+        assert len(published_to(journey_id, 1)) == 1
+        # Ended through another worker, whose hub this one never hears from
+        client.portal.call(mock_db.journeys.update_one, {"_id": ObjectId(journey_id)}, {"$set": {"status": "ended"}})
+        tracker.send_text(json.dumps({"lat": 28.61, "lng": 77.2}))
+        assert eventually(lambda: journey_id not in location_hub.trackers)
+        with pytest.raises(WebSocketDisconnect):
+            tracker.receive_text()
+
+    assert [point["lat"] for point in published_to(journey_id)] == [28.6]
+
+
+class RepeatedPoints:
+    """location_points stub returning a point twice, as a time-series collection can after a retried flush"""
+
+    def __init__(self, points):
+        self.points = points
+
+    def find(self, query):
+        return self
+
+    def sort(self, key, direction):
+        return self
+
+    def limit(self, limit):
+        return self
+
+    async def to_list(self, length):
+        return self.points
+
+
+@pytest.mark.anyio
+async def test_journey_points_skip_repeated_writes(mock_db, api, monkeypatch):
+    headers = await sign_in(api)
+    journey = (await api.post("/tracking/journeys", headers=headers)).json()
+    newest, older = [{"_id": ObjectId(), "lat": 28.6 + i / 1000, "lng": 77.2, "ts": datetime(2024, 1, 1, 0, 0, 10 - i)} for i in range(2)]
+    monkeypatch.setattr(mock_db, "location_points", RepeatedPoints([newest, older, older]))
+
+    response = await api.get(f"/tracking/journeys/{journey['journey_id']}/points", params={"share_token": journey["share_token"]})
+    assert [point["lat"] for point in response.json()["points"]] == [older["lat"], newest["lat"]]
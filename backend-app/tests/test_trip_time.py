@@ -0,0 +1,50 @@
+import time
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.models import RouteRequest
+from app.routes.routes import _trip_time
+from app.utils.risk_raster import week_slot
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+
+def request(**kwargs) -> RouteRequest:
+    return RouteRequest(source_lat=28.61, source_lng=77.2, dest_lat=28.62, dest_lng=77.21, **kwargs)
+
+
+def test_offset_departure_uses_the_utc_slot():
+    # Monday 03:00 in India is Sunday 21:30 UTC
+    time_of_day, when = _trip_time(request(departure_time="2026-10-19T03:00:00+05:30"))
+    assert time_of_day == "late_night"
+    assert week_slot(when, 3) == week_slot(datetime(2026, 10, 18, 21, 30), 3) == (6 * 24 + 21) // 3
+
+
+def test_naive_departure_is_utc():
+    _, when = _trip_time(request(departure_time="2026-10-18T21:30:00"))
+    assert week_slot(when, 3) == (6 * 24 + 21) // 3
+
+
+@pytest.fixture
+def india_local_time(monkeypatch):
+    monkeypatch.setenv("TZ", "Asia/Kolkata")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_default_departure_uses_the_utc_slot(india_local_time):
+    time_of_day, when = _trip_time(request())
+    now_utc = datetime.now(timezone.utc)
+    assert when.utcoffset() == timedelta(hours=5, minutes=30)
+    assert abs(when - now_utc) < timedelta(seconds=5)
+    assert week_slot(when, 1) == week_slot(now_utc.replace(tzinfo=None), 1)
+
+
+def test_naive_departure_is_bucketed_on_the_local_clock(monkeypatch):
+    from app.utils import local_time
+    monkeypatch.setattr(local_time, "LOCAL_TIMEZONE", "Asia/Kolkata")
+    # 16:30 UTC is 22:00 in India
+    time_of_day, when = _trip_time(request(departure_time="2026-10-14T16:30:00"))
+    assert time_of_day == "night"
+    assert week_slot(when, 3) == (2 * 24 + 16) // 3